@@ -22,11 +22,12 @@ if not api_key:
 client = genai.Client(api_key=api_key)
 
 
-def generate_response(system_prompt: str, prompt: str, model: str = None):
+def generate_response(system_prompt: str, prompt: str, model: str = None, timeout: float = None):
     """
     Generate a response using the Gemini client.
     system_prompt must be provided (string). prompt is the user prompt.
     model: optional. If None, we will check environment GEMINI_FAST_MODEL, otherwise fall back to 'gemini-2.5-flash'.
+    timeout: optional request timeout in seconds; the call fails instead of hanging past it.
     """
     try:
         # Determine the model to use: explicit argument -> env -> fallback
@@ -37,6 +38,8 @@ def generate_response(system_prompt: str, prompt: str, model: str = None):
 
         # Create a minimal config. Keep it small; we rely on system instruction for strictness.
         config = types.GenerateContentConfig(system_instruction=system_instruction)
+        if timeout is not None:
+            config.http_options = types.HttpOptions(timeout=max(1, int(timeout * 1000)))
 
         response = client.models.generate_content(
             model=model_to_use,
@@ -0,0 +1,249 @@
+# gemini/latlon_stream_parser.py
+"""
+Single-pass, incremental parser for Gemini 'latlon' output.
+
+Feed it text as it arrives and it hands back every {"latlon", "country"[, "id"]} object as soon as
+the object closes:
+
+    parser = LatLonStreamParser()
+    for chunk in response_chunks:
+        for loc in parser.feed(chunk):
+            ...
+    for loc in parser.close():   # whatever was still open at end of input
+        ...
+
+or, for a complete string, parse_latlon_text(text).
+
+The text is scanned once, left to right, by one tokenizer regex whose tokens are the things we care
+about: braces, whole `"latlon": [lat, lon]` / `"country": ...` / `"id": ...` pairs, bare [lat, lon]
+pairs and (skipped) other strings. A small stack of open objects decides which location each value
+belongs to. Every token is bounded in length, so the cost is linear in the response. A streamed feed
+holds back only a token that touches the end of the buffer (it may still grow) or a bare
+"latlon" / "country" / "id" string (its value may not have arrived yet).
+
+It tolerates the malformed shapes Gemini produces:
+  - a missing '[' or ']' around the pair ("latlon": 35.1, 139.2] / "latlon": [35.1, 139.2})
+  - a missing '}' between objects, or no braces at all ("latlon": [..], "country": "..", "latlon": ..)
+  - unquoted or single-quoted values ("country": kenya / 'kenya'), code fences and stray prose
+  - bare [lat, lon] pairs with no "latlon" key (used only while no "latlon" key has been seen)
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+_NUM = r"[+-]?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?"
+_COUNTRY_BARE = r"""[^\s,{}\[\]"'][^,{}\[\]"'\n]{0,200}"""
+_ID_BARE = r"[A-Za-z0-9_\-.]{1,100}"
+
+
+def _str_value(prefix: str, bare: str) -> str:
+    """A double-quoted, single-quoted or bare value, captured as <prefix>_dq / _sq / _bare."""
+    return (
+        r'(?:"(?P<' + prefix + r'_dq>(?:[^"\\\n]|\\.){0,200})"'
+        r"|'(?P<" + prefix + r"_sq>[^'\n]{0,200})'"
+        r"|(?P<" + prefix + r"_bare>" + bare + r"))"
+    )
+
+
+# Fast path: one token for a whole well-formed-enough object ({"id"?, "latlon", "country"?, "id"?}),
+# which is what almost every entry looks like
+_OBJECT = (
+    r"""\{\s*(?:"id"\s*:\s*""" + _str_value("oi1", _ID_BARE) + r"""\s*,\s*)?"""
+    r""""latlon"\s*:\s*\[?\s*(?P<o_lat>""" + _NUM + r""")\s*,\s*(?P<o_lon>""" + _NUM + r""")\s*\]?\s*"""
+    r"""(?:,\s*"country"\s*:\s*""" + _str_value("oc", _COUNTRY_BARE) + r"""\s*)?"""
+    r"""(?:,\s*"id"\s*:\s*""" + _str_value("oi2", _ID_BARE) + r"""\s*)?,?\s*(?P<o_end>\})"""
+)
+
+_TOKEN_RE = re.compile(
+    r"""(?P<obj>""" + _OBJECT + r""")"""
+    r"""|(?P<vopen>:\s*\{)"""                                     # object used as a value ("meta": {...})
+    r"""|(?P<colon>:\s*)"""
+    r"""|(?P<open>\{)|(?P<close>\})"""
+    r"""|["']?latlon["']?\s*:\s*\[?\s*(?P<lat>""" + _NUM + r""")\s*,\s*(?P<lon>""" + _NUM + r""")\s*\]?"""
+    r"""|(?P<country>["']?country["']?\s*:\s*""" + _str_value("c", _COUNTRY_BARE) + r""")"""
+    r"""|(?P<id>["']?id["']?\s*:\s*""" + _str_value("i", _ID_BARE) + r""")"""
+    r"""|\[\s*(?P<p_lat>""" + _NUM + r""")\s*,\s*(?P<p_lon>""" + _NUM + r""")\s*\]"""
+    r"""|(?P<str>"(?:[^"\\\n]|\\.){0,512}")""",                 # any other string: skipped whole
+    re.IGNORECASE,
+)
+
+# No token is longer than this, so unmatched text further back than this from the end of a streamed
+# buffer can never start one
+_LOOKAHEAD = 1024
+
+_KEY_STRINGS = frozenset({'"latlon"', '"country"', '"id"'})
+
+# characters that could still extend a number a token ended on
+_NUMBER_TAIL = frozenset(".eE+-0123456789")
+
+
+def _normalize_country(val: Optional[str]) -> Optional[str]:
+    if val is None:
+        return None
+    s = val.strip()
+    if not s or s.lower() == "null":
+        return None
+    return s.lower()
+
+
+def _normalize_id(val: Optional[str]) -> Optional[str]:
+    if val is None:
+        return None
+    s = val.strip()
+    if not s or s.lower() == "null":
+        return None
+    if s.endswith(".0") and s[:-2].isdigit():
+        s = s[:-2]
+    return s
+
+
+def _unescape(s: str) -> str:
+    if "\\" not in s:
+        return s
+    try:
+        return json.loads(f'"{s}"')
+    except ValueError:
+        return s
+
+
+class _Object:
+    __slots__ = ("latlon", "country", "id", "from_pair", "nested")
+
+    def __init__(self, nested: bool = False):
+        self.latlon: Optional[List[float]] = None
+        self.country: Optional[str] = None
+        self.id: Optional[str] = None
+        self.from_pair = False
+        self.nested = nested   # opened as a value inside another object
+
+    def to_location(self) -> Dict[str, Any]:
+        loc: Dict[str, Any] = {"latlon": self.latlon, "country": self.country}
+        if self.id is not None:
+            loc["id"] = self.id
+        return loc
+
+
+class LatLonStreamParser:
+    def __init__(self):
+        self._buf = ""
+        self._stack: List[_Object] = [_Object()]   # [0] is an implicit root for text outside any braces
+        self._saw_latlon_key = False
+        self._out: List[Dict[str, Any]] = []
+
+    # ----- public API -----
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume more text; return the locations completed by it (possibly none)."""
+        if chunk:
+            self._buf += chunk
+            self._scan(final=False)
+        return self._drain()
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Signal end of input; return any locations that were still open (innermost first)."""
+        self._scan(final=True)
+        while self._stack:
+            self._emit(self._stack.pop())
+        self._stack = [_Object()]
+        return self._drain()
+
+    # ----- scanning -----
+
+    def _scan(self, final: bool):
+        buf = self._buf
+        end = len(buf)
+        pos = 0
+        for m in _TOKEN_RE.finditer(buf):
+            if not final and (
+                m.end() >= end
+                or (m.lastgroup == "str" and m.group().lower() in _KEY_STRINGS)
+                or (m.lastgroup in ("lon", "p_lon") and end - m.end() < 4 and buf[m.end()] in _NUMBER_TAIL)
+            ):
+                # may be a prefix of a longer token: retry once more text has arrived
+                self._buf = buf[m.start():]
+                return
+            pos = m.end()
+            self._token(m)
+        self._buf = "" if final else buf[max(pos, end - _LOOKAHEAD):]
+
+    @staticmethod
+    def _value(m, prefix: str) -> Optional[str]:
+        """The dq / sq / bare alternative of a string value group, unescaped; None if absent."""
+        value = m.group(prefix + "_dq")
+        if value is not None:
+            return _unescape(value)
+        value = m.group(prefix + "_sq")
+        return value if value is not None else m.group(prefix + "_bare")
+
+    def _token(self, m):
+        kind = m.lastgroup
+        stack = self._stack
+        obj = stack[-1]
+        if kind == "obj":
+            if len(stack) > 1 and obj.latlon is not None and not obj.nested:
+                self._emit(stack.pop())   # previous object never closed
+            if self._saw_latlon_key is False:
+                self._saw_latlon_key = True
+            loc: Dict[str, Any] = {
+                "latlon": [float(m.group("o_lat")), float(m.group("o_lon"))],
+                "country": _normalize_country(self._value(m, "oc")),
+            }
+            item_id = _normalize_id(self._value(m, "oi1") or self._value(m, "oi2"))
+            if item_id is not None:
+                loc["id"] = item_id
+            self._out.append(loc)
+        elif kind == "open" or kind == "vopen":
+            if kind == "open" and len(stack) > 1 and obj.latlon is not None and not obj.nested:
+                # previous object never closed: finish it before starting the next one
+                self._emit(stack.pop())
+            stack.append(_Object(nested=kind == "vopen"))
+        elif kind == "close":
+            if len(stack) > 1:
+                self._emit(stack.pop())
+        elif kind == "lon":
+            self._saw_latlon_key = True
+            if obj.latlon is not None and not obj.from_pair:
+                # a second latlon in the same (unclosed) object starts a new location
+                self._emit(obj)
+                obj = stack[-1] = _Object(nested=obj.nested)
+            obj.latlon = [float(m.group("lat")), float(m.group("lon"))]
+            obj.from_pair = False
+        elif kind == "country":
+            if obj.country is None:
+                obj.country = _normalize_country(self._value(m, "c"))
+        elif kind == "id":
+            if obj.id is None:
+                obj.id = _normalize_id(self._value(m, "i"))
+        elif kind == "p_lon":
+            if self._saw_latlon_key:
+                return
+            pair = [float(m.group("p_lat")), float(m.group("p_lon"))]
+            if len(stack) == 1:
+                self._out.append({"latlon": pair, "country": None})
+            elif obj.latlon is None:
+                obj.latlon = pair
+                obj.from_pair = True
+        # "colon" / "str": punctuation, keys and values we do not use
+
+    def _emit(self, obj: _Object):
+        if obj.latlon is not None:
+            self._out.append(obj.to_location())
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        out, self._out = self._out, []
+        return out
+
+
+def parse_latlon_text(text: str) -> List[Dict[str, Any]]:
+    """Parse a complete response in one go."""
+    parser = LatLonStreamParser()
+    return parser.feed(text) + parser.close()
+
+
+def iter_latlon_stream(chunks: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Yield locations from an iterable of text chunks as soon as each one is complete."""
+    parser = LatLonStreamParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
@@ -3,15 +3,23 @@
 Parse a Gemini 'latlon' response string into a Python list of dicts:
   [ {"latlon": [lat, lon], "country": "country"}, ... ]
 
+When the prompt asked Gemini to echo an item id, each dict also carries "id" (a string), so
+callers can join results back to their inputs without relying on position.
+
 This parser is tolerant of small JSON problems (like missing '[' before the pair).
 It will extract lat/lon and an optional country string (lowercased). It does NOT
 look for or return any 'city' field.
+
+Valid JSON takes a json.loads fast path; anything else goes through the single-pass
+tokenizer in gemini/latlon_stream_parser.py (which can also consume a streamed response).
 """
 
 import json
 import re
 from typing import List, Dict, Any, Optional
 
+from gemini.latlon_stream_parser import parse_latlon_text
+
 
 def _normalize_country(val: Any) -> Optional[str]:
     """Normalize country field to lower-case string if possible, else return None."""
@@ -30,6 +38,14 @@ def _normalize_country(val: Any) -> Optional[str]:
         return None
 
 
+def _normalize_id(val: Any) -> Optional[str]:
+    """Item ids are short strings ("l12"); accept bare numbers too. Empty / missing -> None."""
+    if val is None or isinstance(val, (dict, list, bool)):
+        return None
+    s = str(val).strip()
+    return s or None
+
+
 def _try_json_load(raw: str) -> Optional[List[Dict[str, Any]]]:
     """Try to load raw text as JSON, returning list if successful and well-formed."""
     try:
@@ -49,7 +65,11 @@ def _try_json_load(raw: str) -> Optional[List[Dict[str, Any]]]:
                     except Exception:
                         continue
                     country = _normalize_country(item.get("country"))
-                    out.append({"latlon": [lat, lon], "country": country})
+                    entry = {"latlon": [lat, lon], "country": country}
+                    item_id = _normalize_id(item.get("id"))
+                    if item_id is not None:
+                        entry["id"] = item_id
+                    out.append(entry)
             if out:
                 return out
     except Exception:
@@ -68,6 +88,7 @@ def parse_gemini_latlon_list(raw: str) -> List[Dict[str, Any]]:
       list of dicts with keys:
         - "latlon": [lat(float), lon(float)]
         - "country": lower-case string or None
+        - "id": echoed item id (only present when the response carried one)
     """
     if not isinstance(raw, str):
         raise TypeError("raw must be a string")
@@ -92,90 +113,8 @@ def parse_gemini_latlon_list(raw: str) -> List[Dict[str, Any]]:
     if parsed is not None:
         return parsed
 
-    # 2) Tolerant regex extraction:
-    number = r"[+-]?\d+(?:\.\d+)?"
-    # Allow optional opening '[' and optional closing ']' for malformed cases
-    pattern = re.compile(
-        rf'"latlon"\s*:\s*\[?\s*({number})\s*,\s*({number})\s*\]?',
-        flags=re.IGNORECASE
-    )
-
-    country_pattern = re.compile(
-        r'"country"\s*:\s*(?P<q>["\']?)(?P<country>[^"\'},\]]+)(?P=q)',
-        flags=re.IGNORECASE
-    )
-
-    results: List[Dict[str, Any]] = []
-    for m in pattern.finditer(text):
-        try:
-            lat_s, lon_s = m.group(1), m.group(2)
-            lat = float(lat_s)
-            lon = float(lon_s)
-
-            country = None
-
-            # Search in a larger window around the match (500 chars forward and backward)
-            search_span_start = max(0, m.end())
-            search_span_end = min(len(text), m.end() + 500)
-            forward_chunk = text[search_span_start:search_span_end]
-
-            back_start = max(0, m.start() - 500)
-            back_chunk = text[back_start:m.start()]
-
-            fm_country = country_pattern.search(forward_chunk)
-            bm_country = country_pattern.search(back_chunk)
-
-            if fm_country:
-                country = _normalize_country(fm_country.group("country"))
-            elif bm_country:
-                country = _normalize_country(bm_country.group("country"))
-
-            # Global fallback if still not found (less reliable)
-            if country is None:
-                gm_country = country_pattern.search(text)
-                if gm_country:
-                    country = _normalize_country(gm_country.group("country"))
-
-            results.append({"latlon": [lat, lon], "country": country})
-        except Exception:
-            # skip any entries that can't be parsed to floats
-            continue
-
-    # If regex found nothing, try a more permissive approach: find any bracketed pairs of two numbers
-    if not results:
-        pair_pattern = re.compile(r"\[\s*(" + number + r")\s*,\s*(" + number + r")\s*\]")
-        for m in pair_pattern.finditer(text):
-            try:
-                lat = float(m.group(1))
-                lon = float(m.group(2))
-
-                country = None
-
-                search_span_start = max(0, m.end())
-                search_span_end = min(len(text), m.end() + 500)
-                forward_chunk = text[search_span_start:search_span_end]
-
-                back_start = max(0, m.start() - 500)
-                back_chunk = text[back_start:m.start()]
-
-                fm_country = country_pattern.search(forward_chunk)
-                bm_country = country_pattern.search(back_chunk)
-
-                if fm_country:
-                    country = _normalize_country(fm_country.group("country"))
-                elif bm_country:
-                    country = _normalize_country(bm_country.group("country"))
-
-                if country is None:
-                    gm_country = country_pattern.search(text)
-                    if gm_country:
-                        country = _normalize_country(gm_country.group("country"))
-
-                results.append({"latlon": [lat, lon], "country": country})
-            except Exception:
-                continue
-
-    return results
+    # 2) Tolerant single-pass extraction (handles truncated / malformed JSON, see latlon_stream_parser)
+    return parse_latlon_text(text)
 
 
 # If executed as a script, demonstrate parsing with the sample (for quick manual test)
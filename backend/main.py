@@ -61,6 +61,14 @@ app.include_router(rank_opportunities_router, prefix="/api/gemini", tags=["gemin
 from routers.gmap.router import router as gmap_router
 app.include_router(gmap_router, prefix="/api/gmap", tags=["gmap"])
 
+# Mount the opportunities query router
+from routers.opportunities.router import router as opportunities_router
+app.include_router(opportunities_router, prefix="/api/opportunities", tags=["opportunities"])
+
+# Mount the trip planning router
+from routers.trips.router import router as trips_router
+app.include_router(trips_router, prefix="/api/trips", tags=["trips"])
+
 # Mount the news router
 from routers.news.router import router as news_router
 app.include_router(news_router, prefix="/api/news", tags=["news"])
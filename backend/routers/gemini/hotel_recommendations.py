@@ -41,6 +41,39 @@ def sanitize_text(text: str) -> str:
     return text.strip()
 
 
+def generate_hotel_recommendation(location: str, lat: float, lng: float, timeout: Optional[float] = None) -> str:
+    """
+    Ask Gemini for 3-5 hotels near `location`, giving up after `timeout` seconds when one is set;
+    raises whatever the Gemini wrapper raises.
+    """
+    # Build system prompt for hotel recommendations
+    location_sanitized = sanitize_text(location)
+    
+    system_prompt = (
+        "You are a helpful travel advisor specializing in hotel recommendations. "
+        "Generate a concise hotel itinerary with 3-5 recommended hotels for the specified location. "
+        "For each hotel, include: hotel name, brief description (1-2 sentences), and approximate price range or budget category. "
+        "Focus on hotels that are well-located, have good reviews, and offer good value. "
+        "Format the response as a clear, readable list. "
+        "Keep the total response under 200 words. "
+        "Do NOT include bullet points or emojis - use plain text with line breaks between hotels."
+    )
+    
+    user_prompt = (
+        f"Please provide hotel recommendations for {location_sanitized} "
+        f"(coordinates: {lat}, {lng}). "
+        "Include 3-5 hotels with names, brief descriptions, and price ranges."
+    )
+    
+    logger.debug("System prompt length=%d", len(system_prompt))
+    logger.debug("User prompt length=%d", len(user_prompt))
+    
+    recommendation = generate_response(system_prompt=system_prompt, prompt=user_prompt, timeout=timeout)
+    if isinstance(recommendation, str):
+        recommendation = sanitize_text(recommendation)
+    return recommendation
+
+
 # -----------------------
 # Endpoint
 # -----------------------
@@ -65,34 +98,10 @@ async def hotel_recommendations(req: HotelRecommendationRequest):
     logger.info("Coordinates: %f, %f", req.lat, req.lng)
     logger.info("=" * 80)
     
-    # Build system prompt for hotel recommendations
-    location_sanitized = sanitize_text(req.location)
-    
-    system_prompt = (
-        "You are a helpful travel advisor specializing in hotel recommendations. "
-        "Generate a concise hotel itinerary with 3-5 recommended hotels for the specified location. "
-        "For each hotel, include: hotel name, brief description (1-2 sentences), and approximate price range or budget category. "
-        "Focus on hotels that are well-located, have good reviews, and offer good value. "
-        "Format the response as a clear, readable list. "
-        "Keep the total response under 200 words. "
-        "Do NOT include bullet points or emojis - use plain text with line breaks between hotels."
-    )
-    
-    user_prompt = (
-        f"Please provide hotel recommendations for {location_sanitized} "
-        f"(coordinates: {req.lat}, {req.lng}). "
-        "Include 3-5 hotels with names, brief descriptions, and price ranges."
-    )
-    
-    logger.debug("System prompt length=%d", len(system_prompt))
-    logger.debug("User prompt length=%d", len(user_prompt))
-    
     # Call Gemini wrapper
     try:
         logger.info("Calling generate_response (Gemini wrapper) for hotel recommendations...")
-        recommendation = generate_response(system_prompt=system_prompt, prompt=user_prompt)
-        if isinstance(recommendation, str):
-            recommendation = sanitize_text(recommendation)
+        recommendation = generate_hotel_recommendation(req.location, req.lat, req.lng)
         logger.info("Received hotel recommendation (len=%d)", len(recommendation) if recommendation else 0)
         return HotelRecommendationResponse(recommendation=recommendation)
     except Exception as e:
@@ -2,9 +2,9 @@
 import logging
 import traceback
 import os
-import tempfile
 import json
-from typing import Optional, Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Optional, Dict, Any, Iterable, List
 
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
@@ -16,11 +16,41 @@ from routers.volunteering.router import search_volunteer_links
 import importlib
 
 # import the helper that attaches links to parsed locations
-from utils.add_links import add_links_to_locations
+from utils.add_links import add_links_by_id, add_links_to_locations
+
+# detail-page enrichment (organization name + street address per link)
+from utils.opportunity_details import fetch_opportunity_details
+
+from utils.deadline import Deadline
+
+# offline geocoder consulted before Gemini
+from utils.gazetteer import get_gazetteer, normalize_country
+
+# persistent link -> coordinates cache (consulted before any geocoder)
+from utils.geocode_cache import get_geocode_cache
+
+# transactional store behind opportunities.json
+from utils.opportunity_store import get_opportunity_store
+
+# near-duplicate folding across the whole store
+from utils.opportunity_dedup import dedupe_store
+
+# point-in-polygon check of reported countries against countries.geojson
+from utils.country_validator import CORRECTABLE, STATUS_OUTSIDE, STATUS_UNVERIFIABLE, apply_corrections, get_country_validator
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+# Gemini geocoding is split into chunks of this many links, sent this many at a time
+GEOCODE_CHUNK_SIZE = int(os.environ.get("GEOCODE_CHUNK_SIZE", "25"))
+GEOCODE_MAX_CONCURRENCY = int(os.environ.get("GEOCODE_MAX_CONCURRENCY", "4"))
+# extra attempts for a chunk whose call or parse failed
+GEOCODE_CHUNK_RETRIES = int(os.environ.get("GEOCODE_CHUNK_RETRIES", "1"))
+# what to do with new geocodes whose point lies in another country: "fix" (rewrite `country`), "flag", "off"
+COUNTRY_VALIDATION = os.environ.get("COUNTRY_VALIDATION", "fix").strip().lower()
+# fold duplicates (same listing id, or same title at the same spot) after every store write
+DEDUP_ON_STORE = os.environ.get("OPPORTUNITY_DEDUP", "1").strip() != "0"
+
 
 class GeminiIdealistResponse(BaseModel):
     status: str
@@ -33,6 +63,10 @@ class GeminiIdealistResponse(BaseModel):
     # parsed locations: list of {"latlon": [lat, lon], "country": <lowercase string or null>, "link": <url or null>}
     locations: Optional[List[Dict[str, Any]]] = None
     error: Optional[str] = None
+    # True when the time budget cut scraping or geocoding short
+    partial: bool = False
+    # new locations whose point disagreed with their country: {"link", "reported", "detected", "status", "corrected"}
+    country_flags: Optional[List[Dict[str, Any]]] = None
 
 
 def import_call_gemini_module():
@@ -64,197 +98,298 @@ def import_parser_module():
         raise
 
 
-def _opportunities_json_path():
-    """
-    Compute the path to backend/opportunities.json relative to this file.
-    This file lives at backend/routers/gemini/idealist_to_geo.py, so go up two levels to backend/.
+def _store_locations(country_key: str, locations_list: List[Dict[str, Any]], provisional: Iterable[str] = ()) -> Optional[str]:
     """
-    cur_dir = os.path.dirname(__file__)
-    path = os.path.normpath(os.path.abspath(os.path.join(cur_dir, "..", "..", "opportunities.json")))
-    return path
-
-
-def _append_locations_to_opportunities(country_key: str, locations_list: List[Dict[str, Any]]) -> Optional[str]:
-    """
-    Append (extend) the locations_list under the country_key in backend/opportunities.json.
+    Upsert locations_list under country_key in the opportunity store, merge any duplicates that
+    creates, and re-export backend/opportunities.json from it. Links in `provisional` only have a
+    placeholder position and are stored as provisional, so the next incremental run retries them.
 
     Returns None on success, or an error message string on failure.
     """
     if not isinstance(locations_list, list):
         return "locations_list is not a list"
-
-    opportunities_path = _opportunities_json_path()
-    # Ensure the directory exists
-    os.makedirs(os.path.dirname(opportunities_path), exist_ok=True)
-
-    # Read existing data (if any)
-    existing_data = {}
+    store = get_opportunity_store()
     try:
-        if os.path.exists(opportunities_path):
-            with open(opportunities_path, "r", encoding="utf-8") as f:
-                try:
-                    existing_data = json.load(f)
-                    if not isinstance(existing_data, dict):
-                        # If file exists but is not a dict, treat as corrupt and replace with empty dict
-                        logger.warning("opportunities.json exists but does not contain a JSON object; overwriting with an object.")
-                        existing_data = {}
-                except json.JSONDecodeError:
-                    logger.exception("opportunities.json exists but contains invalid JSON. Replacing with new object.")
-                    existing_data = {}
+        store.upsert_many(country_key, locations_list, provisional=set(provisional))
     except Exception as e:
-        logger.exception("Error while reading opportunities.json")
-        return f"read_failed: {str(e)}"
-
-    # Prepare new data: extend existing list for this country key, or create a new list
-    country_key_lower = country_key.lower()
-    existing_list = existing_data.get(country_key_lower)
-    if existing_list is None:
-        # create new list
-        existing_data[country_key_lower] = list(locations_list)
-    elif isinstance(existing_list, list):
-        existing_list.extend(locations_list)
-        existing_data[country_key_lower] = existing_list
-    else:
-        # If existing value for key is not a list, replace it with the new list
-        existing_data[country_key_lower] = list(locations_list)
-
-    # Write atomically: write to temp file then replace
-    try:
-        dir_name = os.path.dirname(opportunities_path) or "."
-        fd, tmp_path = tempfile.mkstemp(prefix="opportunities_", suffix=".json", dir=dir_name)
+        logger.exception("Failed to write opportunities to the store")
+        return f"store_failed: {str(e)}"
+    if DEDUP_ON_STORE:
         try:
-            with os.fdopen(fd, "w", encoding="utf-8") as tmpf:
-                json.dump(existing_data, tmpf, ensure_ascii=False, indent=2)
-                tmpf.flush()
-                os.fsync(tmpf.fileno())
-            # atomic replace
-            os.replace(tmp_path, opportunities_path)
-        finally:
-            # If tmp_path still exists (something went wrong), try to remove it
-            if os.path.exists(tmp_path):
-                try:
-                    os.remove(tmp_path)
-                except Exception:
-                    pass
+            dedupe_store(store, apply=True)   # logs what it merged
+        except Exception:
+            logger.exception("Duplicate merge failed; exporting without it")
+    try:
+        store.export_json()
     except Exception as e:
-        logger.exception("Failed to write opportunities.json atomically")
-        return f"write_failed: {str(e)}"
-
+        logger.exception("Failed to export opportunities.json")
+        return f"export_failed: {str(e)}"
     return None
 
 
-@router.get("/convert_idealist", response_model=GeminiIdealistResponse)
-def convert_idealist_to_geo(
-    country: str = Query(..., min_length=1, description="Country or location to search, e.g. 'Japan'"),
-    limit: Optional[int] = Query(None, ge=1, le=200, description="Optional max number of links to return"),
-    model: Optional[str] = Query(None, description="Optional Gemini model override (e.g. gemini-2.5-flash)"),
-):
-    """
-    Run the volunteering search for `country`, take the resulting JSON, pass only the links
-    to Gemini with a concise system prompt asking for ONLY valid JSON containing {"latlon": [lat, lon], "country": "country"},
-    parse Gemini's output into a list of {"latlon": [lat, lon], "country": <str or None>} dicts,
-    attach the original link for each entry under "link", append that list under backend/opportunities.json[country],
-    and return that list under `locations`.
-    """
+class _GeminiGeocodeResult(BaseModel):
+    # parsed locations with "link"/"name" attached, or None when Gemini could not be used
+    locations: Optional[List[Dict[str, Any]]] = None
+    raw: Optional[str] = None
+    called: bool = False
+    timed_out: bool = False
+    error: Optional[str] = None
+    # links whose chunk failed or ran out of time (Gemini never gave an answer for them)
+    unanswered: List[str] = []
 
-    # 1) Call the existing volunteering search function
-    try:
-        search_result = search_volunteer_links(country=country, limit=limit)
-        search_dict = search_result.dict()
-    except HTTPException as he:
-        raise he
-    except Exception as exc:
-        logger.exception("Error while running volunteering search")
-        raise HTTPException(status_code=500, detail=f"Volunteering search failed: {str(exc)}")
 
-    # 2) Prepare a compact payload for Gemini: only the links list
-    links_list = search_dict.get("links") or search_dict.get("idealist_json", {}).get("links") or []
-    links_json = json.dumps(links_list, ensure_ascii=False)
+class _ChunkResult(BaseModel):
+    locations: Optional[List[Dict[str, Any]]] = None
+    raw: Optional[str] = None
+    called: bool = False
+    error: Optional[str] = None
 
-    # 3) Concise, strict system prompt. Ask Gemini to return only JSON array with objects containing "latlon": [lat, lon] and "country": "<country>"
-    system_prompt = (
-        "You are given a JSON array of URLs (links) pointing to volunteer opportunity pages.\n"
-        "Task: For each URL produce a JSON object with these exact keys:\n"
+
+def _build_geocode_prompt(items: List[Dict[str, str]], with_details: bool) -> str:
+    """System prompt for one chunk of {"id", "url"[, "organization", "address"]} items."""
+    if with_details:
+        input_description = (
+            "You are given a JSON array of volunteer opportunities. Each element has a short \"id\", a \"url\" and, "
+            "when known, the \"organization\" running it and its street \"address\". Prefer the address over the URL when present.\n"
+        )
+    else:
+        input_description = (
+            "You are given a JSON array of volunteer opportunities. Each element has a short \"id\" and a \"url\" "
+            "pointing to the opportunity page.\n"
+        )
+
+    # Concise, strict system prompt. Ask Gemini to return only a JSON array of {"id", "latlon", "country"} objects
+    return (
+        input_description +
+        "Task: For each element produce a JSON object with these exact keys:\n"
+        "  - \"id\": the element's id, copied exactly,\n"
         "  - \"latlon\": an array [lat, lon] where lat and lon are parseable floats (latitude first),\n"
         "  - \"country\": the country for that lat/lon, as a lower-case English name (for example: 'japan').\n"
         "Requirements (strict):\n"
         " - Output MUST be a single valid JSON array and nothing else. Example:\n"
-        "   [ {\"latlon\": [35.6897, 139.6922], \"country\": \"japan\"}, {\"latlon\": [...], \"country\": \"country\"} ]\n"
+        "   [ {\"id\": \"l0\", \"latlon\": [35.6897, 139.6922], \"country\": \"japan\"}, {\"id\": \"l1\", \"latlon\": [...], \"country\": \"country\"} ]\n"
         " - Do NOT include markdown, backticks, commentary, notes, or any extra text.\n"
         " - Ensure lat and lon are parseable floats and in the order [latitude, longitude].\n"
         " - Make sure that the countries are full English names in lower case (no country codes).\n"
-        " - Return entries in the same order as the input links array. If you cannot find coordinates for a link, omit that link's object entirely.\n"
-        " - Each array element MUST contain both keys: \"latlon\" and \"country\" (if country is unknown, set it to null explicitly).\n"
-        "Input links array:\n"
-        f"{links_json}\n"
+        " - Every object MUST echo the \"id\" of the element it describes. If you cannot find coordinates for an element, omit its object entirely.\n"
+        " - Each array element MUST contain the keys \"id\", \"latlon\" and \"country\" (if country is unknown, set it to null explicitly).\n"
+        "Input array:\n"
+        f"{json.dumps(items, ensure_ascii=False)}\n"
         "Reply now with only the JSON array (no extra text)."
     )
 
-    # 4) Import gemini wrapper and call it with a fast default model (configurable)
+
+def _geocode_chunk(
+    generate_fn,
+    parse_fn,
+    items: List[Dict[str, str]],
+    with_details: bool,
+    model: Optional[str],
+    deadline: Deadline,
+) -> _ChunkResult:
+    """
+    Geocode one chunk, retrying it (up to GEOCODE_CHUNK_RETRIES times) when the call or parse fails.
+    Runs on a worker thread, so it never raises.
+    """
+    gemini_kwargs = {"system_prompt": _build_geocode_prompt(items, with_details), "prompt": ""}
+    if model:
+        gemini_kwargs["model"] = model
+
+    result = _ChunkResult()
+    for attempt in range(GEOCODE_CHUNK_RETRIES + 1):
+        if attempt and deadline.expired():
+            break
+        try:
+            raw = generate_fn(**gemini_kwargs)
+            result.called = True
+            result.raw = raw if isinstance(raw, str) else str(raw)
+        except SystemExit:
+            logger.exception("call_gemini requested process exit while generating response")
+            result.error = "call_gemini requested process exit. Check GEMINI_API_KEY and call_gemini implementation."
+            break
+        except Exception as exc:
+            logger.warning("Gemini geocoding chunk failed (attempt %d): %s", attempt + 1, exc)
+            logger.debug(traceback.format_exc())
+            result.error = f"Gemini generation failed: {str(exc)}"
+            continue
+
+        try:
+            parsed = parse_fn(result.raw) or []
+        except Exception as pe:
+            logger.warning("Could not parse Gemini geocoding chunk (attempt %d): %s", attempt + 1, pe)
+            logger.debug(traceback.format_exc())
+            result.error = f"Parsing failed: {str(pe)}"
+            continue
+        if not parsed and result.raw.strip() not in ("", "[]"):
+            # something came back but nothing in it was usable -> worth another try
+            result.error = "Parsing failed: no locations found in Gemini output"
+            continue
+
+        result.locations = parsed
+        result.error = None
+        break
+    return result
+
+
+def _geocode_with_gemini(
+    links_list: List[str],
+    details_by_link: Dict[str, Dict[str, str]],
+    model: Optional[str],
+    deadline: Deadline,
+) -> _GeminiGeocodeResult:
+    """
+    Ask Gemini for [lat, lon] + country of every link in `links_list`.
+
+    Links are sent in chunks of GEOCODE_CHUNK_SIZE, at most GEOCODE_MAX_CONCURRENCY at a time. Every
+    item carries a short id ("l0", "l1", ...) that Gemini echoes back, and results are joined to links
+    by that id, never by position. A failed chunk is retried on its own. Never raises: failures are
+    reported in the result's `error`.
+    """
+    # Import gemini wrapper and parser once for all chunks
     try:
         cg = import_call_gemini_module()
     except SystemExit:
-        return GeminiIdealistResponse(
-            status="ok",
-            country=country,
-            limit=limit,
-            idealist_json=search_dict,
-            gemini_called=False,
-            raw_gemini=None,
-            locations=None,
-            error="call_gemini attempted to exit (likely missing GEMINI_API_KEY). Check server logs."
-        )
+        return _GeminiGeocodeResult(error="call_gemini attempted to exit (likely missing GEMINI_API_KEY). Check server logs.",
+                                    unanswered=list(links_list))
     except Exception as exc:
-        return GeminiIdealistResponse(
-            status="ok",
-            country=country,
-            limit=limit,
-            idealist_json=search_dict,
-            gemini_called=False,
-            raw_gemini=None,
-            locations=None,
-            error=f"Import error for gemini wrapper: {str(exc)}"
-        )
+        return _GeminiGeocodeResult(error=f"Import error for gemini wrapper: {str(exc)}", unanswered=list(links_list))
 
     generate_fn = getattr(cg, "generate_response", None)
     if not callable(generate_fn):
-        return GeminiIdealistResponse(
-            status="ok",
-            country=country,
-            limit=limit,
-            idealist_json=search_dict,
-            gemini_called=False,
-            raw_gemini=None,
-            locations=None,
-            error="generate_response not found in gemini.call_gemini"
-        )
+        return _GeminiGeocodeResult(error="generate_response not found in gemini.call_gemini", unanswered=list(links_list))
+
+    try:
+        parse_fn = import_parser_module()
+    except Exception as exc:
+        return _GeminiGeocodeResult(error=f"Parsing failed: {str(exc)}", unanswered=list(links_list))
 
     # Decide model: explicit query param overrides env default which overrides embedded default
     model_to_use = model or os.environ.get("GEMINI_FAST_MODEL", None)
 
+    links_by_id: Dict[str, str] = {}
+    items: List[Dict[str, str]] = []
+    for i, link in enumerate(links_list):
+        item_id = f"l{i}"
+        links_by_id[item_id] = link
+        item = {"id": item_id, "url": link}
+        item.update(details_by_link.get(link, {}))
+        items.append(item)
+    with_details = bool(details_by_link)
+
+    chunk_size = max(1, GEOCODE_CHUNK_SIZE)
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    results: List[Optional[_ChunkResult]] = [None] * len(chunks)
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(GEOCODE_MAX_CONCURRENCY, len(chunks))))
+    futures: Dict[Any, int] = {}
     try:
-        prompt_text = ""  # system prompt contains the instructions
-        if model_to_use:
-            gemini_text = generate_fn(system_prompt=system_prompt, prompt=prompt_text, model=model_to_use)
+        for i, chunk in enumerate(chunks):
+            futures[pool.submit(_geocode_chunk, generate_fn, parse_fn, chunk, with_details, model_to_use, deadline)] = i
+        # Under a budget, stop waiting when it runs out (unfinished calls complete in the background
+        # and are discarded)
+        done, _ = wait(futures, timeout=deadline.remaining())
+        for future in done:
+            results[futures[future]] = future.result()
+    finally:
+        # chunks that have not started are dropped (shutdown's cancel_futures needs Python 3.9)
+        for future in futures:
+            future.cancel()
+        pool.shutdown(wait=False)
+
+    timed_out = any(r is None for r in results)
+    if timed_out:
+        logger.warning("Gemini geocoding did not finish within the time budget (%d/%d chunks done)",
+                       sum(r is not None for r in results), len(results))
+
+    locations: Optional[List[Dict[str, Any]]] = None
+    raw_parts: List[str] = []
+    errors: List[str] = []
+    unanswered: List[str] = []
+    for chunk, r in zip(chunks, results):
+        if r is None or r.locations is None:
+            unanswered.extend(item["url"] for item in chunk)
+            if r is not None and r.error:
+                errors.append(r.error)
         else:
-            gemini_text = generate_fn(system_prompt=system_prompt, prompt=prompt_text)
-        gemini_text_str = gemini_text if isinstance(gemini_text, str) else str(gemini_text)
+            locations = (locations or []) + r.locations
+        if r is not None and r.raw is not None:
+            raw_parts.append(r.raw)
+    if timed_out:
+        errors.append("time budget exhausted while geocoding")
 
-    except SystemExit:
-        logger.exception("call_gemini requested process exit while generating response")
-        return GeminiIdealistResponse(
-            status="ok",
-            country=country,
-            limit=limit,
-            idealist_json=search_dict,
-            gemini_called=False,
-            raw_gemini=None,
-            locations=None,
-            error="call_gemini requested process exit. Check GEMINI_API_KEY and call_gemini implementation."
+    if locations is not None:
+        try:
+            locations = add_links_by_id(locations, links_by_id)
+        except Exception as exc:
+            logger.exception("Failed to attach links to parsed locations")
+            logger.debug(traceback.format_exc())
+            errors.append(f"attach_links_failed: {str(exc)}")
+            locations = []
+        answered = len(links_list) - len(unanswered)
+        if len(locations) != answered:
+            errors.append(f"Parsed {len(locations)} entries but sent {answered} links")
+
+    return _GeminiGeocodeResult(
+        locations=locations,
+        raw="\n".join(raw_parts) if raw_parts else None,
+        called=any(r is not None and r.called for r in results),
+        timed_out=timed_out,
+        # distinct messages, in first-seen order
+        error="; ".join(dict.fromkeys(errors)) or None,
+        unanswered=unanswered,
+    )
+
+
+@router.get("/convert_idealist", response_model=GeminiIdealistResponse)
+def convert_idealist_to_geo(
+    country: str = Query(..., min_length=1, description="Country or location to search, e.g. 'Japan'"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Optional max number of links to return"),
+    model: Optional[str] = Query(None, description="Optional Gemini model override (e.g. gemini-2.5-flash)"),
+    incremental: bool = Query(False, description="Only geocode links not already stored for this country"),
+    enrich: bool = Query(False, description="Fetch detail pages so addresses (not URL slugs) are geocoded"),
+    time_budget: Optional[float] = Query(None, gt=0, le=300, description="Optional wall-clock budget in seconds for scraping plus geocoding"),
+):
+    """
+    Run the volunteering search for `country` and geocode every resulting link to
+    {"latlon": [lat, lon], "country": <str or None>, "link": <url>, "name": <slug title>}.
+
+    Geocoding is layered:
+      0) links already in the persistent geocode cache (keyed by normalized URL) are reused as-is;
+      1) the offline gazetteer resolves place names at the end of the URL slug (or in the street
+         address when `enrich` fetched one) for the requested country;
+      2) only the links it cannot place are sent to Gemini;
+      3) anything still unplaced (Gemini unavailable, timed out or omitted it) gets the country centroid.
+
+    Newly geocoded points are checked against the country polygons in countries.geojson first; a point
+    that lies in another country is corrected (or only flagged, per COUNTRY_VALIDATION) and reported
+    under `country_flags`.
+    Newly geocoded links are written to the cache and upserted into the opportunity store under `country`
+    (backend/opportunities.json is re-exported from it);
+    all links (cached and new) are returned under `locations`. Re-running a country with nothing new
+    therefore makes no Gemini call.
+    With `incremental`, only links not already stored for the country are scraped and geocoded.
+    With `time_budget`, scraping and geocoding share one deadline; whatever is ready when it expires is
+    returned with partial=True.
+    """
+    deadline = Deadline(time_budget)
+
+    # 1) Call the existing volunteering search function
+    try:
+        search_result = search_volunteer_links(
+            country=country, limit=limit, incremental=incremental, time_budget=deadline.remaining()
         )
+        search_dict = search_result.dict()
+    except HTTPException as he:
+        raise he
     except Exception as exc:
-        logger.exception("Error while calling Gemini")
-        logger.debug(traceback.format_exc())
+        logger.exception("Error while running volunteering search")
+        raise HTTPException(status_code=500, detail=f"Volunteering search failed: {str(exc)}")
+
+    links_list = search_dict.get("links") or search_dict.get("idealist_json", {}).get("links") or []
+    partial = bool(search_dict.get("partial"))
+
+    # Nothing new since the last scrape: skip geocoding entirely
+    if incremental and not links_list:
         return GeminiIdealistResponse(
             status="ok",
             country=country,
@@ -262,76 +397,155 @@ def convert_idealist_to_geo(
             idealist_json=search_dict,
             gemini_called=False,
             raw_gemini=None,
-            locations=None,
-            error=f"Gemini generation failed: {str(exc)}"
+            locations=[],
+            partial=partial,
+            error=None
         )
 
-    # 5) Parse Gemini's raw response using your parser
-    parsed_locations = None
-    parse_error = None
-    try:
-        parse_fn = import_parser_module()
-        parsed_locations = parse_fn(gemini_text_str)
-        # parsed_locations should be list of {"latlon": [lat, lon], "country": <str or None>} dicts
-        if parsed_locations is None:
-            parsed_locations = []
-    except Exception as pe:
-        parse_error = f"Parsing failed: {str(pe)}"
-        logger.exception("Error while parsing Gemini output")
-        logger.debug(traceback.format_exc())
-        parsed_locations = None
-
-    # 5.5) Attach the corresponding links (by index) to each parsed location
-    if parsed_locations is not None:
+    # 1.5) Persistent geocode cache: links geocoded by any earlier run cost nothing
+    geocode_cache = get_geocode_cache()
+    cached = geocode_cache.get_many(links_list)
+    resolved: Dict[str, Dict[str, Any]] = {
+        link: {"latlon": entry["latlon"], "country": entry.get("country")} for link, entry in cached.items()
+    }
+    misses = [link for link in links_list if link not in resolved]
+    logger.info("Geocode cache hit %d/%d links for %s", len(cached), len(links_list), country)
+
+    # 2) Optionally enrich links with the organization name and street address from their detail pages
+    # (skipped under a time budget: a cold detail fetch for every link would not fit an interactive SLO)
+    details_by_link: Dict[str, Dict[str, str]] = {}
+    if enrich and misses and not deadline.bounded:
         try:
-            parsed_locations = add_links_to_locations(parsed_locations, links_list)
-        except Exception as exc:
-            # If helper fails for any reason, keep parsed_locations as-is and report an error
-            logger.exception("Failed to attach links to parsed locations")
-            logger.debug(traceback.format_exc())
-            if parse_error:
-                parse_error = f"{parse_error}; attach_links_failed: {str(exc)}"
-            else:
-                parse_error = f"attach_links_failed: {str(exc)}"
-
-    # Optionally: If parsed_locations length mismatches links_list length, include a warning in error
-    if parsed_locations is not None and len(parsed_locations) != len(links_list):
-        # keep parsed_locations but warn in error field
-        warning = f"Parsed {len(parsed_locations)} entries but found {len(links_list)} links"
-        if parse_error:
-            parse_error = f"{parse_error}; {warning}"
+            for d in fetch_opportunity_details(misses, key=country.strip().lower()):
+                item = {}
+                if d.get("organization_name"):
+                    item["organization"] = d["organization_name"]
+                if d.get("address"):
+                    item["address"] = d["address"]
+                if item:
+                    details_by_link[d["url"]] = item
+        except Exception:
+            logger.exception("Detail-page enrichment failed; geocoding from URLs only")
+
+    # 3) Offline gazetteer: resolve addresses / slug place names locally
+    gazetteer = get_gazetteer()
+    source_by_link: Dict[str, str] = {}
+    for link in misses:
+        details = details_by_link.get(link, {})
+        address = details.get("address")
+        place = (gazetteer.resolve_address(address, country) if address else None) or gazetteer.resolve_link(
+            link, country, organization=details.get("organization")
+        )
+        if place is not None:
+            resolved[link] = {"latlon": [place.lat, place.lon], "country": place.country}
+            source_by_link[link] = "gazetteer"
+    unresolved = [link for link in misses if link not in resolved]
+    logger.info("Gazetteer resolved %d/%d uncached links for %s", len(misses) - len(unresolved), len(misses), country)
+
+    # 4) Gemini for whatever the gazetteer could not place
+    gemini = _GeminiGeocodeResult()
+    if unresolved:
+        if deadline.expired():
+            gemini = _GeminiGeocodeResult(timed_out=True, error="time budget exhausted before geocoding", unanswered=unresolved)
         else:
-            parse_error = warning
-
-    # 5.75) Append parsed_locations to backend/opportunities.json under the country key
+            gemini = _geocode_with_gemini(unresolved, details_by_link, model, deadline)
+        if gemini.timed_out:
+            partial = True
+        for loc in gemini.locations or []:
+            link = loc.get("link")
+            if link in resolved or link is None:
+                continue
+            resolved[link] = {"latlon": loc.get("latlon"), "country": loc.get("country")}
+            source_by_link[link] = "gemini"
+
+    # 5) Country centroid for links nothing else could place
+    centroid = gazetteer.country_centroid(country)
+    if centroid is not None:
+        for link in unresolved:
+            if link not in resolved:
+                resolved[link] = {"latlon": list(centroid), "country": normalize_country(country)}
+                source_by_link[link] = "centroid"
+
+    # Assemble in scrape order, attaching link + name
+    ordered_links = [link for link in links_list if link in resolved]
+    parsed_locations = add_links_to_locations([resolved[link] for link in ordered_links], ordered_links)
+    for loc in parsed_locations:
+        entry = cached.get(loc["link"])
+        if entry and entry.get("name"):
+            loc["name"] = entry["name"]
+    new_locations = [loc for loc in parsed_locations if loc["link"] in source_by_link]
+
+    # 5.4) Check new points against the country polygons: a point inside another country gets that
+    # country (COUNTRY_VALIDATION=fix), and every disagreement is reported under country_flags
+    country_flags: Optional[List[Dict[str, Any]]] = None
+    if new_locations and COUNTRY_VALIDATION != "off":
+        try:
+            checks = get_country_validator().validate(new_locations)
+            flagged = [c for c in checks if c.status in CORRECTABLE or c.status in (STATUS_OUTSIDE, STATUS_UNVERIFIABLE)]
+            if COUNTRY_VALIDATION == "fix":
+                apply_corrections(new_locations, flagged)
+            country_flags = [
+                {
+                    "link": new_locations[c.index]["link"],
+                    "reported": c.reported,
+                    "detected": c.detected,
+                    "status": c.status,
+                    "corrected": COUNTRY_VALIDATION == "fix" and c.status in CORRECTABLE,
+                }
+                for c in flagged
+            ]
+            if country_flags:
+                logger.info("Country validation flagged %d/%d new locations for %s", len(country_flags), len(new_locations), country)
+        except Exception:
+            logger.exception("Country validation failed; storing countries as reported")
+
+    # 5.5) Remember new geocodes. Centroids are only cached when Gemini answered but could not place
+    # the link; after a Gemini failure they are left uncached, and stored as provisional, so the next
+    # (incremental) run retries them.
+    unanswered = set(gemini.unanswered)
+    provisional = {
+        loc["link"] for loc in new_locations
+        if source_by_link.get(loc["link"]) == "centroid" and loc["link"] in unanswered
+    }
+    for source in ("gazetteer", "gemini", "centroid"):
+        items = [
+            loc for loc in new_locations
+            if source_by_link.get(loc["link"]) == source and loc["link"] not in provisional
+        ]
+        if items:
+            geocode_cache.put_many(items, source=source)
+
+    # 6) Upsert the newly geocoded locations into the store under the country key (re-exports opportunities.json)
     append_error = None
-    if parsed_locations:
+    if new_locations:
         try:
-            append_error = _append_locations_to_opportunities(country, parsed_locations)
+            append_error = _store_locations(country, new_locations, provisional=provisional)
             if append_error:
-                logger.error("Appending to opportunities.json failed: %s", append_error)
+                logger.error("Storing opportunities failed: %s", append_error)
         except Exception as e:
             append_error = f"exception_during_append: {str(e)}"
-            logger.exception("Unexpected error while appending to opportunities.json")
+            logger.exception("Unexpected error while storing opportunities")
             logger.debug(traceback.format_exc())
 
-    # Combine parse_error and append_error into a single error message for the response if present
+    # Combine the Gemini error and append_error into a single error message for the response if present
     combined_error = None
-    if parse_error and append_error:
-        combined_error = f"{parse_error}; append_error: {append_error}"
-    elif parse_error:
-        combined_error = parse_error
+    if gemini.error and append_error:
+        combined_error = f"{gemini.error}; append_error: {append_error}"
+    elif gemini.error:
+        combined_error = gemini.error
     elif append_error:
         combined_error = f"append_error: {append_error}"
 
-    # 6) Return the parsed list under `locations`. Keep raw_gemini for debugging.
+    # 7) Return the list under `locations`. Keep raw_gemini for debugging.
     return GeminiIdealistResponse(
         status="ok",
         country=country,
         limit=limit,
         idealist_json=search_dict,
-        gemini_called=True,
-        raw_gemini=gemini_text_str,
+        gemini_called=gemini.called,
+        raw_gemini=gemini.raw,
         locations=parsed_locations,
-        error=combined_error
+        partial=partial,
+        error=combined_error,
+        country_flags=country_flags,
     )
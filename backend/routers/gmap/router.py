@@ -1,13 +1,31 @@
 # backend/routers/gmap/router.py
 import os
-import math
 import requests
 from typing import Optional, List
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
+import numpy as np
+
+from utils import great_circle, places_client, polyline
+from utils.airport_index import DEFAULT_SIZES, SIZE_TYPES, Airport, get_airport_index
+
 router = APIRouter()
 
+# Upper bound on origin x destination pairs per /flight-routes request
+MAX_BATCH_ROUTES = int(os.environ.get("MAX_BATCH_ROUTES", "2000"))
+
+# When to ask Google Places for an airport: "auto" (only while no local airport dataset is installed),
+# "1" (also when the local index finds nothing) or "0" (never)
+AIRPORT_PLACES_FALLBACK = os.environ.get("AIRPORT_PLACES_FALLBACK", "auto").strip().lower()
+
+MAX_BATCH_AIRPORT_POINTS = 1000
+
+# Default max distance (km) between a drawn route and the true great circle; sets the point count
+ARC_TOLERANCE_KM = float(os.environ.get("ARC_TOLERANCE_KM", "1.0"))
+
+ROUTE_FORMATS = ("points", "polyline")
+
 
 def get_gmaps_api_key() -> str:
     """Get Google Maps API key from environment, raising error if not found."""
@@ -31,60 +49,101 @@ class AirportResponse(BaseModel):
     lat: float
     lng: float
     address: str
+    # set for airports from the local dataset (place_id is then "ourairports:<ident>")
+    iata_code: Optional[str] = None
+    distance_km: Optional[float] = None
 
 
 class FlightRouteRequest(BaseModel):
     origin: LocationRequest
     destination: LocationRequest
+    # fixed number of segments; by default it is chosen from the distance and tolerance_km
+    num_points: Optional[int] = None
+    tolerance_km: Optional[float] = None
+    # "points": [lat, lng] pairs in `route`; "polyline": Google encoded polyline in `polyline`
+    format: str = "points"
 
 
 class FlightRouteResponse(BaseModel):
-    route: List[List[float]]  # List of [lat, lng] coordinates for the arc
+    route: Optional[List[List[float]]] = None  # List of [lat, lng] coordinates for the arc
+    polyline: Optional[str] = None
     distance_km: float
     origin: LocationRequest
     destination: LocationRequest
 
 
-def find_nearest_airport(lat: float, lng: float, radius_km: int = 50) -> Optional[AirportResponse]:
+class NearestAirportsRequest(BaseModel):
+    locations: List[LocationRequest]
+    k: int = 1
+    # any of "large", "medium", "small"
+    sizes: List[str] = list(DEFAULT_SIZES)
+    scheduled_only: bool = True
+
+
+class NearestAirportsItem(BaseModel):
+    location_index: int
+    airports: List[AirportResponse]
+
+
+class NearestAirportsResponse(BaseModel):
+    results: List[NearestAirportsItem]
+
+
+class FlightRoutesRequest(BaseModel):
+    origins: List[LocationRequest]
+    destinations: List[LocationRequest]
+    # "cross": every origin to every destination; "pairwise": origins[i] to destinations[i]
+    pairing: str = "cross"
+    num_points: Optional[int] = None
+    tolerance_km: Optional[float] = None
+    format: str = "points"
+
+
+class FlightRouteItem(BaseModel):
+    origin_index: int
+    destination_index: int
+    route: Optional[List[List[float]]] = None
+    polyline: Optional[str] = None
+    distance_km: float
+
+
+class FlightRoutesResponse(BaseModel):
+    routes: List[FlightRouteItem]
+
+
+def _airport_response(airport: Airport, distance_km: float) -> AirportResponse:
+    return AirportResponse(
+        place_id=f"ourairports:{airport.ident}",
+        name=airport.name,
+        lat=airport.lat,
+        lng=airport.lng,
+        address=", ".join(p for p in (airport.municipality, airport.iso_country) if p) or "Unknown Address",
+        iata_code=airport.iata_code or None,
+        distance_km=round(distance_km, 2),
+    )
+
+
+def _places_fallback_enabled() -> bool:
+    if AIRPORT_PLACES_FALLBACK == "auto":
+        return len(get_airport_index()) == 0
+    return AIRPORT_PLACES_FALLBACK in ("1", "true", "yes")
+
+
+def find_nearest_places_airport(lat: float, lng: float) -> Optional[AirportResponse]:
     """
-    Find the nearest airport to the given coordinates using Google Places API.
-    
-    Args:
-        lat: Latitude of the user's location
-        lng: Longitude of the user's location
-        radius_km: Search radius in kilometers (default 50km, max 50km for Places API)
-    
-    Returns:
-        AirportResponse with airport details, or None if not found
+    Find the nearest airport to the given coordinates using the Google Places API.
+
+    One nearby search ranked by distance (no radius), so the nearest airport is found in a single call
+    however far away it is. Calls share a keep-alive session and are cached per ~1 km cell
+    (utils/places_client.py).
     """
-    # Convert radius from km to meters (Places API uses meters)
-    radius_meters = min(radius_km * 1000, 50000)  # Cap at 50km (API limit)
-    
     api_key = get_gmaps_api_key()
-    url = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
-    params = {
-        "location": f"{lat},{lng}",
-        "radius": radius_meters,
-        "type": "airport",
-        "key": api_key,
-    }
     
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        if data.get("status") != "OK":
-            # Try with a larger radius if no results
-            if radius_km < 200:
-                return find_nearest_airport(lat, lng, radius_km * 2)
-            return None
+        data = places_client.nearby_search(api_key, lat, lng, rankby="distance", type="airport")
         
         results = data.get("results", [])
         if not results:
-            # Try with a larger radius if no results
-            if radius_km < 200:
-                return find_nearest_airport(lat, lng, radius_km * 2)
             return None
         
         # Get the first (nearest) airport
@@ -98,12 +157,32 @@ def find_nearest_airport(lat: float, lng: float, radius_km: int = 50) -> Optiona
             lng=location.get("lng", lng),
             address=airport.get("vicinity", airport.get("formatted_address", "Unknown Address"))
         )
+    except places_client.PlacesError:
+        return None
     except requests.exceptions.RequestException as e:
         raise HTTPException(status_code=500, detail=f"Error calling Google Places API: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing airport data: {str(e)}")
 
 
+def find_nearest_airport(lat: float, lng: float) -> Optional[AirportResponse]:
+    """
+    Find the nearest airport with scheduled service (large or medium) to the given coordinates.
+
+    Answered from the local airport index; Google Places is only asked when AIRPORT_PLACES_FALLBACK
+    allows it.
+
+    Returns:
+        AirportResponse with airport details, or None if not found
+    """
+    found = get_airport_index().nearest(lat, lng, k=1)
+    if found:
+        return _airport_response(*found[0])
+    if _places_fallback_enabled():
+        return find_nearest_places_airport(lat, lng)
+    return None
+
+
 def calculate_great_circle_arc(
     lat1: float, lng1: float,
     lat2: float, lng2: float,
@@ -121,64 +200,44 @@ def calculate_great_circle_arc(
     Returns:
         List of [lat, lng] tuples representing the arc
     """
-    # Convert to radians
-    lat1_rad = math.radians(lat1)
-    lng1_rad = math.radians(lng1)
-    lat2_rad = math.radians(lat2)
-    lng2_rad = math.radians(lng2)
-    
-    # Calculate angular distance using haversine formula
-    d_lat = lat2_rad - lat1_rad
-    d_lng = lng2_rad - lng1_rad
-    
-    a = (math.sin(d_lat / 2) ** 2 +
-         math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(d_lng / 2) ** 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
-    # Generate points along the great circle
-    arc_points = []
-    for i in range(num_points + 1):
-        fraction = i / num_points
-        
-        # Spherical linear interpolation (slerp)
-        A = math.sin((1 - fraction) * c) / math.sin(c)
-        B = math.sin(fraction * c) / math.sin(c)
-        
-        x = (A * math.cos(lat1_rad) * math.cos(lng1_rad) +
-             B * math.cos(lat2_rad) * math.cos(lng2_rad))
-        y = (A * math.cos(lat1_rad) * math.sin(lng1_rad) +
-             B * math.cos(lat2_rad) * math.sin(lng2_rad))
-        z = A * math.sin(lat1_rad) + B * math.sin(lat2_rad)
-        
-        # Convert back to lat/lng
-        lat = math.atan2(z, math.sqrt(x ** 2 + y ** 2))
-        lng = math.atan2(y, x)
-        
-        arc_points.append([math.degrees(lat), math.degrees(lng)])
-    
-    return arc_points
+    return great_circle.arcs(lat1, lng1, lat2, lng2, num_points).tolist()
+
+
+def _check_route_options(num_points: Optional[int], tolerance_km: Optional[float], fmt: str):
+    if fmt not in ROUTE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(ROUTE_FORMATS)}")
+    if num_points is not None and not 1 <= num_points <= 1000:
+        raise HTTPException(status_code=400, detail="num_points must be between 1 and 1000")
+    if tolerance_km is not None and not 0.001 <= tolerance_km <= 1000:
+        raise HTTPException(status_code=400, detail="tolerance_km must be between 0.001 and 1000")
+
+
+def calculate_route_arcs(
+    lat1, lng1, lat2, lng2,
+    num_points: Optional[int] = None,
+    tolerance_km: Optional[float] = None,
+) -> List[np.ndarray]:
+    """
+    Great circle arcs for arrays of origin / destination coordinates: num_points segments each when
+    given, otherwise as few as keep the drawn route within tolerance_km (default ARC_TOLERANCE_KM).
+    """
+    if num_points is not None:
+        lat1, lng1, lat2, lng2 = (np.atleast_1d(np.asarray(a, dtype=np.float64)) for a in (lat1, lng1, lat2, lng2))
+        return list(great_circle.arcs(lat1, lng1, lat2, lng2, num_points))
+    return great_circle.adaptive_arcs(lat1, lng1, lat2, lng2, tolerance_km or ARC_TOLERANCE_KM)
+
+
+def _route_fields(arc: np.ndarray, fmt: str) -> dict:
+    if fmt == "polyline":
+        return {"polyline": polyline.encode(arc.tolist())}
+    return {"route": arc.tolist()}
 
 
 def calculate_distance_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
     """
     Calculate the great circle distance between two points in kilometers.
-    Uses the haversine formula.
     """
-    R = 6371  # Earth's radius in kilometers
-    
-    lat1_rad = math.radians(lat1)
-    lng1_rad = math.radians(lng1)
-    lat2_rad = math.radians(lat2)
-    lng2_rad = math.radians(lng2)
-    
-    d_lat = lat2_rad - lat1_rad
-    d_lng = lng2_rad - lng1_rad
-    
-    a = (math.sin(d_lat / 2) ** 2 +
-         math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(d_lng / 2) ** 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    
-    return R * c
+    return float(great_circle.distance_km(lat1, lng1, lat2, lng2))
 
 
 @router.post("/find-nearest-airport", response_model=AirportResponse)
@@ -186,35 +245,73 @@ def find_nearest_airport_endpoint(location: LocationRequest):
     """
     Find the nearest airport to the user's location.
     
-    This endpoint uses the Google Places API to search for airports near the given coordinates.
+    This endpoint searches the local airport dataset (falling back to the Google Places API when
+    configured to) for the nearest airport with scheduled service.
     """
     airport = find_nearest_airport(location.lat, location.lng)
     
     if not airport:
         raise HTTPException(
             status_code=404,
-            detail="No airport found within search radius. Try a different location."
+            detail="No airport found. Try a different location, or install the airport dataset (python -m utils.airport_index fetch)."
         )
     
     return airport
 
 
+@router.post("/find-nearest-airports", response_model=NearestAirportsResponse)
+def find_nearest_airports_endpoint(request: NearestAirportsRequest):
+    """
+    The k nearest airports for each of many locations, filtered by size and scheduled service.
+    Locations the local index cannot answer use Google Places (nearest only) when configured to.
+    """
+    if not request.locations:
+        raise HTTPException(status_code=400, detail="locations must not be empty")
+    if len(request.locations) > MAX_BATCH_AIRPORT_POINTS:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_BATCH_AIRPORT_POINTS} locations per request")
+    if not 1 <= request.k <= 50:
+        raise HTTPException(status_code=400, detail="k must be between 1 and 50")
+    unknown = [size for size in request.sizes if size not in SIZE_TYPES]
+    if unknown or not request.sizes:
+        raise HTTPException(status_code=400, detail=f"sizes must be a non-empty list of: {', '.join(SIZE_TYPES)}")
+
+    found = get_airport_index().nearest_many(
+        [loc.lat for loc in request.locations],
+        [loc.lng for loc in request.locations],
+        k=request.k,
+        sizes=request.sizes,
+        scheduled_only=request.scheduled_only,
+    )
+    results = []
+    for i, (location, airports) in enumerate(zip(request.locations, found)):
+        items = [_airport_response(airport, distance) for airport, distance in airports]
+        if not items and _places_fallback_enabled():
+            fallback = find_nearest_places_airport(location.lat, location.lng)
+            items = [fallback] if fallback else []
+        results.append(NearestAirportsItem(location_index=i, airports=items))
+    return NearestAirportsResponse(results=results)
+
+
 @router.post("/flight-route", response_model=FlightRouteResponse)
 def get_flight_route(request: FlightRouteRequest):
     """
     Calculate a flight route (great circle arc) between origin and destination.
     
     This endpoint calculates a curved path representing a flight route between two points.
-    The route follows a great circle, which is the shortest path on a sphere.
+    The route follows a great circle, which is the shortest path on a sphere. The number of points
+    grows with the distance (see tolerance_km) unless num_points is given; format="polyline" returns
+    the route as a Google encoded polyline instead of [lat, lng] pairs.
     """
     origin = request.origin
     destination = request.destination
+    _check_route_options(request.num_points, request.tolerance_km, request.format)
     
     # Calculate the great circle arc
-    route = calculate_great_circle_arc(
+    arc = calculate_route_arcs(
         origin.lat, origin.lng,
-        destination.lat, destination.lng
-    )
+        destination.lat, destination.lng,
+        request.num_points, request.tolerance_km
+    )[0]
     
     # Calculate distance
     distance_km = calculate_distance_km(
@@ -223,9 +320,50 @@ def get_flight_route(request: FlightRouteRequest):
     )
     
     return FlightRouteResponse(
-        route=route,
+        **_route_fields(arc, request.format),
         distance_km=round(distance_km, 2),
         origin=origin,
         destination=destination
     )
 
+
+@router.post("/flight-routes", response_model=FlightRoutesResponse)
+def get_flight_routes(request: FlightRoutesRequest):
+    """
+    Flight routes for many origins at once (e.g. everyone in a room flying to one destination).
+
+    With pairing="cross" (default) every origin is routed to every destination; with "pairwise",
+    origins[i] is routed to destinations[i]. All arcs and distances are computed in one vectorized pass
+    (one per distinct point count when the counts are adaptive).
+    """
+    if not request.origins or not request.destinations:
+        raise HTTPException(status_code=400, detail="origins and destinations must not be empty")
+    if request.pairing not in ("cross", "pairwise"):
+        raise HTTPException(status_code=400, detail="pairing must be 'cross' or 'pairwise'")
+    _check_route_options(request.num_points, request.tolerance_km, request.format)
+
+    origins = np.array([[o.lat, o.lng] for o in request.origins], dtype=np.float64)
+    destinations = np.array([[d.lat, d.lng] for d in request.destinations], dtype=np.float64)
+    if request.pairing == "pairwise":
+        if len(origins) != len(destinations):
+            raise HTTPException(status_code=400, detail="pairwise pairing needs as many destinations as origins")
+        origin_idx = np.arange(len(origins))
+        destination_idx = np.arange(len(destinations))
+    else:
+        origin_idx, destination_idx = (a.ravel() for a in np.meshgrid(np.arange(len(origins)), np.arange(len(destinations)), indexing="ij"))
+    if len(origin_idx) > MAX_BATCH_ROUTES:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_BATCH_ROUTES} routes per request")
+
+    o, d = origins[origin_idx], destinations[destination_idx]
+    routes = calculate_route_arcs(o[:, 0], o[:, 1], d[:, 0], d[:, 1], request.num_points, request.tolerance_km)
+    distances = great_circle.distance_km(o[:, 0], o[:, 1], d[:, 0], d[:, 1])
+
+    return FlightRoutesResponse(routes=[
+        FlightRouteItem(
+            origin_index=int(i),
+            destination_index=int(j),
+            **_route_fields(arc, request.format),
+            distance_km=round(distance, 2),
+        )
+        for i, j, arc, distance in zip(origin_idx.tolist(), destination_idx.tolist(), routes, distances.tolist())
+    ])
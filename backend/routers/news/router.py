@@ -1,11 +1,26 @@
 import os
-from typing import Optional
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
 
 import json
 import requests
 from dotenv import load_dotenv, find_dotenv
 from fastapi import APIRouter, HTTPException, Query
 
+from utils.gazetteer import get_gazetteer
+from utils.news_index import QuerySyntaxError, get_news_index
+from utils.news_store import (
+    DEFAULT_QUERY,
+    NEWS_INGEST_INTERVAL,
+    NEWS_INGEST_LANGUAGE,
+    NewsAPIError,
+    NewsIngester,
+    fetch_everything,
+    get_news_store,
+)
+from utils.ttl_cache import TTLCache
+
 try:
     from supabase import create_client  # supabase-py
 except Exception:
@@ -19,15 +34,31 @@ else:
     load_dotenv()
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# "local": answer from the ingested article index (utils/news_index.py) once it has been filled,
+# "newsapi": always ask NewsAPI (through the cache below)
+NEWS_SOURCE = os.getenv("NEWS_SOURCE", "local").strip().lower()
+
+# Live NewsAPI results (used until the first ingest, and for languages that are not ingested) are
+# shared by everyone asking the same (query, language, page, page_size): fresh for NEWS_CACHE_TTL
+# seconds, reloaded in the background when read in the last NEWS_CACHE_REFRESH_AHEAD fraction of
+# that, and served up to NEWS_CACHE_STALE_TTL seconds past expiry when NewsAPI fails.
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "600"))
+NEWS_CACHE_REFRESH_AHEAD = float(os.getenv("NEWS_CACHE_REFRESH_AHEAD", "0.2"))
+NEWS_CACHE_STALE_TTL = float(os.getenv("NEWS_CACHE_STALE_TTL", str(6 * 3600)))
 
-NEWS_API_BASE = "https://newsapi.org/v2"
-DEFAULT_QUERY = (
-    "earthquake OR flood OR hurricane OR wildfire OR tsunami OR volcano OR "
-    "landslide OR drought OR disaster relief OR humanitarian crisis OR "
-    "pandemic OR epidemic OR disease outbreak OR health emergency OR "
-    "pharmaceutical OR pharma"
+news_cache = TTLCache(
+    "news",
+    ttl=NEWS_CACHE_TTL,
+    max_entries=1000,
+    refresh_ahead=NEWS_CACHE_REFRESH_AHEAD,
+    stale_ttl=NEWS_CACHE_STALE_TTL,
 )
 
+_ingester: Optional[NewsIngester] = None
+
+
 # Supabase (optional)
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = (
@@ -40,6 +71,17 @@ PREFS_TABLE = os.getenv("NEWS_PREFS_TABLE", "user_preferences")
 PREFS_USER_COLUMN = os.getenv("NEWS_PREFS_USER_COLUMN", "user_id")
 PREFS_COLUMN = os.getenv("NEWS_PREFS_COLUMN", "preferences")
 
+# Normalized preferences per user id: fresh for NEWS_PREFS_CACHE_TTL seconds (or until invalidated),
+# and served up to NEWS_PREFS_STALE_TTL seconds longer while Supabase is failing. Errors are not cached.
+NEWS_PREFS_CACHE_TTL = float(os.getenv("NEWS_PREFS_CACHE_TTL", "300"))
+NEWS_PREFS_STALE_TTL = float(os.getenv("NEWS_PREFS_STALE_TTL", str(24 * 3600)))
+# user ids per `in_` query in load_user_preferences_many
+NEWS_PREFS_BATCH_SIZE = int(os.getenv("NEWS_PREFS_BATCH_SIZE", "200"))
+
+prefs_cache = TTLCache("news_prefs", ttl=NEWS_PREFS_CACHE_TTL, stale_ttl=NEWS_PREFS_STALE_TTL)
+
+_NOT_CACHED = object()
+
 supabase = None
 if create_client and SUPABASE_URL and SUPABASE_KEY:
     try:
@@ -70,45 +112,129 @@ def _normalize_preferences(raw):
     return [str(raw).strip()] if str(raw).strip() else []
 
 
-def _fetch_user_preferences(user_id: str):
+class PreferencesError(RuntimeError):
+    """Supabase could not be asked for preferences (not cached)."""
+
+
+def _prefs_rows(query) -> list:
+    try:
+        res = query.execute()
+    except Exception as exc:
+        raise PreferencesError(f"Supabase preferences query failed: {exc}") from exc
+    if isinstance(res, dict):
+        data, error = res.get("data"), res.get("error")
+    else:
+        data, error = getattr(res, "data", None), getattr(res, "error", None)
+    if error:
+        raise PreferencesError(f"Supabase preferences query failed: {error}")
+    return data or []
+
+
+def _row_value(row, column: str):
+    return row.get(column) if isinstance(row, dict) else getattr(row, column, None)
+
+
+def load_user_preferences(user_id: str):
+    """
+    The user's normalized preference terms ([] when they have none), cached per user id.
+    Raises PreferencesError when Supabase fails and nothing (not even a stale entry) is cached.
+    """
     if not supabase or not user_id:
         return []
-    try:
-        res = (
-            supabase.table(PREFS_TABLE)
-            .select(PREFS_COLUMN)
-            .eq(PREFS_USER_COLUMN, user_id)
-            .single()
-            .execute()
+    user_id = str(user_id)
+
+    def load():
+        rows = _prefs_rows(
+            supabase.table(PREFS_TABLE).select(PREFS_COLUMN).eq(PREFS_USER_COLUMN, user_id).limit(1)
         )
-        data = None
-        error = None
-        if isinstance(res, dict):
-            data = res.get("data")
-            error = res.get("error")
+        return _normalize_preferences(_row_value(rows[0], PREFS_COLUMN)) if rows else []
+
+    return prefs_cache.get_or_load(user_id, load)
+
+
+def load_user_preferences_many(user_ids):
+    """
+    Normalized preferences for many users (e.g. for digest jobs): cached users are answered from the
+    cache, the rest with one `in_` query per NEWS_PREFS_BATCH_SIZE ids. Returns {user_id: terms}.
+    Raises PreferencesError when a query fails (results of earlier batches stay cached).
+    """
+    ids = list(dict.fromkeys(str(u) for u in user_ids if u))
+    if not supabase:
+        return {u: [] for u in ids}
+    out = {}
+    missing = []
+    for user_id in ids:
+        cached = prefs_cache.get(user_id, _NOT_CACHED)
+        if cached is _NOT_CACHED:
+            missing.append(user_id)
         else:
-            data = getattr(res, "data", None)
-            error = getattr(res, "error", None)
-        if error or not data:
-            return []
-        raw = data.get(PREFS_COLUMN) if isinstance(data, dict) else getattr(data, PREFS_COLUMN, None)
-        return _normalize_preferences(raw)
-    except Exception:
+            out[user_id] = cached
+    for start in range(0, len(missing), max(1, NEWS_PREFS_BATCH_SIZE)):
+        batch = missing[start:start + max(1, NEWS_PREFS_BATCH_SIZE)]
+        rows = _prefs_rows(
+            supabase.table(PREFS_TABLE).select(f"{PREFS_USER_COLUMN}, {PREFS_COLUMN}").in_(PREFS_USER_COLUMN, batch)
+        )
+        found = {}
+        for row in rows:
+            found.setdefault(str(_row_value(row, PREFS_USER_COLUMN)), _normalize_preferences(_row_value(row, PREFS_COLUMN)))
+        for user_id in batch:
+            out[user_id] = found.get(user_id, [])
+            prefs_cache.set(user_id, out[user_id])
+    return out
+
+
+def invalidate_user_preferences(user_id: Optional[str] = None):
+    """Forget cached preferences for `user_id` (everyone when None), e.g. after they were edited."""
+    prefs_cache.invalidate(str(user_id) if user_id is not None else None)
+
+
+def _fetch_user_preferences(user_id: str):
+    try:
+        return load_user_preferences(user_id)
+    except PreferencesError as exc:
+        # news without the preference filter beats no news
+        logger.warning("Could not load preferences for user %s: %s", user_id, exc)
         return []
 
 
-def _build_query(base_query: str, preferences):
-    if not preferences:
-        return base_query
+def _preference_clause(preferences) -> str:
     def _quote(term: str) -> str:
         t = term.strip()
         return f'"{t}"' if " " in t else t
-    pref_clause = " OR ".join(_quote(p) for p in preferences if p.strip())
+    return " OR ".join(_quote(p) for p in preferences or [] if p.strip())
+
+
+def _build_query(base_query: str, preferences):
+    pref_clause = _preference_clause(preferences)
     if not pref_clause:
         return base_query
     return f"({base_query}) AND ({pref_clause})"
 
 
+def _fetch_everything(api_key: str, query: str, language: str, page: int, page_size: int) -> Dict[str, Any]:
+    """
+    NewsAPI /everything results as {"totalResults", "articles"} (articles normalized), through the
+    shared cache. Raises requests exceptions or NewsAPIError when NewsAPI fails and nothing is cached.
+    """
+    query = " ".join(query.split())
+    language = language.strip().lower()
+    return news_cache.get_or_load(
+        f"{query}|{language}|{page}|{page_size}",
+        lambda: fetch_everything(api_key, query, language, page, page_size),
+    )
+
+
+@router.on_event("startup")
+def _start_news_ingester():
+    """Keep the local article store filled from NewsAPI (every NEWS_INGEST_INTERVAL seconds)."""
+    global _ingester
+    api_key = os.getenv("NEWS_API_KEY")
+    if NEWS_SOURCE != "local" or NEWS_INGEST_INTERVAL <= 0 or not api_key or _ingester is not None:
+        return
+    _ingester = NewsIngester(get_news_store(), api_key, NEWS_INGEST_INTERVAL)
+    _ingester.start()
+
+
 @router.get("/recommended")
 def get_recommended_news(
     q: Optional[str] = Query(None, description="Search query to override defaults"),
@@ -117,49 +243,93 @@ def get_recommended_news(
     page_size: int = Query(20, ge=1, le=100),
     language: str = Query("en"),
 ):
-    api_key = os.getenv("NEWS_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=500, detail="NEWS_API_KEY is not set")
+    """
+    Newest disaster / humanitarian news, narrowed to the user's preference terms (any of them).
 
+    Once the ingester has filled the local store, `q` and the preferences are evaluated against the
+    local article index (title and description) instead of calling NewsAPI.
+    """
     preferences = _fetch_user_preferences(user_id) if user_id else []
     query = _build_query(q or DEFAULT_QUERY, preferences)
 
-    params = {
-        "q": query,
-        "language": language,
-        "sortBy": "publishedAt",
-        "pageSize": page_size,
-        "page": page,
-        "apiKey": api_key,
-    }
+    if NEWS_SOURCE == "local" and language.strip().lower() == NEWS_INGEST_LANGUAGE and get_news_store().ingested_at():
+        # every stored article came from the DEFAULT_QUERY feed, so only an explicit q needs matching
+        local_query = _build_query(q, preferences) if q else _preference_clause(preferences)
+        try:
+            articles, total = get_news_index().search(local_query, page, page_size)
+        except QuerySyntaxError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        return {
+            "query": query,
+            "preferences": preferences,
+            "totalResults": total,
+            "articles": articles,
+        }
+
+    api_key = os.getenv("NEWS_API_KEY")
+    if not api_key:
+        raise HTTPException(status_code=500, detail="NEWS_API_KEY is not set")
 
     try:
-        resp = requests.get(f"{NEWS_API_BASE}/everything", params=params, timeout=15)
-        resp.raise_for_status()
+        data = _fetch_everything(api_key, query, language, page, page_size)
     except requests.RequestException as exc:
         raise HTTPException(status_code=502, detail=f"NewsAPI request failed: {exc}")
-
-    data = resp.json()
-    if data.get("status") != "ok":
-        raise HTTPException(status_code=502, detail=data.get("message", "NewsAPI error"))
-
-    articles = data.get("articles", [])
-    normalized = [
-        {
-            "title": a.get("title"),
-            "description": a.get("description"),
-            "url": a.get("url"),
-            "imageUrl": a.get("urlToImage"),
-            "publishedAt": a.get("publishedAt"),
-            "source": (a.get("source") or {}).get("name"),
-            "author": a.get("author"),
-        }
-        for a in articles
-    ]
+    except NewsAPIError as exc:
+        raise HTTPException(status_code=502, detail=str(exc))
 
     return {
-        "query": params["q"],
+        "query": query,
         "preferences": preferences,
-        "totalResults": data.get("totalResults", 0),
-        "articles": normalized,
+        "totalResults": data["totalResults"],
+        "articles": data["articles"],
     }
+
+
+@router.post("/preferences/{user_id}/invalidate")
+def invalidate_preferences(user_id: str):
+    """Drop the cached preferences of `user_id`; call after the user edits them so the next request reloads."""
+    invalidate_user_preferences(user_id)
+    return {"invalidated": user_id}
+
+
+@router.get("/heatmap")
+def get_news_heatmap(
+    q: Optional[str] = Query(None, description="Only count articles matching this query (NewsAPI syntax)"),
+    days: Optional[float] = Query(None, gt=0, le=365, description="Only count articles from the last `days` days"),
+):
+    """
+    Geotagged article counts per country, for a heatmap layer on the globe. Each country comes with
+    its centroid; counts cover the locally ingested articles (or, before the first ingest, the latest
+    page of the default feed from NewsAPI).
+    """
+    since = None
+    if days is not None:
+        since = (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    if NEWS_SOURCE == "local" and get_news_store().ingested_at():
+        index = get_news_index()
+        try:
+            counts = index.country_counts(q, since)
+        except QuerySyntaxError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+    else:
+        api_key = os.getenv("NEWS_API_KEY")
+        if not api_key:
+            raise HTTPException(status_code=500, detail="NEWS_API_KEY is not set")
+        try:
+            data = _fetch_everything(api_key, q or DEFAULT_QUERY, NEWS_INGEST_LANGUAGE, 1, 100)
+        except requests.RequestException as exc:
+            raise HTTPException(status_code=502, detail=f"NewsAPI request failed: {exc}")
+        except NewsAPIError as exc:
+            raise HTTPException(status_code=502, detail=str(exc))
+        counts = {}
+        for article in data["articles"]:
+            if article.get("country") and (since is None or (article.get("publishedAt") or "") >= since):
+                counts[article["country"]] = counts.get(article["country"], 0) + 1
+
+    gazetteer = get_gazetteer()
+    countries = [
+        {"country": country, "count": count, "latlon": gazetteer.country_centroid(country)}
+        for country, count in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))
+    ]
+    return {"countries": countries, "total": sum(counts.values())}
@@ -0,0 +1 @@
+# Opportunities query API router
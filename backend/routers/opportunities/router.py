@@ -0,0 +1,222 @@
+# backend/routers/opportunities/router.py
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Header, HTTPException, Query, Response
+from pydantic import BaseModel, Field
+
+from utils.opportunity_clusters import CLUSTER_MAX_ZOOM, InvalidClusterId, get_cluster_index
+from utils.opportunity_distances import get_distance_matrix
+from utils.opportunity_index import InvalidCursor, decode_cursor, encode_cursor, get_opportunity_index
+from utils.opportunity_snapshot import FORMATS, etag_matches, get_snapshot_cache
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+MAX_PAGE_SIZE = 1000
+MAX_NEAREST_ORIGINS = 1000
+MAX_NEAREST_K = 100
+
+
+class OpportunityPage(BaseModel):
+    # opportunities.json records ({"latlon", "country", "link", "name"}), plus "distance_km" for radius queries
+    items: List[Dict[str, Any]]
+    # pass back as `cursor` to get the next page; null on the last page
+    next_cursor: Optional[str] = None
+    # number of opportunities matching the filters (across all pages)
+    total: int
+    # store revision the results were read at
+    revision: int
+
+
+class ClusterResponse(BaseModel):
+    zoom: int
+    # {"type": "cluster", "id", "count", "latlon", "expansion_zoom"} or
+    # {"type": "point", "id": null, "count": 1, "latlon", "opportunity": <opportunities.json record>}
+    features: List[Dict[str, Any]]
+    # store revision the clusters were built at
+    revision: int
+
+
+class NearestOrigin(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+
+
+class NearestRequest(BaseModel):
+    origins: List[NearestOrigin]
+    k: int = Field(10, ge=1, le=MAX_NEAREST_K)
+    max_distance_km: Optional[float] = Field(None, gt=0)
+    country: Optional[str] = None
+    # restrict the search to these opportunities (store ids or links), e.g. ranked_ids from rank-opportunities
+    ids: Optional[List[str]] = None
+
+
+class NearestResult(BaseModel):
+    origin: NearestOrigin
+    # opportunities.json records plus "id" (store id, usable as a rank-opportunities id) and "distance_km",
+    # nearest first
+    items: List[Dict[str, Any]]
+
+
+class NearestResponse(BaseModel):
+    results: List[NearestResult]
+    # store revision the distances were computed at
+    revision: int
+
+
+def _parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be 'west,south,east,north' in degrees")
+    if not (-90 <= south <= north <= 90) or not (-180 <= west <= 180 and -180 <= east <= 180):
+        raise HTTPException(status_code=400, detail="bbox out of range (lat -90..90, lon -180..180, south <= north)")
+    return west, south, east, north
+
+
+@router.get("", response_model=OpportunityPage)
+def query_opportunities(
+    bbox: Optional[str] = Query(None, description="Bounding box 'west,south,east,north'; west > east crosses the antimeridian"),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Centre latitude for a radius query"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Centre longitude for a radius query"),
+    radius_km: Optional[float] = Query(None, gt=0, le=20038, description="Radius around lat/lon in kilometres"),
+    country: Optional[str] = Query(None, min_length=1, description="Country name, e.g. 'United Kingdom'"),
+    name_prefix: Optional[str] = Query(None, min_length=1, description="Case-insensitive prefix of the opportunity name"),
+    limit: int = Query(200, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+):
+    """
+    Query stored opportunities by bounding box, radius, country and/or name prefix (all filters combine).
+
+    Results are ordered by when each opportunity was first stored, so pages stay stable while new
+    opportunities are added: follow `next_cursor` until it is null.
+    """
+    near = None
+    if lat is not None or lon is not None or radius_km is not None:
+        if lat is None or lon is None or radius_km is None:
+            raise HTTPException(status_code=400, detail="lat, lon and radius_km must be given together")
+        near = (lat, lon, radius_km)
+
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except InvalidCursor as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    index = get_opportunity_index()
+    page, next_after, total = index.query(
+        bbox=_parse_bbox(bbox) if bbox else None,
+        near=near,
+        country=country,
+        name_prefix=name_prefix,
+        limit=limit,
+        after=after,
+    )
+
+    items = []
+    for item, distance in page:
+        record = dict(item.record)
+        if distance is not None:
+            record["distance_km"] = round(distance, 3)
+        items.append(record)
+
+    return OpportunityPage(
+        items=items,
+        next_cursor=encode_cursor(next_after) if next_after is not None else None,
+        total=total,
+        revision=index.revision,
+    )
+
+
+@router.post("/nearest", response_model=NearestResponse)
+def nearest_opportunities(req: NearestRequest):
+    """
+    The k nearest stored opportunities to each origin, nearest first (one result per origin, in order).
+
+    Each item carries an `id` and its name / link / country, so results can be sent straight to
+    /api/gemini/rank-opportunities; pass ranked ids back as `ids` to get the nearest of those only.
+    """
+    if not req.origins:
+        raise HTTPException(status_code=400, detail="origins must not be empty")
+    if len(req.origins) > MAX_NEAREST_ORIGINS:
+        raise HTTPException(status_code=400, detail=f"at most {MAX_NEAREST_ORIGINS} origins per request")
+
+    matrix = get_distance_matrix()
+    nearest = matrix.nearest(
+        [o.lat for o in req.origins],
+        [o.lon for o in req.origins],
+        k=req.k,
+        max_distance_km=req.max_distance_km,
+        country=req.country,
+        ids=req.ids,
+    )
+
+    results = []
+    for origin, matches in zip(req.origins, nearest):
+        items = []
+        for item, distance in matches:
+            record = dict(item.record)
+            record["id"] = item.link_key
+            record["distance_km"] = round(distance, 3)
+            items.append(record)
+        results.append(NearestResult(origin=origin, items=items))
+    return NearestResponse(results=results, revision=matrix.revision)
+
+
+@router.get("/clusters", response_model=ClusterResponse)
+def get_clusters(
+    zoom: int = Query(..., ge=0, le=CLUSTER_MAX_ZOOM, description="Map zoom level"),
+    bbox: Optional[str] = Query(None, description="Bounding box 'west,south,east,north'; omit for the whole world"),
+):
+    """
+    Marker clusters at `zoom` inside `bbox`. Clusters carry a count, a centroid and the zoom at which
+    they split (`expansion_zoom`); pass a cluster's `id` to /clusters/{id}/children to expand it.
+    Cells holding a single opportunity are returned as points.
+    """
+    index = get_cluster_index()
+    features = index.clusters(zoom, _parse_bbox(bbox) if bbox else None)
+    return ClusterResponse(zoom=zoom, features=features, revision=index.revision)
+
+
+@router.get("/clusters/{cluster_id}/children", response_model=ClusterResponse)
+def get_cluster_children(cluster_id: str):
+    """The clusters / points one zoom level below `cluster_id` (its individual points at the finest zoom)."""
+    index = get_cluster_index()
+    try:
+        zoom = min(int(cluster_id.split("-")[0]) + 1, CLUSTER_MAX_ZOOM)
+        features = index.children(cluster_id)
+    except (InvalidClusterId, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"cluster {cluster_id} not found (the data may have changed; re-query /clusters)")
+    return ClusterResponse(zoom=zoom, features=features, revision=index.revision)
+
+
+@router.get("/snapshot")
+def get_snapshot(
+    format: str = Query("json", description="'json' (minified opportunities.json) or 'columnar' (packed binary, see utils/opportunity_snapshot.py)"),
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+):
+    """
+    The whole dataset in a compact form, precompressed (br or gzip, per Accept-Encoding) and rebuilt
+    only when the store changes. Responses carry a strong ETag; send it back in If-None-Match and an
+    unchanged snapshot costs a 304 with no body.
+    """
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(FORMATS)}")
+    cache = get_snapshot_cache()
+    variant = cache.get(format, accept_encoding)
+    headers = {
+        "ETag": variant.etag,
+        "Cache-Control": "no-cache",   # always revalidate; a match costs only the 304
+        "Vary": "Accept-Encoding",
+        "X-Store-Revision": str(cache.revision),
+    }
+    if etag_matches(if_none_match, variant.etag):
+        return Response(status_code=304, headers=headers)
+    if variant.encoding != "identity":
+        headers["Content-Encoding"] = variant.encoding
+    return Response(content=variant.body, media_type=variant.media_type, headers=headers)
@@ -0,0 +1 @@
+# Trip planning router
@@ -0,0 +1,155 @@
+# backend/routers/trips/router.py
+import logging
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from routers.gemini.hotel_recommendations import HotelRecommendationResponse, generate_hotel_recommendation
+from routers.gmap.router import (
+    AirportResponse,
+    FlightRouteRequest,
+    FlightRouteResponse,
+    LocationRequest,
+    find_nearest_airport,
+    get_flight_route,
+)
+from utils.deadline import Deadline
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Overall time budget (seconds) for a trip plan when the request does not give one
+TRIP_PLAN_BUDGET = float(os.environ.get("TRIP_PLAN_BUDGET", "15"))
+MAX_TRIP_PLAN_BUDGET = 60.0
+# Threads shared by all trip plans; sections queue when they are busy, so load cannot spawn unbounded threads
+TRIP_PLAN_WORKERS = int(os.environ.get("TRIP_PLAN_WORKERS", "16"))
+
+SECTIONS = ("origin_airport", "destination_airport", "route", "hotels")
+
+_executor = ThreadPoolExecutor(max_workers=max(1, TRIP_PLAN_WORKERS), thread_name_prefix="trip-plan")
+
+
+class TripPlanRequest(BaseModel):
+    origin: LocationRequest
+    destination: LocationRequest
+    # place name for the hotel recommendations (e.g. "Shinjuku, Tokyo, Japan"); hotels are skipped without it
+    destination_name: Optional[str] = None
+    # seconds to wait for all sections; whatever is not ready by then is reported as "timeout"
+    time_budget: Optional[float] = None
+    # route options, as for /api/gmap/flight-route
+    num_points: Optional[int] = None
+    tolerance_km: Optional[float] = None
+    format: str = "points"
+
+
+class TripPlanResponse(BaseModel):
+    origin_airport: Optional[AirportResponse] = None
+    destination_airport: Optional[AirportResponse] = None
+    route: Optional[FlightRouteResponse] = None
+    hotels: Optional[HotelRecommendationResponse] = None
+    # per section: "ok", "not_found", "skipped", "timeout" or "error"
+    status: Dict[str, str]
+    # error messages for sections with status "error"
+    errors: Dict[str, str] = {}
+    elapsed_ms: int
+
+
+def _hotels(req: TripPlanRequest, deadline: Deadline) -> HotelRecommendationResponse:
+    # the Gemini call gets the rest of the budget as its request timeout, so an abandoned call still ends
+    recommendation = generate_hotel_recommendation(
+        req.destination_name, req.destination.lat, req.destination.lng, timeout=deadline.remaining()
+    )
+    return HotelRecommendationResponse(recommendation=recommendation)
+
+
+def _route(req: TripPlanRequest) -> FlightRouteResponse:
+    return get_flight_route(FlightRouteRequest(
+        origin=req.origin,
+        destination=req.destination,
+        num_points=req.num_points,
+        tolerance_km=req.tolerance_km,
+        format=req.format,
+    ))
+
+
+def _run_section(fn: Callable[[], Any], deadline: Deadline) -> Any:
+    # a section that only got a worker after the plan gave up is skipped instead of run for nobody
+    if deadline.expired():
+        raise TimeoutError("trip plan budget exhausted before the section started")
+    return fn()
+
+
+def _error_message(exc: BaseException) -> str:
+    if isinstance(exc, HTTPException):
+        return str(exc.detail)
+    return f"{type(exc).__name__}: {exc}"
+
+
+@router.post("/plan", response_model=TripPlanResponse)
+def plan_trip(req: TripPlanRequest):
+    """
+    Everything the globe needs for a trip in one call: the nearest airports to the origin and the
+    destination, the flight route between the two points and hotel recommendations at the destination.
+
+    The four lookups are independent, so they run concurrently under one deadline (time_budget, default
+    TRIP_PLAN_BUDGET) on a shared pool of TRIP_PLAN_WORKERS threads: the response takes as long as the
+    slowest section, not the sum of all four.
+    Sections that fail or are not ready in time come back as null, with the reason under `status`
+    (and `errors`), while the rest of the plan is still returned.
+    """
+    budget = TRIP_PLAN_BUDGET if req.time_budget is None else req.time_budget
+    if not 0 < budget <= MAX_TRIP_PLAN_BUDGET:
+        raise HTTPException(status_code=400, detail=f"time_budget must be between 0 and {MAX_TRIP_PLAN_BUDGET:g} seconds")
+    deadline = Deadline(budget)
+    started = time.monotonic()
+
+    tasks: Dict[str, Callable[[], Any]] = {
+        "origin_airport": lambda: find_nearest_airport(req.origin.lat, req.origin.lng),
+        "destination_airport": lambda: find_nearest_airport(req.destination.lat, req.destination.lng),
+        "route": lambda: _route(req),
+    }
+    status: Dict[str, str] = {}
+    if req.destination_name and req.destination_name.strip():
+        tasks["hotels"] = lambda: _hotels(req, deadline)
+    else:
+        status["hotels"] = "skipped"
+
+    sections: Dict[str, Any] = {}
+    errors: Dict[str, str] = {}
+    futures: Dict[Future, str] = {}
+    try:
+        for name, fn in tasks.items():
+            futures[_executor.submit(_run_section, fn, deadline)] = name
+        # unfinished lookups are discarded: queued ones are cancelled below, running ones end on their
+        # own (the hotel call's timeout is the remaining budget)
+        done, _ = wait(futures, timeout=deadline.remaining())
+        for future in done:
+            name = futures[future]
+            try:
+                sections[name] = future.result()
+            except Exception as exc:
+                logger.warning("Trip plan section %s failed: %s", name, exc)
+                status[name] = "error"
+                errors[name] = _error_message(exc)
+                continue
+            status[name] = "ok" if sections[name] is not None else "not_found"
+    finally:
+        for future in futures:
+            future.cancel()
+
+    for name in SECTIONS:
+        status.setdefault(name, "timeout")
+    timed_out = [name for name in SECTIONS if status[name] == "timeout"]
+    if timed_out:
+        logger.warning("Trip plan returned without %s after %.1fs budget", ", ".join(timed_out), budget)
+
+    return TripPlanResponse(
+        **{name: sections.get(name) for name in SECTIONS},
+        status={name: status[name] for name in SECTIONS},
+        errors=errors,
+        elapsed_ms=int((time.monotonic() - started) * 1000),
+    )
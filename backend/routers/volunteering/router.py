@@ -1,9 +1,10 @@
 # backend/routers/volunteering/router.py
 import os
 import time
+import logging
 import urllib.parse
 import platform
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set
 
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
@@ -18,15 +19,39 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 
+from utils.crawl_scheduler import BudgetExceeded, CrawlSlotTimeout, crawl_scheduler
+from utils.deadline import Deadline
+from utils.opportunity_details import fetch_opportunity_details
+from utils.opportunity_store import get_opportunity_store
+
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 IDEALIST_BASE = "https://www.idealist.org"
 
 
+def _idealist_base() -> str:
+    """
+    Base URL the scraper talks to. Defaults to the live site; set IDEALIST_BASE_URL to point the
+    scraper at another host (e.g. the fixture replay server in backend/tools/idealist_replay.py).
+    """
+    return os.environ.get("IDEALIST_BASE_URL", IDEALIST_BASE).rstrip("/") or IDEALIST_BASE
+
+# Query param asking Idealist to order results newest-first (used by incremental mode so
+# that fresh listings land on the first pages and we can stop at the first fully-known page)
+NEWEST_FIRST_PARAM = ("sort", "newest")
+
+
 class SearchResponse(BaseModel):
     country: str
     found: int
     links: List[str]
+    # True when only links not already in the opportunity store were returned
+    incremental: bool = False
+    # True when the time budget ran out and `links` holds only what was collected so far
+    partial: bool = False
+    # Number of result pages loaded
+    pages: int = 0
 
 
 class OpportunityLocation(BaseModel):
@@ -143,21 +168,75 @@ def _update_query_param(url: str, key: str, value: Any) -> str:
     return new
 
 
+def _load_known_links(country: str) -> Set[str]:
+    """
+    Return the set of links already stored under `country` in the opportunity store. Provisional rows
+    (pinned at the country centroid because Gemini never answered for them) are not "known", so
+    incremental scrapes return them again and they get re-geocoded.
+    An unreadable store is treated as "nothing known" so incremental mode degrades to a full scrape.
+    """
+    try:
+        return get_opportunity_store().links_for_country(country, include_provisional=False)
+    except Exception:
+        logger.exception("Could not read the opportunity store; incremental scrape will treat all links as new")
+        return set()
+
+
+def _load_within_budget(driver, url: str, deadline: Deadline, key: str = "", page_load_timeout: float = 30.0):
+    """
+    driver.get(url) through the shared crawl scheduler, with the slot wait and the page-load timeout
+    clamped to the remaining budget. Raises selenium's TimeoutException when the budget runs out.
+
+    Running out of budget is the caller's doing, not the host's: it is raised before taking a slot, or
+    as BudgetExceeded inside it (a page load cut short by the clamp), so it never slows other crawls.
+    """
+    if deadline.expired():
+        raise TimeoutException("time budget exhausted")
+    try:
+        with crawl_scheduler.slot(url, key=key, timeout=deadline.remaining()):
+            clamped = False
+            if deadline.bounded:
+                remaining = deadline.remaining()
+                if remaining <= 0:
+                    raise BudgetExceeded("time budget exhausted")
+                clamped = remaining < page_load_timeout
+                driver.set_page_load_timeout(min(page_load_timeout, remaining))
+            try:
+                driver.get(url)
+            except TimeoutException as exc:
+                if clamped:
+                    raise BudgetExceeded(f"page load cut short by the time budget: {exc}")
+                raise
+    except (CrawlSlotTimeout, BudgetExceeded) as exc:
+        raise TimeoutException(str(exc))
+
+
 @router.get("/search", response_model=SearchResponse)
 def search_volunteer_links(
     country: str = Query(..., min_length=1, description="Country or location to search, e.g. 'Japan'"),
     limit: Optional[int] = Query(None, ge=1, le=200, description="Optional max number of links to return"),
+    incremental: bool = Query(False, description="Only return links not already stored for this country"),
+    time_budget: Optional[float] = Query(None, gt=0, le=300, description="Optional wall-clock budget in seconds; returns partial results when exceeded"),
 ):
     """
     Search Idealist volunteer listings for a given country and return the listing links.
     This version paginates until the site shows the "no results" empty state, or until a safe page cap.
+
+    In incremental mode the results are requested newest-first, links already stored under the country
+    in the opportunity store are skipped, and pagination stops at the first page made up entirely
+    of known links. Only the new links (the delta) are returned.
+
+    With `time_budget`, page loads, waits and the typed-location fallback are all clamped to the remaining
+    budget; once it runs out the links collected so far are returned with partial=True.
     """
+    deadline = Deadline(time_budget)
     location_value = country.strip()
+    known_links = _load_known_links(location_value) if incremental else set()
 
     # Build initial search URL with explicit location param
     encoded_location = urllib.parse.quote_plus(location_value)
     initial_search_url = urllib.parse.urljoin(
-        IDEALIST_BASE,
+        _idealist_base(),
         f"/en/volunteer?locale=en&locationType=ONSITE&location={encoded_location}"
     )
 
@@ -173,6 +252,8 @@ def search_volunteer_links(
         aggregated = []
         seen = set()
         page = 1
+        pages_loaded = 0
+        partial = False
         max_pages = int(os.environ.get("IDEALIST_MAX_PAGES", "50"))  # safety cap
         result_css = 'a[href*="/volunteer-opportunity/"]'
         empty_selector_candidates = [
@@ -186,13 +267,24 @@ def search_volunteer_links(
 
         # Navigate page-by-page until empty state or page cap.
         while page <= max_pages:
+            if deadline.expired():
+                partial = True
+                break
+
             # Build URL with page param
             page_url = _update_query_param(current_base_url, "page", page)
-            driver.get(page_url)
+            if incremental:
+                page_url = _update_query_param(page_url, *NEWEST_FIRST_PARAM)
+            try:
+                _load_within_budget(driver, page_url, deadline, key=location_value.lower())
+            except TimeoutException:
+                partial = True
+                break
+            pages_loaded += 1
 
             # Wait for either results anchors or the empty state to appear (short timeout)
             try:
-                WebDriverWait(driver, 5).until(
+                WebDriverWait(driver, deadline.clamp(5)).until(
                     lambda d: d.find_elements(By.CSS_SELECTOR, result_css) or
                               any(d.find_elements(By.CSS_SELECTOR, sel) for sel in empty_selector_candidates)
                 )
@@ -249,11 +341,13 @@ def search_volunteer_links(
                 except Exception:
                     page_hrefs = []
 
-            # Add to aggregated list preserving order and dedup
+            # Add to aggregated list preserving order and dedup (known links are seen but not returned)
             added_this_page = 0
             for h in page_hrefs:
                 if h not in seen:
                     seen.add(h)
+                    if h in known_links:
+                        continue
                     aggregated.append(h)
                     added_this_page += 1
                     if limit and len(aggregated) >= limit:
@@ -263,18 +357,27 @@ def search_volunteer_links(
             if limit and len(aggregated) >= limit:
                 break
 
+            # Incremental mode: results are newest-first, so a full page of known links means
+            # everything after it is known too
+            if incremental and page_hrefs and all(h in known_links for h in page_hrefs):
+                break
+
             # Heuristic: if this page had zero new links, and we didn't hit empty state, it may be a last page —
             # still continue until we detect empty state but avoid infinite loop by checking pages with no new links.
             # We'll continue to next page to verify empty state.
             page += 1
 
             # If on first page we found no anchors at all, try fallback: load base search and type location
-            if page == 2 and not aggregated:
+            if page == 2 and not seen and not deadline.expired():
                 # Fallback to typing into the location input (site may require autocomplete)
-                base_search_url = urllib.parse.urljoin(IDEALIST_BASE, "/en/volunteer?locale=en&locationType=ONSITE")
-                driver.get(base_search_url)
+                base_search_url = urllib.parse.urljoin(_idealist_base(), "/en/volunteer?locale=en&locationType=ONSITE")
+                try:
+                    _load_within_budget(driver, base_search_url, deadline, key=location_value.lower())
+                except TimeoutException:
+                    partial = True
+                    break
 
-                wait = WebDriverWait(driver, 6)
+                wait = WebDriverWait(driver, deadline.clamp(6))
                 input_el = None
                 selectors = [
                     "#page-header-desktop-search-location",
@@ -302,42 +405,49 @@ def search_volunteer_links(
                         except Exception:
                             pass
 
-                    input_el.send_keys(location_value)
-                    # select first suggestion if possible
+                    # Submitting the typed location navigates to the results page, so it takes a crawl
+                    # slot like any other page load (its wait for results included)
                     try:
-                        input_el.send_keys(Keys.ARROW_DOWN)
-                        input_el.send_keys(Keys.RETURN)
-                    except Exception:
-                        try:
-                            suggestion_selectors = [
-                                'ul[role="listbox"] li',
-                                'li[role="option"]',
-                                '.react-autosuggest__suggestion',
-                                '.sc-6f0rgt-0 li'
-                            ]
-                            clicked = False
-                            for ssel in suggestion_selectors:
+                        with crawl_scheduler.slot(base_search_url, key=location_value.lower(), timeout=deadline.remaining()):
+                            input_el.send_keys(location_value)
+                            # select first suggestion if possible
+                            try:
+                                input_el.send_keys(Keys.ARROW_DOWN)
+                                input_el.send_keys(Keys.RETURN)
+                            except Exception:
                                 try:
-                                    items = driver.find_elements(By.CSS_SELECTOR, ssel)
-                                    if items:
-                                        items[0].click()
-                                        clicked = True
-                                        break
+                                    suggestion_selectors = [
+                                        'ul[role="listbox"] li',
+                                        'li[role="option"]',
+                                        '.react-autosuggest__suggestion',
+                                        '.sc-6f0rgt-0 li'
+                                    ]
+                                    clicked = False
+                                    for ssel in suggestion_selectors:
+                                        try:
+                                            items = driver.find_elements(By.CSS_SELECTOR, ssel)
+                                            if items:
+                                                items[0].click()
+                                                clicked = True
+                                                break
+                                        except Exception:
+                                            continue
+                                    if not clicked:
+                                        input_el.send_keys(Keys.RETURN)
                                 except Exception:
-                                    continue
-                            if not clicked:
-                                input_el.send_keys(Keys.RETURN)
-                        except Exception:
-                            input_el.send_keys(Keys.RETURN)
-
-                    # Wait briefly and then set the current_base_url to the current page URL (so pagination continues correctly)
-                    try:
-                        WebDriverWait(driver, 5).until(
-                            lambda d: d.find_elements(By.CSS_SELECTOR, result_css) or
-                                      any(d.find_elements(By.CSS_SELECTOR, sel) for sel in empty_selector_candidates)
-                        )
-                    except Exception:
-                        pass
+                                    input_el.send_keys(Keys.RETURN)
+
+                            # Wait briefly and then set the current_base_url to the current page URL (so pagination continues correctly)
+                            try:
+                                WebDriverWait(driver, deadline.clamp(5)).until(
+                                    lambda d: d.find_elements(By.CSS_SELECTOR, result_css) or
+                                              any(d.find_elements(By.CSS_SELECTOR, sel) for sel in empty_selector_candidates)
+                                )
+                            except Exception:
+                                pass
+                    except CrawlSlotTimeout:
+                        partial = True
+                        break
 
                     current_base_url = driver.current_url
                     # Reset page counter to 1 to begin paginating from the result URL
@@ -353,7 +463,14 @@ def search_volunteer_links(
         if limit:
             aggregated = aggregated[:limit]
 
-        return SearchResponse(country=country, found=len(aggregated), links=aggregated)
+        return SearchResponse(
+            country=country,
+            found=len(aggregated),
+            links=aggregated,
+            incremental=incremental,
+            partial=partial,
+            pages=pages_loaded,
+        )
 
     except Exception as e:
         # Surface a helpful message
@@ -363,3 +480,27 @@ def search_volunteer_links(
             driver.quit()
         except Exception:
             pass
+
+
+@router.get("/locations", response_model=LocationSearchResponse)
+def search_volunteer_locations(
+    country: str = Query(..., min_length=1, description="Country or location to search, e.g. 'Japan'"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Optional max number of links to enrich"),
+    incremental: bool = Query(False, description="Only enrich links not already stored for this country"),
+):
+    """
+    Search Idealist for `country`, then fetch each opportunity's detail page (concurrently, cached per URL)
+    and return the organization name and street address for every link.
+    """
+    search_result = search_volunteer_links(country=country, limit=limit, incremental=incremental, time_budget=None)
+    details = fetch_opportunity_details(search_result.links, key=country.strip().lower())
+    return LocationSearchResponse(
+        country=country,
+        opportunities=[OpportunityLocation(**d) for d in details],
+    )
+
+
+@router.get("/crawl-metrics")
+def crawl_metrics() -> Dict[str, Any]:
+    """Per-host concurrency, rate, backoff and per-country fairness counters of the shared crawl scheduler."""
+    return crawl_scheduler.metrics()
@@ -0,0 +1,258 @@
+# backend/tools/bench_latlon_parser.py
+"""
+Benchmark the Gemini latlon parsers on large, malformed responses.
+
+Compares:
+  - legacy:  the previous regex fallback (_legacy_regex_parse), which rescans windows around every match
+  - single:  the single-pass tokenizer (latlon_stream_parser.parse_latlon_text) on the whole string
+  - stream:  the same tokenizer fed in --chunk-size pieces, as a streamed response would arrive
+
+Responses are synthetic but shaped like real Gemini failures: code fences, objects missing '[' / ']'
+or '}', unquoted countries, entries with no country and trailing prose, so json.loads never succeeds
+and every parser takes its tolerant path. Two shapes are generated:
+  - mixed:       all of the above, interleaved
+  - no-country:  malformed entries that never carry a country (the legacy parser then searches the
+                 whole response again for every entry)
+
+Usage (from backend/):
+  python -m tools.bench_latlon_parser
+  python -m tools.bench_latlon_parser --sizes 100 1000 5000 --repeat 5 --json
+  python -m tools.bench_latlon_parser --shapes no-country
+"""
+
+import argparse
+import json
+import random
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# Make backend/ importable when run as a script (same trick as main.py)
+backend_dir = Path(__file__).resolve().parent.parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from gemini.latlon_stream_parser import LatLonStreamParser, parse_latlon_text  # noqa: E402
+
+COUNTRIES = ["kenya", "japan", "united kingdom", "brazil", "south africa", "india", "peru", "canada"]
+
+
+def _legacy_country(val: str) -> Optional[str]:
+    s = val.strip()
+    return s.lower() if s else None
+
+
+_ID_PATTERN = re.compile(r'"id"\s*:\s*(?P<q>["\']?)(?P<id>[A-Za-z0-9_\-]+)(?P=q)', flags=re.IGNORECASE)
+
+
+def _id_around(text: str, start: int, end: int) -> Optional[str]:
+    """Id declared in the same {...} object as the match at text[start:end], if any."""
+    open_brace = text.rfind("{", 0, start)
+    close_brace = text.find("}", end)
+    obj = text[open_brace if open_brace != -1 else start:close_brace + 1 if close_brace != -1 else len(text)]
+    m = _ID_PATTERN.search(obj)
+    return m.group("id") if m else None
+
+
+def _legacy_regex_parse(text: str) -> List[Dict[str, Any]]:
+    """
+    The regex fallback gemini/parse_gemini_latlon_list.py used before the single-pass tokenizer, kept
+    here as the benchmark's baseline. Every match rescans a 500-character window each way (plus the whole text when no country is
+    nearby), so it is quadratic on long responses.
+    """
+    number = r"[+-]?\d+(?:\.\d+)?"
+    # Allow optional opening '[' and optional closing ']' for malformed cases
+    pattern = re.compile(
+        rf'"latlon"\s*:\s*\[?\s*({number})\s*,\s*({number})\s*\]?',
+        flags=re.IGNORECASE
+    )
+
+    country_pattern = re.compile(
+        r'"country"\s*:\s*(?P<q>["\']?)(?P<country>[^"\'},\]]+)(?P=q)',
+        flags=re.IGNORECASE
+    )
+
+    results: List[Dict[str, Any]] = []
+    for m in pattern.finditer(text):
+        try:
+            lat_s, lon_s = m.group(1), m.group(2)
+            lat = float(lat_s)
+            lon = float(lon_s)
+
+            country = None
+
+            # Search in a larger window around the match (500 chars forward and backward)
+            search_span_start = max(0, m.end())
+            search_span_end = min(len(text), m.end() + 500)
+            forward_chunk = text[search_span_start:search_span_end]
+
+            back_start = max(0, m.start() - 500)
+            back_chunk = text[back_start:m.start()]
+
+            fm_country = country_pattern.search(forward_chunk)
+            bm_country = country_pattern.search(back_chunk)
+
+            if fm_country:
+                country = _legacy_country(fm_country.group("country"))
+            elif bm_country:
+                country = _legacy_country(bm_country.group("country"))
+
+            # Global fallback if still not found (less reliable)
+            if country is None:
+                gm_country = country_pattern.search(text)
+                if gm_country:
+                    country = _legacy_country(gm_country.group("country"))
+
+            entry = {"latlon": [lat, lon], "country": country}
+            item_id = _id_around(text, m.start(), m.end())
+            if item_id is not None:
+                entry["id"] = item_id
+            results.append(entry)
+        except Exception:
+            # skip any entries that can't be parsed to floats
+            continue
+
+    # If regex found nothing, try a more permissive approach: find any bracketed pairs of two numbers
+    if not results:
+        pair_pattern = re.compile(r"\[\s*(" + number + r")\s*,\s*(" + number + r")\s*\]")
+        for m in pair_pattern.finditer(text):
+            try:
+                lat = float(m.group(1))
+                lon = float(m.group(2))
+
+                country = None
+
+                search_span_start = max(0, m.end())
+                search_span_end = min(len(text), m.end() + 500)
+                forward_chunk = text[search_span_start:search_span_end]
+
+                back_start = max(0, m.start() - 500)
+                back_chunk = text[back_start:m.start()]
+
+                fm_country = country_pattern.search(forward_chunk)
+                bm_country = country_pattern.search(back_chunk)
+
+                if fm_country:
+                    country = _legacy_country(fm_country.group("country"))
+                elif bm_country:
+                    country = _legacy_country(bm_country.group("country"))
+
+                if country is None:
+                    gm_country = country_pattern.search(text)
+                    if gm_country:
+                        country = _legacy_country(gm_country.group("country"))
+
+                entry = {"latlon": [lat, lon], "country": country}
+                item_id = _id_around(text, m.start(), m.end())
+                if item_id is not None:
+                    entry["id"] = item_id
+                results.append(entry)
+            except Exception:
+                continue
+
+    return results
+
+
+def make_malformed_response(n: int, shape: str = "mixed", seed: int = 0) -> str:
+    """A response with `n` entries of the given shape ("mixed" or "no-country")."""
+    rng = random.Random(seed)
+    parts = ["```json\n["]
+    for i in range(n):
+        lat = round(rng.uniform(-60, 70), 4)
+        lon = round(rng.uniform(-170, 170), 4)
+        country = rng.choice(COUNTRIES)
+        if shape == "no-country":
+            if i % 2:
+                entry = f'{{"id": "l{i}", "latlon": {lat}, {lon}]}},'                       # missing '['
+            else:
+                entry = f'{{"id": "l{i}", "latlon": [{lat}, {lon}]'                         # missing '}'
+            parts.append("  " + entry)
+            continue
+        kind = i % 5
+        if kind == 0:
+            entry = f'{{"id": "l{i}", "latlon": [{lat}, {lon}], "country": "{country}"}},'
+        elif kind == 1:
+            entry = f'{{"id": "l{i}", "latlon": {lat}, {lon}], "country": "{country}"}},'   # missing '['
+        elif kind == 2:
+            entry = f'{{"id": "l{i}", "latlon": [{lat}, {lon}], "country": {country} }},'    # unquoted country
+        elif kind == 3:
+            entry = f'{{"id": "l{i}", "latlon": [{lat}, {lon}]}},'                          # no country
+        else:
+            entry = f'{{"id": "l{i}", "latlon": [{lat}, {lon}], "country": "{country}"'      # missing '}'
+        parts.append("  " + entry)
+    parts.append("]\n```\nLet me know if you need anything else.")
+    return "\n".join(parts)
+
+
+def _stream_parse(chunk_size: int) -> Callable[[str], List[Dict]]:
+    def parse(text: str) -> List[Dict]:
+        parser = LatLonStreamParser()
+        out: List[Dict] = []
+        for i in range(0, len(text), chunk_size):
+            out.extend(parser.feed(text[i:i + chunk_size]))
+        out.extend(parser.close())
+        return out
+    return parse
+
+
+def _time(fn: Callable[[str], List[Dict]], text: str, repeat: int):
+    timings = []
+    result: List[Dict] = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(text)
+        timings.append(time.perf_counter() - t0)
+    return statistics.median(timings), result
+
+
+def run(sizes: List[int], shapes: List[str], repeat: int, chunk_size: int) -> List[Dict]:
+    parsers = {
+        "legacy": _legacy_regex_parse,
+        "single": parse_latlon_text,
+        "stream": _stream_parse(chunk_size),
+    }
+    rows = []
+    for shape in shapes:
+        for n in sizes:
+            rows.append(_run_one(parsers, shape, n, repeat))
+    return rows
+
+
+def _run_one(parsers: Dict[str, Callable[[str], List[Dict]]], shape: str, n: int, repeat: int) -> Dict:
+    text = make_malformed_response(n, shape)
+    row = {"shape": shape, "entries": n, "chars": len(text)}
+    for name, fn in parsers.items():
+        median_s, result = _time(fn, text, repeat)
+        row[f"{name}_ms"] = median_s * 1000
+        row[f"{name}_found"] = len(result)
+        row[f"{name}_with_id"] = sum(1 for loc in result if loc.get("id"))
+    row["speedup"] = row["legacy_ms"] / row["single_ms"] if row["single_ms"] > 0 else None
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Gemini latlon parsers on malformed output.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000, 5000], help="Entries per response")
+    parser.add_argument("--shapes", nargs="+", choices=["mixed", "no-country"], default=["mixed", "no-country"])
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per parser and size (median reported)")
+    parser.add_argument("--chunk-size", type=int, default=64, help="Characters per feed() call in stream mode")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    rows = run(args.sizes, args.shapes, args.repeat, args.chunk_size)
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return
+
+    print(f"{'shape':>10} {'entries':>8} {'chars':>9} {'legacy ms':>10} {'single ms':>10} {'stream ms':>10} {'speedup':>8}  found (legacy/single/stream)")
+    for r in rows:
+        speedup = f"{r['speedup']:.1f}x" if r["speedup"] else "n/a"
+        print(f"{r['shape']:>10} {r['entries']:>8} {r['chars']:>9} {r['legacy_ms']:>10.2f} {r['single_ms']:>10.2f} {r['stream_ms']:>10.2f} "
+              f"{speedup:>8}  {r['legacy_found']}/{r['single_found']}/{r['stream_found']}")
+
+
+if __name__ == "__main__":
+    main()
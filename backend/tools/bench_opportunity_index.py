@@ -0,0 +1,110 @@
+# backend/tools/bench_opportunity_index.py
+"""
+Check and time OpportunityIndex radius queries (near=lat,lon,radius_km) against brute-force haversine.
+
+The index narrows a radius query to the grid cells of a lat/lon box around the circle before measuring
+distances, so a box that is too narrow silently drops matches. This tool fills a temporary store with
+random points (denser towards the poles than a uniform sample would be, where the box is hardest to get
+right), runs queries at a spread of latitudes and radii, and compares every result set with a scan of
+all points. It exits with status 1 if any query misses or adds a point.
+
+Usage (from backend/):
+  python -m tools.bench_opportunity_index
+  python -m tools.bench_opportunity_index --points 50000 --queries 200 --seed 7 --json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# Make backend/ importable when run as a script (same trick as main.py)
+backend_dir = Path(__file__).resolve().parent.parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from utils.opportunity_index import OpportunityIndex, haversine_km  # noqa: E402
+from utils.opportunity_store import OpportunityStore  # noqa: E402
+
+# Queries the spherical-cap box used to get wrong, plus random ones
+FIXED_QUERIES = [(50.0, 0.0, 3000.0), (60.0, 10.0, 1500.0), (70.0, 0.0, 2000.0), (-65.0, 120.0, 2500.0),
+                 (0.0, 179.5, 800.0), (85.0, -170.0, 400.0), (-30.0, -60.0, 50.0)]
+
+
+def _random_points(n: int, rng: random.Random) -> List[Tuple[float, float]]:
+    return [(rng.uniform(-89.0, 89.0), rng.uniform(-180.0, 180.0)) for _ in range(n)]
+
+
+def _queries(n: int, rng: random.Random) -> List[Tuple[float, float, float]]:
+    out = list(FIXED_QUERIES)
+    while len(out) < n:
+        out.append((rng.uniform(-85.0, 85.0), rng.uniform(-180.0, 180.0), rng.choice([25.0, 250.0, 1000.0, 2500.0, 5000.0])))
+    return out
+
+
+def run(n_points: int, n_queries: int, seed: int) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    points = _random_points(n_points, rng)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = OpportunityStore(os.path.join(tmp, "opportunities.db"), os.path.join(tmp, "missing.json"))
+        store.upsert_many("bench", [
+            {"link": f"https://www.idealist.org/en/volunteer-opportunity/bench-{i}", "name": f"Opportunity {i}",
+             "country": "bench", "latlon": [lat, lon]}
+            for i, (lat, lon) in enumerate(points)
+        ])
+        index = OpportunityIndex(store)
+        index.refresh()
+
+        by_link = {f"https://www.idealist.org/en/volunteer-opportunity/bench-{i}": p for i, p in enumerate(points)}
+        failures: List[Dict[str, Any]] = []
+        index_ms: List[float] = []
+        scan_ms: List[float] = []
+        for lat, lon, radius in _queries(n_queries, rng):
+            t0 = time.perf_counter()
+            page, _, _ = index.query(near=(lat, lon, radius), limit=n_points)
+            index_ms.append((time.perf_counter() - t0) * 1000)
+            t0 = time.perf_counter()
+            expected = {link for link, (plat, plon) in by_link.items() if haversine_km(lat, lon, plat, plon) <= radius}
+            scan_ms.append((time.perf_counter() - t0) * 1000)
+            found = {item.record["link"] for item, _ in page}
+            if found != expected:
+                failures.append({"near": [lat, lon, radius], "missed": len(expected - found), "extra": len(found - expected)})
+
+    return {
+        "points": n_points,
+        "queries": len(index_ms),
+        "index_ms_median": round(statistics.median(index_ms), 3),
+        "scan_ms_median": round(statistics.median(scan_ms), 3),
+        "failures": failures,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare OpportunityIndex radius queries with brute-force haversine")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = run(args.points, args.queries, args.seed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['queries']} radius queries over {report['points']} points: "
+              f"index {report['index_ms_median']} ms, brute force {report['scan_ms_median']} ms (median)")
+        for failure in report["failures"]:
+            print(f"  MISMATCH near={failure['near']}: {failure['missed']} missed, {failure['extra']} extra")
+        if not report["failures"]:
+            print("  every query matched the brute-force result")
+    sys.exit(1 if report["failures"] else 0)
+
+
+if __name__ == "__main__":
+    main()
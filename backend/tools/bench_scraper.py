@@ -0,0 +1,220 @@
+# backend/tools/bench_scraper.py
+"""
+Throughput benchmark for the Idealist scraper, run against the local fixture replay server.
+
+Reports:
+  - driver startup time (make_chrome_driver, min / median / max over --drivers starts)
+  - memory per driver (RSS of the chromedriver + Chrome process tree, in MiB)
+  - pages per second for search_volunteer_links (results + empty-state pages served per wall-clock second)
+
+Every page load goes through the shared crawl scheduler (utils/crawl_scheduler.py), whose per-host rate
+limit would otherwise cap pages per second at CRAWL_RATE_PER_HOST. Against its own replay server the
+benchmark therefore lifts the limits (--rate-per-host, default 0 = unlimited; --concurrency-per-host)
+before the scraper is imported; against --base-url they stay as configured. The report prints the
+limits in effect.
+
+Usage (from backend/):
+  python -m tools.bench_scraper --pages 10 --runs 3
+  python -m tools.bench_scraper --latency-ms 300 --json
+  python -m tools.bench_scraper --base-url http://127.0.0.1:8765   # use an already running replay server
+  python -m tools.bench_scraper --rate-per-host 2                   # measure with production politeness
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Make backend/ importable when run as a script (same trick as main.py)
+backend_dir = Path(__file__).resolve().parent.parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from tools.idealist_replay import ReplayState, start_replay_server  # noqa: E402
+
+
+def _children_by_parent() -> Dict[int, List[int]]:
+    tree: Dict[int, List[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat", "r") as f:
+                stat = f.read()
+            # the command name may contain spaces; ppid is the 2nd field after the closing paren
+            ppid = int(stat.rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        tree.setdefault(ppid, []).append(int(entry))
+    return tree
+
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """RSS (bytes) of `pid` and all of its descendants, or None where /proc is unavailable."""
+    try:
+        import psutil  # optional
+    except ImportError:
+        psutil = None
+
+    if psutil is not None:
+        try:
+            proc = psutil.Process(pid)
+            procs = [proc] + proc.children(recursive=True)
+            return sum(p.memory_info().rss for p in procs if p.is_running())
+        except Exception:
+            return None
+
+    if not os.path.isdir("/proc"):
+        return None
+    tree = _children_by_parent()
+    total, stack = 0, [pid]
+    while stack:
+        current = stack.pop()
+        total += _rss_bytes(current)
+        stack.extend(tree.get(current, []))
+    return total
+
+
+def bench_driver_startup(drivers: int, headless: bool) -> Dict[str, Optional[float]]:
+    from routers.volunteering.router import make_chrome_driver
+
+    startup_s: List[float] = []
+    rss_mib: List[float] = []
+    for _ in range(drivers):
+        t0 = time.perf_counter()
+        driver = make_chrome_driver(headless=headless)
+        startup_s.append(time.perf_counter() - t0)
+        try:
+            driver.get("about:blank")
+            service_proc = getattr(getattr(driver, "service", None), "process", None)
+            rss = process_tree_rss(service_proc.pid) if service_proc else None
+            if rss is not None:
+                rss_mib.append(rss / (1024 * 1024))
+        finally:
+            driver.quit()
+
+    return {
+        "startup_min_s": min(startup_s),
+        "startup_median_s": statistics.median(startup_s),
+        "startup_max_s": max(startup_s),
+        "rss_per_driver_mib": statistics.median(rss_mib) if rss_mib else None,
+    }
+
+
+def bench_pagination(state: Optional[ReplayState], runs: int, country: str) -> Dict[str, float]:
+    from routers.volunteering.router import search_volunteer_links
+
+    pages_per_s: List[float] = []
+    elapsed_s: List[float] = []
+    links_found = 0
+    for _ in range(runs):
+        if state is not None:
+            state.reset()
+        t0 = time.perf_counter()
+        result = search_volunteer_links(country=country, limit=None, incremental=False, time_budget=None)
+        elapsed = time.perf_counter() - t0
+        links_found = result.found
+        if state is not None:
+            counters = state.snapshot()
+            pages = counters["search"] + counters["empty"]
+        else:
+            pages = (links_found // 20) + 1  # external server: estimate from links per results page
+        elapsed_s.append(elapsed)
+        pages_per_s.append(pages / elapsed if elapsed > 0 else 0.0)
+
+    return {
+        "runs": runs,
+        "links_found": links_found,
+        "elapsed_median_s": statistics.median(elapsed_s),
+        "pages_per_s_median": statistics.median(pages_per_s),
+        "pages_per_s_best": max(pages_per_s),
+    }
+
+
+def crawl_limits() -> Dict[str, Optional[float]]:
+    from utils.crawl_scheduler import crawl_scheduler
+
+    interval = crawl_scheduler.base_interval
+    return {
+        "rate_per_host": 1.0 / interval if interval > 0 else None,   # None: unlimited
+        "concurrency_per_host": crawl_scheduler.max_concurrency,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Idealist scraper against replayed fixtures.")
+    parser.add_argument("--base-url", default=None, help="Use an already running replay server instead of starting one")
+    parser.add_argument("--pages", type=int, default=5, help="Result pages served before the empty state")
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Artificial per-response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--runs", type=int, default=3, help="Full pagination runs to time")
+    parser.add_argument("--drivers", type=int, default=3, help="Driver starts to time")
+    parser.add_argument("--country", default="United Kingdom")
+    parser.add_argument("--rate-per-host", type=float, default=0.0,
+                        help="CRAWL_RATE_PER_HOST for a self-started replay server (0 = unlimited)")
+    parser.add_argument("--concurrency-per-host", type=int, default=64,
+                        help="CRAWL_MAX_CONCURRENCY_PER_HOST for a self-started replay server")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    server = None
+    state = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        state = ReplayState(pages=args.pages, per_page=args.per_page, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+        server, state, base_url = start_replay_server(state=state)
+        # the scheduler reads these once, when routers.volunteering.router first imports it
+        os.environ["CRAWL_RATE_PER_HOST"] = str(args.rate_per_host)
+        os.environ["CRAWL_MAX_CONCURRENCY_PER_HOST"] = str(args.concurrency_per_host)
+
+    os.environ["IDEALIST_BASE_URL"] = base_url
+    headless_env = os.environ.setdefault("HEADLESS", "1")
+    headless = headless_env.strip() not in ("0", "false", "False", "no", "NO")
+
+    try:
+        report = {
+            "base_url": base_url,
+            "latency_ms": args.latency_ms,
+            "crawl_limits": crawl_limits(),
+            "driver": bench_driver_startup(args.drivers, headless),
+            "pagination": bench_pagination(state, args.runs, args.country),
+        }
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    drv, pag = report["driver"], report["pagination"]
+    rss = f"{drv['rss_per_driver_mib']:.1f} MiB" if drv["rss_per_driver_mib"] is not None else "n/a"
+    limits = report["crawl_limits"]
+    rate = f"{limits['rate_per_host']:g} req/s" if limits["rate_per_host"] is not None else "unlimited rate"
+    print(f"replay server:        {base_url} (latency {args.latency_ms:.0f} ms)")
+    print(f"crawl limits:         {rate}, {limits['concurrency_per_host']} concurrent per host")
+    print(f"driver startup:       min {drv['startup_min_s']:.2f}s  median {drv['startup_median_s']:.2f}s  max {drv['startup_max_s']:.2f}s")
+    print(f"memory per driver:    {rss}")
+    print(f"pagination:           {pag['pages_per_s_median']:.2f} pages/s median, {pag['pages_per_s_best']:.2f} best "
+          f"({pag['links_found']} links, {pag['elapsed_median_s']:.2f}s median over {pag['runs']} runs)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# backend/tools/build_gazetteer.py
+"""
+Build backend/data/gazetteer.tsv (read by utils/gazetteer.py) from the GeoNames dumps.
+
+Inputs, from https://download.geonames.org/export/dump/ (CC BY 4.0):
+  - cities15000.txt       every populated place with at least 15,000 inhabitants
+  - admin1CodesASCII.txt  first-level divisions (states, provinces, UK nations)
+  - admin2Codes.txt       second-level divisions (counties, districts)
+  - countryInfo.txt       ISO code -> country name
+
+Output rows (tab separated): country, name|ascii name, lat, lon, kind, admin1, population
+  - one "city" row per city, kept under its GeoNames name plus its ASCII name when they differ
+  - one "region" row per admin1 and one "county" row per admin2 division that has at least one city,
+    placed at the population-weighted mean of its cities (at its largest city when the cities straddle
+    the antimeridian), with their summed population
+Rows are ordered by country, then cities before regions before counties, each by population
+descending, so the most prominent place wins when two share a name.
+
+Usage (from backend/):
+  python -m tools.build_gazetteer --dump-dir ~/geonames [--out data/gazetteer.tsv]
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+# Make backend/ importable when run as a script (same trick as main.py)
+backend_dir = Path(__file__).resolve().parent.parent
+if str(backend_dir) not in sys.path:
+    sys.path.insert(0, str(backend_dir))
+
+from utils.gazetteer import normalize_country, normalize_tokens  # noqa: E402
+
+KIND_ORDER = {"city": 0, "region": 1, "county": 2}
+
+
+class Row(NamedTuple):
+    country: str
+    names: str
+    lat: float
+    lon: float
+    kind: str
+    admin1: str
+    population: int
+
+
+def _read_tsv(path: str) -> List[List[str]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n").split("\t") for line in f if line.strip() and not line.startswith("#")]
+
+
+def read_countries(path: str) -> Dict[str, str]:
+    """ISO code -> normalized country name."""
+    return {parts[0]: normalize_country(parts[4]) for parts in _read_tsv(path) if len(parts) > 4}
+
+
+def read_admin_codes(path: str) -> Dict[str, str]:
+    """'GB.ENG' / 'GB.ENG.H9' -> ASCII name."""
+    return {parts[0]: parts[2] or parts[1] for parts in _read_tsv(path) if len(parts) > 2}
+
+
+def _names(name: str, ascii_name: str) -> str:
+    if ascii_name and normalize_tokens(ascii_name) != normalize_tokens(name):
+        return f"{name}|{ascii_name}"
+    return name
+
+
+def _division_row(country: str, name: str, kind: str, admin1: str, members: List[Tuple[float, float, int]]) -> Row:
+    population = sum(p for _, _, p in members)
+    lons = [lon for _, lon, _ in members]
+    if max(lons) - min(lons) > 180:
+        lat, lon, _ = max(members, key=lambda m: m[2])
+    else:
+        weight = population or len(members)
+        lat = sum(la * (p if population else 1) for la, _, p in members) / weight
+        lon = sum(lo * (p if population else 1) for _, lo, p in members) / weight
+    return Row(country, name, round(lat, 4), round(lon, 4), kind, admin1, population)
+
+
+def build(dump_dir: str) -> List[Row]:
+    countries = read_countries(os.path.join(dump_dir, "countryInfo.txt"))
+    admin1 = read_admin_codes(os.path.join(dump_dir, "admin1CodesASCII.txt"))
+    admin2 = read_admin_codes(os.path.join(dump_dir, "admin2Codes.txt"))
+
+    rows: List[Row] = []
+    divisions: Dict[Tuple[str, str], List[Tuple[float, float, int]]] = {}
+    for parts in _read_tsv(os.path.join(dump_dir, "cities15000.txt")):
+        if len(parts) < 15:
+            continue
+        code = parts[8]
+        country = countries.get(code)
+        if not country:
+            continue
+        lat, lon, population = float(parts[4]), float(parts[5]), int(parts[14] or 0)
+        region_code = f"{code}.{parts[10]}"
+        region = admin1.get(region_code, "")
+        rows.append(Row(country, _names(parts[1], parts[2]), round(lat, 5), round(lon, 5), "city", region, population))
+        if region:
+            divisions.setdefault(("region", region_code), []).append((lat, lon, population))
+            county_code = f"{region_code}.{parts[11]}"
+            if parts[11] and county_code in admin2:
+                divisions.setdefault(("county", county_code), []).append((lat, lon, population))
+
+    for (kind, code), members in divisions.items():
+        country = countries[code.split(".")[0]]
+        region = admin1[".".join(code.split(".")[:2])]
+        name = region if kind == "region" else admin2[code]
+        rows.append(_division_row(country, name, kind, region, members))
+
+    rows.sort(key=lambda r: (r.country, KIND_ORDER[r.kind], -r.population, r.names))
+    return rows
+
+
+def write(rows: List[Row], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("# Offline place-name gazetteer used by utils/gazetteer.py, built by tools/build_gazetteer.py.\n")
+        f.write("# Data: GeoNames cities15000 + admin1/admin2 codes (https://www.geonames.org, CC BY 4.0).\n")
+        f.write("# Columns (tab separated): country, name (alternate spellings separated by |), lat, lon, kind,\n")
+        f.write("# admin1 (state / province / nation), population. Coordinates are WGS84 decimal degrees.\n")
+        for r in rows:
+            f.write(f"{r.country}\t{r.names}\t{r.lat}\t{r.lon}\t{r.kind}\t{r.admin1}\t{r.population}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build data/gazetteer.tsv from the GeoNames dumps.")
+    parser.add_argument("--dump-dir", required=True, help="Directory holding cities15000.txt, admin1CodesASCII.txt, admin2Codes.txt and countryInfo.txt")
+    parser.add_argument("--out", default=str(backend_dir / "data" / "gazetteer.tsv"))
+    args = parser.parse_args()
+
+    rows = build(args.dump_dir)
+    write(rows, args.out)
+    counts: Dict[str, int] = {}
+    for r in rows:
+        counts[r.kind] = counts.get(r.kind, 0) + 1
+    print(f"Wrote {len(rows)} rows to {args.out} ({', '.join(f'{n} {k}' for k, n in sorted(counts.items()))})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+# backend/tools/idealist_replay.py
+"""
+Local HTTP server that replays Idealist search, empty-state and detail pages from fixtures,
+so the scraper can be exercised (and benchmarked) without touching the live site.
+
+Routes:
+  - /en/volunteer?page=N&location=...   -> search results page for N <= --pages, else the empty state
+  - /en/volunteer-opportunity/<id>-<slug> -> detail page with JSON-LD organization + address
+
+Fixtures live in backend/tools/fixtures/idealist/:
+  - search_page_<N>.html  (optional) a captured results page served verbatim for page N
+  - search_page.html      template; {{RESULTS}} is replaced with generated listing anchors
+  - empty_state.html      served once pagination runs past the last page
+  - detail_page.html      template for detail pages
+
+Usage (from backend/):
+  python -m tools.idealist_replay --port 8765 --pages 5 --latency-ms 250
+  IDEALIST_BASE_URL=http://127.0.0.1:8765 uvicorn main:app
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures", "idealist")
+
+SLUG_WORDS = [
+    "community", "garden", "food", "bank", "tutor", "youth", "mentor", "animal", "shelter",
+    "elderly", "care", "river", "cleanup", "library", "literacy", "refugee", "support", "health",
+]
+
+
+def _read_fixture(name: str) -> Optional[str]:
+    path = os.path.join(FIXTURES_DIR, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _listing_id(location: str, page: int, index: int) -> str:
+    return hashlib.md5(f"{location}|{page}|{index}".encode("utf-8")).hexdigest()
+
+
+def _listing_slug(listing_id: str, location: str) -> str:
+    rnd = random.Random(listing_id)
+    words = rnd.sample(SLUG_WORDS, 3)
+    place = "-".join(location.lower().split()) or "anywhere"
+    return "-".join(words + [place])
+
+
+class ReplayState:
+    """Settings and request counters shared by all handler threads."""
+
+    def __init__(self, pages: int = 5, per_page: int = 20, latency_ms: float = 0.0, jitter_ms: float = 0.0):
+        self.pages = pages
+        self.per_page = per_page
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {"search": 0, "empty": 0, "detail": 0, "other": 0}
+
+    def count(self, kind: str):
+        with self._lock:
+            self.counters[kind] = self.counters.get(kind, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.counters)
+
+    def reset(self):
+        with self._lock:
+            for key in self.counters:
+                self.counters[key] = 0
+
+    def delay(self):
+        latency = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0)
+        if latency > 0:
+            time.sleep(latency / 1000.0)
+
+
+def _render_search_page(state: ReplayState, location: str, page: int) -> str:
+    captured = _read_fixture(f"search_page_{page}.html")
+    if captured is not None:
+        return captured
+    anchors = []
+    for i in range(state.per_page):
+        listing_id = _listing_id(location, page, i)
+        slug = _listing_slug(listing_id, location)
+        href = f"/en/volunteer-opportunity/{listing_id}-{slug}"
+        title = html.escape(slug.replace("-", " ").title())
+        anchors.append(f'        <div class="listing"><a href="{href}">{title}</a></div>')
+    template = _read_fixture("search_page.html") or "<html><body>{{RESULTS}}</body></html>"
+    return template.replace("{{RESULTS}}", "\n".join(anchors))
+
+
+def _render_detail_page(path_segment: str) -> str:
+    listing_id, _, slug = path_segment.partition("-")
+    words = slug.split("-")
+    title = " ".join(words).title() or "Volunteer Opportunity"
+    organization = f"{' '.join(words[:2]).title() or 'Replay'} Trust"
+    city = words[-1].title() if words else "Anywhere"
+    jsonld = {
+        "@context": "https://schema.org",
+        "@type": "VolunteerAction",
+        "name": title,
+        "organizer": {"@type": "Organization", "name": organization},
+        "location": {
+            "@type": "Place",
+            "address": {
+                "@type": "PostalAddress",
+                "streetAddress": f"{sum(map(ord, listing_id)) % 200 + 1} High Street",
+                "addressLocality": city,
+            },
+        },
+    }
+    template = _read_fixture("detail_page.html") or "<html><head><script type=\"application/ld+json\">{{JSONLD}}</script></head></html>"
+    return (
+        template.replace("{{JSONLD}}", json.dumps(jsonld))
+        .replace("{{TITLE}}", html.escape(title))
+        .replace("{{ORGANIZATION}}", html.escape(organization))
+        .replace("{{ORG_ID}}", listing_id[:12])
+    )
+
+
+def make_handler(state: ReplayState):
+    class ReplayHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):  # keep benchmark output quiet
+            pass
+
+        def _send(self, status: int, body: str):
+            payload = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            state.delay()
+            parsed = urlparse(self.path)
+            qs = parse_qs(parsed.query)
+
+            if parsed.path.rstrip("/") == "/en/volunteer":
+                try:
+                    page = int(qs.get("page", ["1"])[0])
+                except ValueError:
+                    page = 1
+                location = qs.get("location", [""])[0]
+                if page > state.pages:
+                    state.count("empty")
+                    self._send(200, _read_fixture("empty_state.html") or "<html><body></body></html>")
+                else:
+                    state.count("search")
+                    self._send(200, _render_search_page(state, location, page))
+                return
+
+            if parsed.path.startswith("/en/volunteer-opportunity/"):
+                state.count("detail")
+                self._send(200, _render_detail_page(parsed.path.rstrip("/").split("/")[-1]))
+                return
+
+            state.count("other")
+            self._send(404, "<html><body>not found</body></html>")
+
+    return ReplayHandler
+
+
+def start_replay_server(host: str = "127.0.0.1", port: int = 0, state: Optional[ReplayState] = None):
+    """
+    Start the replay server on a background thread.
+    Returns (server, state, base_url); call server.shutdown() to stop it.
+    """
+    state = state or ReplayState()
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="idealist-replay", daemon=True)
+    thread.start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    return server, state, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay captured Idealist pages for local scraping runs.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=5, help="Number of result pages before the empty state")
+    parser.add_argument("--per-page", type=int, default=20, help="Listings per generated results page")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Artificial latency added to every response")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Extra random latency (0..jitter) per response")
+    args = parser.parse_args()
+
+    state = ReplayState(pages=args.pages, per_page=args.per_page, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"Replaying Idealist fixtures on http://{args.host}:{server.server_address[1]} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
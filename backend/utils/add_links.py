@@ -20,6 +20,9 @@ Behavior:
 Notes:
   - If there are more links than locations, extra links are ignored (warning logged).
   - If there are more locations than links, extra locations receive "link": None and "name": None.
+
+add_links_by_id() is the position-independent variant: each location carries the "id" that was
+sent with its link, so a dropped or reordered entry cannot shift links onto the wrong coordinates.
 """
 
 import logging
@@ -141,3 +144,42 @@ def add_links_to_locations(locations: Optional[List[Dict[str, Any]]],
         )
 
     return out
+
+
+def add_links_by_id(locations: Optional[List[Dict[str, Any]]],
+                    links_by_id: Dict[str, str]) -> List[Dict[str, Any]]:
+    """
+    Attach links and extracted names to parsed locations by their echoed "id".
+
+    Args:
+      locations: list of dicts, each expected to carry an "id" key (may be None)
+      links_by_id: mapping of the ids sent in the request to their links
+
+    Returns:
+      new_locations: one dict per known id (first occurrence wins), with "link" and "name" added and
+      "id" removed. Locations with a missing or unknown id are dropped (warning logged).
+    """
+    if not locations:
+        return []
+
+    out: List[Dict[str, Any]] = []
+    seen = set()
+    unknown = 0
+    for loc in locations:
+        item_id = loc.get("id")
+        link = links_by_id.get(item_id) if item_id is not None else None
+        if link is None:
+            unknown += 1
+            continue
+        if item_id in seen:
+            continue
+        seen.add(item_id)
+        new_loc = {k: v for k, v in loc.items() if k != "id"}
+        new_loc["link"] = link
+        if "name" not in new_loc:
+            new_loc["name"] = _extract_name_from_link(link)
+        out.append(new_loc)
+
+    if unknown:
+        logger.warning("add_links_by_id: dropped %d parsed locations with a missing or unknown id", unknown)
+    return out
@@ -0,0 +1,310 @@
+# backend/utils/airport_index.py
+"""
+Offline nearest-airport lookups over an OurAirports-style CSV, in front of Google Places.
+
+Data: backend/data/airports.csv (override with AIRPORTS_CSV), with OurAirports' airports.csv columns
+(ident, type, name, latitude_deg, longitude_deg, iso_country, municipality, scheduled_service,
+iata_code, ...). It is not bundled; fetch it once with
+  python -m utils.airport_index fetch
+which downloads OurAirports' public-domain file and keeps only actual airports.
+
+Index: airports are stored as 3D unit vectors in a KD-tree (median splits on the widest axis,
+LEAF_SIZE points per leaf). Straight-line (chord) distance between unit vectors grows monotonically
+with great-circle distance, so the k nearest by chord are the k nearest on the globe, with no
+antimeridian or pole special cases. One tree is built per filter (airport sizes x scheduled service
+only) on first use, so filtered queries never walk past excluded airports.
+
+Usage:
+    index = get_airport_index()
+    for airport, distance_km in index.nearest(51.5, -0.12, k=3, sizes=("large", "medium")):
+        ...
+    index.nearest_many(lats, lngs, k=1)   # one result list per point
+
+CLI (from backend/):
+  python -m utils.airport_index fetch [--url ...] [--all-types]
+  python -m utils.airport_index query 51.5 -0.12 [-k 3] [--sizes large medium] [--any-service]
+"""
+
+import argparse
+import csv
+import heapq
+import io
+import logging
+import math
+import os
+import tempfile
+import threading
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OURAIRPORTS_URL = os.environ.get("OURAIRPORTS_URL", "https://davidmegginson.github.io/ourairports-data/airports.csv")
+
+EARTH_RADIUS_KM = 6371.0
+LEAF_SIZE = 16
+
+# OurAirports types, by the size names the API accepts
+SIZE_TYPES = {
+    "large": "large_airport",
+    "medium": "medium_airport",
+    "small": "small_airport",
+}
+DEFAULT_SIZES = ("large", "medium")
+
+
+class Airport(NamedTuple):
+    ident: str
+    type: str
+    name: str
+    lat: float
+    lng: float
+    iso_country: str
+    municipality: str
+    scheduled_service: bool
+    iata_code: str
+
+
+def default_airports_path() -> str:
+    return os.environ.get("AIRPORTS_CSV") or os.path.normpath(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "airports.csv")
+    )
+
+
+def _unit_vectors(lat, lng) -> np.ndarray:
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lng = np.radians(np.asarray(lng, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)], axis=-1)
+
+
+def _chord_to_km(chord: float) -> float:
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+class _KDTree:
+    """Static KD-tree over (n, 3) points; nodes are kept in flat lists."""
+
+    def __init__(self, points: np.ndarray):
+        self.points = points
+        self.order = np.arange(len(points))
+        self._start: List[int] = []
+        self._end: List[int] = []
+        self._dim: List[int] = []      # -1 for leaves
+        self._split: List[float] = []
+        self._left: List[int] = []
+        self._right: List[int] = []
+        if len(points):
+            self._build(0, len(points))
+
+    def _build(self, start: int, end: int) -> int:
+        node = len(self._start)
+        self._start.append(start)
+        self._end.append(end)
+        self._dim.append(-1)
+        self._split.append(0.0)
+        self._left.append(-1)
+        self._right.append(-1)
+        if end - start <= LEAF_SIZE:
+            return node
+        idx = self.order[start:end]
+        pts = self.points[idx]
+        dim = int(np.argmax(pts.max(axis=0) - pts.min(axis=0)))
+        mid = (end - start) // 2
+        part = np.argpartition(pts[:, dim], mid)
+        self.order[start:end] = idx[part]
+        self._dim[node] = dim
+        self._split[node] = float(self.points[self.order[start + mid], dim])
+        self._left[node] = self._build(start, start + mid)
+        self._right[node] = self._build(start + mid, end)
+        return node
+
+    def query(self, q: np.ndarray, k: int) -> List[Tuple[float, int]]:
+        """(squared chord distance, point index) of the k nearest points, nearest first."""
+        if not self._start:
+            return []
+        best: List[Tuple[float, int]] = []   # max-heap via negated distances
+        qx, qy, qz = float(q[0]), float(q[1]), float(q[2])
+        qs = (qx, qy, qz)
+        stack: List[Tuple[int, float]] = [(0, 0.0)]
+        while stack:
+            node, bound = stack.pop()
+            if len(best) == k and bound >= -best[0][0]:
+                continue
+            dim = self._dim[node]
+            if dim < 0:
+                idx = self.order[self._start[node]:self._end[node]]
+                diff = self.points[idx] - q
+                d2 = np.einsum("ij,ij->i", diff, diff)
+                for dist, i in zip(d2.tolist(), idx.tolist()):
+                    if len(best) < k:
+                        heapq.heappush(best, (-dist, i))
+                    elif dist < -best[0][0]:
+                        heapq.heapreplace(best, (-dist, i))
+                continue
+            delta = qs[dim] - self._split[node]
+            near, far = (self._left[node], self._right[node]) if delta < 0 else (self._right[node], self._left[node])
+            stack.append((far, max(bound, delta * delta)))
+            stack.append((near, bound))
+        return sorted((-d, i) for d, i in best)
+
+
+class AirportIndex:
+    def __init__(self, airports: List[Airport]):
+        self.airports = airports
+        self._vectors = _unit_vectors([a.lat for a in airports], [a.lng for a in airports]).reshape(-1, 3)
+        self._trees: Dict[Tuple[FrozenSet[str], bool], Tuple[_KDTree, np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "AirportIndex":
+        path = path or default_airports_path()
+        airports: List[Airport] = []
+        if not os.path.exists(path):
+            logger.info("No airport dataset at %s; run `python -m utils.airport_index fetch`", path)
+            return cls(airports)
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                try:
+                    lat, lng = float(row["latitude_deg"]), float(row["longitude_deg"])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                airports.append(Airport(
+                    ident=row.get("ident") or "",
+                    type=row.get("type") or "",
+                    name=row.get("name") or "",
+                    lat=lat,
+                    lng=lng,
+                    iso_country=row.get("iso_country") or "",
+                    municipality=row.get("municipality") or "",
+                    scheduled_service=(row.get("scheduled_service") or "").strip().lower() == "yes",
+                    iata_code=row.get("iata_code") or "",
+                ))
+        logger.info("Loaded %d airports from %s", len(airports), path)
+        return cls(airports)
+
+    def __len__(self) -> int:
+        return len(self.airports)
+
+    def _tree(self, sizes: Iterable[str], scheduled_only: bool) -> Tuple[_KDTree, np.ndarray]:
+        types = frozenset(SIZE_TYPES[s] for s in sizes)
+        key = (types, scheduled_only)
+        with self._lock:
+            entry = self._trees.get(key)
+            if entry is None:
+                members = np.asarray([
+                    i for i, a in enumerate(self.airports)
+                    if a.type in types and (a.scheduled_service or not scheduled_only)
+                ], dtype=np.int64)
+                entry = self._trees[key] = (_KDTree(self._vectors[members]), members)
+            return entry
+
+    def nearest(
+        self,
+        lat: float,
+        lng: float,
+        k: int = 1,
+        sizes: Sequence[str] = DEFAULT_SIZES,
+        scheduled_only: bool = True,
+    ) -> List[Tuple[Airport, float]]:
+        """The k nearest matching airports to (lat, lng) with their distances in km, nearest first."""
+        return self.nearest_many([lat], [lng], k, sizes, scheduled_only)[0]
+
+    def nearest_many(
+        self,
+        lats: Sequence[float],
+        lngs: Sequence[float],
+        k: int = 1,
+        sizes: Sequence[str] = DEFAULT_SIZES,
+        scheduled_only: bool = True,
+    ) -> List[List[Tuple[Airport, float]]]:
+        """nearest() for many points; the points are projected to unit vectors in one pass."""
+        unknown = [s for s in sizes if s not in SIZE_TYPES]
+        if unknown:
+            raise ValueError(f"unknown airport size(s): {', '.join(unknown)} (use {', '.join(SIZE_TYPES)})")
+        tree, members = self._tree(sizes, scheduled_only)
+        queries = _unit_vectors(lats, lngs).reshape(-1, 3)
+        out: List[List[Tuple[Airport, float]]] = []
+        for q in queries:
+            out.append([
+                (self.airports[int(members[i])], _chord_to_km(math.sqrt(d2)))
+                for d2, i in tree.query(q, max(1, k))
+            ])
+        return out
+
+
+_index: Optional[AirportIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_airport_index() -> AirportIndex:
+    """Process-wide airport index, loaded on first use (empty when the dataset is missing)."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = AirportIndex.load()
+        return _index
+
+
+# airport types worth keeping from the full OurAirports file
+_KEEP_TYPES = frozenset(SIZE_TYPES.values())
+
+
+def fetch(url: str = OURAIRPORTS_URL, path: Optional[str] = None, all_types: bool = False) -> int:
+    """Download an OurAirports airports.csv to `path` (atomically); returns the number of rows kept."""
+    import requests
+
+    path = path or default_airports_path()
+    response = requests.get(url, timeout=60)
+    response.raise_for_status()
+    reader = csv.DictReader(io.StringIO(response.content.decode("utf-8")))
+    dir_name = os.path.dirname(os.path.abspath(path)) or "."
+    os.makedirs(dir_name, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix="airports_", suffix=".csv", dir=dir_name)
+    kept = 0
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=reader.fieldnames or [])
+            writer.writeheader()
+            for row in reader:
+                if all_types or row.get("type") in _KEEP_TYPES:
+                    writer.writerow(row)
+                    kept += 1
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except Exception:
+                pass
+    return kept
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline airport dataset and nearest-airport queries")
+    sub = parser.add_subparsers(dest="command", required=True)
+    fetch_cmd = sub.add_parser("fetch", help="Download the OurAirports dataset to backend/data/airports.csv")
+    fetch_cmd.add_argument("--url", default=OURAIRPORTS_URL)
+    fetch_cmd.add_argument("--out", default=None, help="Output path (default AIRPORTS_CSV or backend/data/airports.csv)")
+    fetch_cmd.add_argument("--all-types", action="store_true", help="Keep heliports, seaplane bases and closed airports too")
+    query = sub.add_parser("query", help="Print the nearest airports to a point")
+    query.add_argument("lat", type=float)
+    query.add_argument("lng", type=float)
+    query.add_argument("-k", type=int, default=3)
+    query.add_argument("--sizes", nargs="+", choices=list(SIZE_TYPES), default=list(DEFAULT_SIZES))
+    query.add_argument("--any-service", action="store_true", help="Include airports without scheduled service")
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        out = args.out or default_airports_path()
+        print(f"Wrote {fetch(args.url, out, args.all_types)} airports to {out}")
+        return
+    index = AirportIndex.load()
+    for airport, distance in index.nearest(args.lat, args.lng, args.k, args.sizes, not args.any_service):
+        code = airport.iata_code or airport.ident
+        print(f"{distance:9.1f} km  {code:<5} {airport.name} ({airport.municipality}, {airport.iso_country}) [{airport.type}]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+# backend/utils/country_validator.py
+"""
+Point-in-polygon country check for geocoded opportunities, against client/public/countries.geojson.
+
+Gemini (and, less often, the gazetteer) sometimes reports a country that does not match the
+coordinates it returned. This module finds the country whose polygon actually contains each point,
+so a wrong `country` can be corrected or flagged. A reported country the map has no polygon for
+(Singapore, Hong Kong, Bahrain) cannot be checked and is left as reported ("unverifiable").
+
+countries.geojson is loaded once per process:
+  - every Polygon / MultiPolygon part becomes one polygon; its exterior ring and holes are stored as
+    flat edge arrays (x0, y0, x1, y1 and the inverse slope), so holes fall out of the even-odd rule
+  - polygon bounding boxes are packed into nodes of NODE_SIZE with Sort-Tile-Recursive ordering
+    (a one-level R-tree), so a point is only tested against polygons whose boxes contain it
+
+classify() takes whole arrays of points: the node and polygon box tests are NumPy broadcasts, and the
+ray-casting test runs over points x edges blocks (capped at COUNTRY_VALIDATE_BLOCK cells each).
+
+Usage:
+    checks = get_country_validator().validate(records)   # records: {"latlon": [lat, lon], "country": ...}
+    fixed = apply_corrections(records, checks)
+
+CLI over the opportunity store (from backend/):
+  python -m utils.country_validator [--country "united kingdom"] [--json]
+  python -m utils.country_validator --fix      # rewrite mismatching countries and re-export opportunities.json
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from utils.gazetteer import countries_geojson_path, normalize_country
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on points x edges evaluated at once by the ray-casting test
+VALIDATE_BLOCK = int(os.environ.get("COUNTRY_VALIDATE_BLOCK", "2000000"))
+
+# A point this close to its reported country's outline is left as reported: the map's polygons are
+# coarse, so coastal and border towns often fall just outside them (or just inside a neighbour)
+BORDER_TOLERANCE_KM = float(os.environ.get("COUNTRY_BORDER_TOLERANCE_KM", "25"))
+
+# Polygons per R-tree node
+NODE_SIZE = 16
+
+KM_PER_DEGREE = 111.195
+
+# Statuses reported per point
+STATUS_OK = "ok"               # the point lies in the reported country
+STATUS_NEAR_BORDER = "near_border"   # outside the reported country, but within BORDER_TOLERANCE_KM of it
+STATUS_MISMATCH = "mismatch"   # the point lies in a different country
+STATUS_MISSING = "missing"     # no country was reported; the point lies in one
+STATUS_OUTSIDE = "outside"     # the point lies in no polygon (sea, or a country the map does not have)
+STATUS_UNVERIFIABLE = "unverifiable"   # the map has no polygon for the reported country (Singapore, Hong Kong)
+STATUS_INVALID = "invalid"     # no usable latlon
+
+CORRECTABLE = frozenset({STATUS_MISMATCH, STATUS_MISSING})
+
+
+class CountryCheck(NamedTuple):
+    index: int
+    reported: Optional[str]   # normalized, None when the record had no country
+    detected: Optional[str]   # normalized name of the containing country, None if there is none
+    status: str
+
+
+def _polygons(geometry: Dict) -> List:
+    gtype = geometry.get("type")
+    coords = geometry.get("coordinates") or []
+    return [coords] if gtype == "Polygon" else coords if gtype == "MultiPolygon" else []
+
+
+class CountryValidator:
+    def __init__(self, countries: List[str], polygons: List[List[List[List[float]]]], polygon_country: List[int]):
+        """
+        Args:
+          countries: normalized country names
+          polygons: each a list of rings (exterior first), each ring a list of [lon, lat]
+          polygon_country: index into `countries` per polygon
+        """
+        self.countries = countries
+        self._country_index = {name: i for i, name in enumerate(countries)}
+        self._edges_by_country: Dict[int, np.ndarray] = {}
+        boxes = []
+        for polygon in polygons:
+            exterior = np.asarray(polygon[0], dtype=np.float64)[:, :2]
+            boxes.append((exterior[:, 0].min(), exterior[:, 1].min(), exterior[:, 0].max(), exterior[:, 1].max()))
+        boxes_arr = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+        # Sort-Tile-Recursive packing: slice by box centre x, sort each slice by centre y, cut into nodes
+        order = np.arange(len(polygons))
+        if len(polygons):
+            centre_x = (boxes_arr[:, 0] + boxes_arr[:, 2]) / 2
+            centre_y = (boxes_arr[:, 1] + boxes_arr[:, 3]) / 2
+            n_nodes = math.ceil(len(polygons) / NODE_SIZE)
+            per_slice = NODE_SIZE * math.ceil(math.sqrt(n_nodes))
+            by_x = np.argsort(centre_x, kind="stable")
+            order = np.concatenate([
+                s[np.argsort(centre_y[s], kind="stable")] for s in np.array_split(by_x, range(per_slice, len(by_x), per_slice))
+            ])
+
+        self._boxes = boxes_arr[order]
+        self._country = np.asarray(polygon_country, dtype=np.int32)[order] if len(polygons) else np.zeros(0, np.int32)
+        self._node_start = np.arange(0, len(polygons), NODE_SIZE)
+        self._node_boxes = np.asarray([
+            (b[:, 0].min(), b[:, 1].min(), b[:, 2].max(), b[:, 3].max())
+            for b in (self._boxes[s:s + NODE_SIZE] for s in self._node_start)
+        ], dtype=np.float64).reshape(-1, 4)
+
+        # Edges of every ring, polygon after polygon (in packed order)
+        x0: List[np.ndarray] = []
+        y0: List[np.ndarray] = []
+        x1: List[np.ndarray] = []
+        y1: List[np.ndarray] = []
+        self._edge_range = np.zeros((len(polygons), 2), dtype=np.int64)
+        n_edges = 0
+        for k, p in enumerate(order):
+            start = n_edges
+            for ring in polygons[p]:
+                pts = np.asarray(ring, dtype=np.float64)[:, :2]
+                if len(pts) < 3:
+                    continue
+                nxt = np.roll(pts, -1, axis=0)   # closes the ring whether or not it repeats its first point
+                x0.append(pts[:, 0])
+                y0.append(pts[:, 1])
+                x1.append(nxt[:, 0])
+                y1.append(nxt[:, 1])
+                n_edges += len(pts)
+            self._edge_range[k] = (start, n_edges)
+
+        def cat(parts):
+            return np.concatenate(parts) if parts else np.zeros(0, np.float64)
+
+        self._x0, self._y0, self._x1, self._y1 = cat(x0), cat(y0), cat(x1), cat(y1)
+        dy = self._y1 - self._y0
+        # horizontal edges never straddle a ray, so their (unused) inverse slope is left at 0
+        self._inv_slope = np.divide(self._x1 - self._x0, dy, out=np.zeros_like(dy), where=dy != 0)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "CountryValidator":
+        with open(path or countries_geojson_path(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        countries: List[str] = []
+        country_index: Dict[str, int] = {}
+        polygons: List = []
+        polygon_country: List[int] = []
+        for feature in data.get("features", []):
+            name = normalize_country((feature.get("properties") or {}).get("name"))
+            if not name:
+                continue
+            for polygon in _polygons(feature.get("geometry") or {}):
+                if not polygon or len(polygon[0]) < 3:
+                    continue
+                if name not in country_index:
+                    country_index[name] = len(countries)
+                    countries.append(name)
+                polygons.append(polygon)
+                polygon_country.append(country_index[name])
+        logger.info("Loaded %d polygons for %d countries", len(polygons), len(countries))
+        return cls(countries, polygons, polygon_country)
+
+    def __len__(self) -> int:
+        return len(self._boxes)
+
+    # ----- classification -----
+
+    def _contains(self, k: int, px: np.ndarray, py: np.ndarray) -> np.ndarray:
+        """Even-odd ray-casting test of points against packed polygon k (exterior and holes)."""
+        start, end = self._edge_range[k]
+        x0, y0, y1 = self._x0[start:end], self._y0[start:end], self._y1[start:end]
+        inv_slope = self._inv_slope[start:end]
+        inside = np.zeros(len(px), dtype=bool)
+        step = max(1, VALIDATE_BLOCK // max(1, end - start))
+        for s in range(0, len(px), step):
+            bx = px[s:s + step, None]
+            by = py[s:s + step, None]
+            straddles = (y0 > by) != (y1 > by)
+            crosses = straddles & (bx < x0 + (by - y0) * inv_slope)
+            inside[s:s + step] = np.count_nonzero(crosses, axis=1) % 2 == 1
+        return inside
+
+    def classify(self, lats: Sequence[float], lons: Sequence[float]) -> List[Optional[str]]:
+        """Normalized country containing each point, or None."""
+        lat = np.asarray(lats, dtype=np.float64).reshape(-1)
+        lon = ((np.asarray(lons, dtype=np.float64).reshape(-1) + 180.0) % 360.0) - 180.0
+        found = np.full(len(lat), -1, dtype=np.int32)
+        if not len(lat) or not len(self._boxes):
+            return [None] * len(lat)
+
+        nb = self._node_boxes
+        node_hits = (
+            (lon[:, None] >= nb[:, 0]) & (lat[:, None] >= nb[:, 1])
+            & (lon[:, None] <= nb[:, 2]) & (lat[:, None] <= nb[:, 3])
+        )
+        for node in np.flatnonzero(node_hits.any(axis=0)):
+            candidates = np.flatnonzero(node_hits[:, node])
+            start = self._node_start[node]
+            for k in range(start, min(start + NODE_SIZE, len(self._boxes))):
+                candidates = candidates[found[candidates] < 0]   # countries do not overlap
+                if not len(candidates):
+                    break
+                west, south, east, north = self._boxes[k]
+                cx, cy = lon[candidates], lat[candidates]
+                in_box = candidates[(cx >= west) & (cy >= south) & (cx <= east) & (cy <= north)]
+                if not len(in_box):
+                    continue
+                inside = self._contains(k, lon[in_box], lat[in_box])
+                found[in_box[inside]] = self._country[k]
+        return [self.countries[i] if i >= 0 else None for i in found.tolist()]
+
+    def _country_edges(self, country: int) -> np.ndarray:
+        edges = self._edges_by_country.get(country)
+        if edges is None:
+            ranges = self._edge_range[self._country == country]
+            edges = np.concatenate([np.arange(s, e) for s, e in ranges]) if len(ranges) else np.zeros(0, np.int64)
+            self._edges_by_country[country] = edges
+        return edges
+
+    def distance_to_country_km(self, country: str, lats: Sequence[float], lons: Sequence[float]) -> np.ndarray:
+        """Approximate distance from each point to the outline of `country` (NaN if the map lacks it)."""
+        lat = np.asarray(lats, dtype=np.float64).reshape(-1)
+        lon = np.asarray(lons, dtype=np.float64).reshape(-1)
+        out = np.full(len(lat), np.nan)
+        index = self._country_index.get(normalize_country(country))
+        if index is None:
+            return out
+        edges = self._country_edges(index)
+        if not len(edges):
+            return out
+        x0, y0, x1, y1 = self._x0[edges], self._y0[edges], self._x1[edges], self._y1[edges]
+        step = max(1, VALIDATE_BLOCK // len(edges))
+        for s in range(0, len(lat), step):
+            by = lat[s:s + step, None]
+            bx = lon[s:s + step, None]
+            # local equirectangular frame centred on the point (longitudes wrapped, scaled by cos(lat))
+            k = np.cos(np.radians(by))
+            ax = (((x0 - bx) + 180.0) % 360.0 - 180.0) * k
+            cx = (((x1 - bx) + 180.0) % 360.0 - 180.0) * k
+            ay, cy = y0 - by, y1 - by
+            dx, dy = cx - ax, cy - ay
+            length2 = dx * dx + dy * dy
+            t = np.clip(np.divide(-(ax * dx + ay * dy), length2, out=np.zeros_like(length2), where=length2 > 0), 0.0, 1.0)
+            px, py = ax + t * dx, ay + t * dy
+            out[s:s + step] = np.sqrt((px * px + py * py).min(axis=1)) * KM_PER_DEGREE
+        return out
+
+    def validate(self, records: Sequence[Dict[str, Any]]) -> List[CountryCheck]:
+        """Check every record's `country` against its `latlon`, in one vectorized pass."""
+        lats: List[float] = []
+        lons: List[float] = []
+        placed: List[int] = []
+        for i, record in enumerate(records):
+            latlon = record.get("latlon")
+            try:
+                lat, lon = float(latlon[0]), float(latlon[1])
+            except (TypeError, ValueError, IndexError):
+                continue
+            if math.isfinite(lat) and math.isfinite(lon) and -90.0 <= lat <= 90.0:
+                lats.append(lat)
+                lons.append(lon)
+                placed.append(i)
+        detected_by_index = dict(zip(placed, self.classify(lats, lons)))
+
+        checks: List[CountryCheck] = []
+        for i, record in enumerate(records):
+            reported = normalize_country(record.get("country")) or None
+            if i not in detected_by_index:
+                checks.append(CountryCheck(i, reported, None, STATUS_INVALID))
+                continue
+            detected = detected_by_index[i]
+            if reported is not None and reported not in self._country_index:
+                # a small country the map leaves out would otherwise look like its neighbour's point
+                status = STATUS_UNVERIFIABLE
+            elif detected is None:
+                status = STATUS_OUTSIDE
+            elif reported is None:
+                status = STATUS_MISSING
+            elif reported == detected:
+                status = STATUS_OK
+            else:
+                status = STATUS_MISMATCH
+            checks.append(CountryCheck(i, reported, detected, status))
+
+        # Mismatches and misses right at the reported country's outline are map coarseness, not errors
+        suspects: Dict[str, List[int]] = {}
+        for check in checks:
+            if check.status in (STATUS_MISMATCH, STATUS_OUTSIDE) and check.reported is not None:
+                suspects.setdefault(check.reported, []).append(check.index)
+        for reported, indices in suspects.items():
+            points = [records[i]["latlon"] for i in indices]
+            distances = self.distance_to_country_km(reported, [p[0] for p in points], [p[1] for p in points])
+            for i, distance in zip(indices, distances.tolist()):
+                if distance <= BORDER_TOLERANCE_KM:
+                    checks[i] = checks[i]._replace(status=STATUS_NEAR_BORDER)
+        return checks
+
+
+def apply_corrections(records: List[Dict[str, Any]], checks: Sequence[CountryCheck]) -> int:
+    """Set `country` to the detected country wherever it was wrong or missing; returns how many changed."""
+    fixed = 0
+    for check in checks:
+        if check.status in CORRECTABLE:
+            records[check.index]["country"] = check.detected
+            fixed += 1
+    return fixed
+
+
+_validator: Optional[CountryValidator] = None
+_validator_lock = threading.Lock()
+
+
+def get_country_validator() -> CountryValidator:
+    """Process-wide validator, built from countries.geojson on first use."""
+    global _validator
+    with _validator_lock:
+        if _validator is None:
+            _validator = CountryValidator.load()
+        return _validator
+
+
+def main():
+    from utils.opportunity_store import get_opportunity_store
+
+    parser = argparse.ArgumentParser(description="Check stored opportunities' countries against countries.geojson")
+    parser.add_argument("--country", default=None, help="Only check this store country key")
+    parser.add_argument("--fix", action="store_true", help="Correct mismatching / missing countries in the store")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    store = get_opportunity_store()
+    rows = store.all()
+    if args.country:
+        country_key = args.country.strip().lower()
+        rows = [row for row in rows if row.country_key == country_key]
+    records = [dict(row.record) for row in rows]
+    checks = get_country_validator().validate(records)
+
+    counts: Dict[str, int] = {}
+    for check in checks:
+        counts[check.status] = counts.get(check.status, 0) + 1
+    flagged = [
+        {
+            "country_key": rows[c.index].country_key,
+            "link": records[c.index].get("link"),
+            "latlon": records[c.index].get("latlon"),
+            "reported": c.reported,
+            "detected": c.detected,
+            "status": c.status,
+        }
+        for c in checks if c.status not in (STATUS_OK, STATUS_NEAR_BORDER)
+    ]
+
+    fixed = 0
+    if args.fix:
+        apply_corrections(records, checks)
+        by_country: Dict[str, List[Dict[str, Any]]] = {}
+        for check in checks:
+            if check.status in CORRECTABLE:
+                by_country.setdefault(rows[check.index].country_key, []).append(records[check.index])
+        for country_key, changed in by_country.items():
+            fixed += store.upsert_many(country_key, changed)
+        if fixed:
+            store.export_json()
+
+    if args.json:
+        print(json.dumps({"checked": len(checks), "counts": counts, "fixed": fixed, "flagged": flagged}, indent=2, ensure_ascii=False))
+        return
+
+    print(f"Checked {len(checks)} opportunities: " + ", ".join(f"{k}={v}" for k, v in sorted(counts.items())))
+    for item in flagged:
+        print(f"  {item['status']:>8}  {item['reported'] or '-':>20} -> {item['detected'] or '-':<20} {item['link']}")
+    if args.fix:
+        print(f"Corrected {fixed} opportunities")
+
+
+if __name__ == "__main__":
+    main()
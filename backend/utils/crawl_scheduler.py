@@ -0,0 +1,266 @@
+# backend/utils/crawl_scheduler.py
+"""
+Process-wide politeness scheduler for everything we fetch from a crawled host (idealist.org).
+
+Every scraping path (Selenium page loads and detail-page requests) asks the shared scheduler
+for a slot before touching the network:
+
+    with crawl_scheduler.slot(url, key=country, timeout=deadline.remaining()) as ticket:
+        resp = session.get(url)
+        ticket.record_status(resp.status_code)
+
+Per host it enforces:
+  - a global concurrency cap (CRAWL_MAX_CONCURRENCY_PER_HOST, default 2)
+  - a request rate (CRAWL_RATE_PER_HOST requests/second, default 2) as a minimum spacing between starts
+  - adaptive backoff: the spacing doubles (up to CRAWL_MAX_BACKOFF x) on driver / network errors,
+    429/5xx responses or responses slower than CRAWL_SLOW_THRESHOLD_S, and recovers additively on
+    healthy responses. A caller that gives up because its own time budget ran out raises
+    BudgetExceeded inside the slot; that says nothing about the host, so it never feeds backoff.
+  - fair queuing: waiting requests are granted round-robin across keys (countries), so one large
+    crawl cannot starve a concurrent one
+
+metrics() returns a JSON-friendly snapshot of all of the above (exposed at /api/idealist/crawl-metrics).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Optional
+from urllib.parse import urlparse
+
+
+class CrawlSlotTimeout(TimeoutError):
+    """Raised when a slot could not be granted before the caller's timeout."""
+
+
+class BudgetExceeded(TimeoutError):
+    """Raised by a caller inside slot() when its own time budget ran out (not a host failure)."""
+
+
+class _Waiter:
+    __slots__ = ("key", "event", "granted", "enqueued_at")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.event = threading.Event()
+        self.granted = False
+        self.enqueued_at = time.monotonic()
+
+
+class _HostState:
+    def __init__(self):
+        self.in_flight = 0
+        self.next_start = 0.0
+        self.backoff = 1.0
+        self.queues: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        # counters
+        self.granted = 0
+        self.completed = 0
+        self.aborted = 0
+        self.errors = 0
+        self.slow = 0
+        self.timeouts = 0
+        self.latency_ewma: Optional[float] = None
+        self.wait_ewma: Optional[float] = None
+        self.granted_by_key: Dict[str, int] = {}
+
+    def queued(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+
+class CrawlTicket:
+    """Handed to the caller inside slot(); lets it report the HTTP status of its request."""
+
+    def __init__(self, host: str, key: str, waited_s: float):
+        self.host = host
+        self.key = key
+        self.waited_s = waited_s
+        self.status_code: Optional[int] = None
+
+    def record_status(self, status_code: Optional[int]):
+        self.status_code = status_code
+
+
+def _ewma(prev: Optional[float], value: float, alpha: float = 0.2) -> float:
+    return value if prev is None else prev + alpha * (value - prev)
+
+
+class CrawlScheduler:
+    def __init__(
+        self,
+        max_concurrency_per_host: int = 2,
+        rate_per_host: float = 2.0,
+        slow_threshold_s: float = 5.0,
+        max_backoff: float = 16.0,
+    ):
+        self.max_concurrency = max(1, max_concurrency_per_host)
+        self.base_interval = 1.0 / rate_per_host if rate_per_host > 0 else 0.0
+        self.slow_threshold_s = slow_threshold_s
+        self.max_backoff = max(1.0, max_backoff)
+        self._lock = threading.Lock()
+        self._hosts: Dict[str, _HostState] = {}
+
+    @classmethod
+    def from_env(cls) -> "CrawlScheduler":
+        return cls(
+            max_concurrency_per_host=int(os.environ.get("CRAWL_MAX_CONCURRENCY_PER_HOST", "2")),
+            rate_per_host=float(os.environ.get("CRAWL_RATE_PER_HOST", "2")),
+            slow_threshold_s=float(os.environ.get("CRAWL_SLOW_THRESHOLD_S", "5")),
+            max_backoff=float(os.environ.get("CRAWL_MAX_BACKOFF", "16")),
+        )
+
+    # ----- internals (all called with self._lock held) -----
+
+    def _host(self, host: str) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = _HostState()
+            self._hosts[host] = state
+        return state
+
+    def _interval(self, state: _HostState) -> float:
+        return self.base_interval * state.backoff
+
+    def _dispatch(self, state: _HostState):
+        """Grant as many queued waiters as concurrency and rate currently allow, round-robin by key."""
+        now = time.monotonic()
+        while state.queues and state.in_flight < self.max_concurrency and now >= state.next_start:
+            key, queue = next(iter(state.queues.items()))
+            waiter = queue.popleft()
+            # rotate this key to the back so the next grant goes to another key
+            del state.queues[key]
+            if queue:
+                state.queues[key] = queue
+            waiter.granted = True
+            state.in_flight += 1
+            state.granted += 1
+            state.granted_by_key[key] = state.granted_by_key.get(key, 0) + 1
+            state.wait_ewma = _ewma(state.wait_ewma, now - waiter.enqueued_at)
+            state.next_start = now + self._interval(state)
+            waiter.event.set()
+
+    def _remove(self, state: _HostState, waiter: _Waiter):
+        queue = state.queues.get(waiter.key)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        if not queue:
+            del state.queues[waiter.key]
+
+    def _adapt(self, state: _HostState, latency: float, failed: bool):
+        slow = latency > self.slow_threshold_s
+        if slow:
+            state.slow += 1
+        if failed:
+            state.errors += 1
+        if failed or slow:
+            state.backoff = min(self.max_backoff, state.backoff * 2.0)
+        else:
+            state.backoff = max(1.0, state.backoff - 0.25)
+
+    # ----- public API -----
+
+    def acquire(self, host: str, key: str = "", timeout: Optional[float] = None) -> float:
+        """
+        Block until a slot on `host` is granted. Returns the time spent waiting (seconds).
+        Raises CrawlSlotTimeout if `timeout` elapses first.
+        """
+        waiter = _Waiter(key)
+        give_up_at = None if timeout is None else waiter.enqueued_at + max(0.0, timeout)
+        with self._lock:
+            state = self._host(host)
+            state.queues.setdefault(key, deque()).append(waiter)
+            self._dispatch(state)
+
+        while True:
+            with self._lock:
+                if waiter.granted:
+                    return time.monotonic() - waiter.enqueued_at
+                now = time.monotonic()
+                if give_up_at is not None and now >= give_up_at:
+                    self._remove(state, waiter)
+                    state.timeouts += 1
+                    raise CrawlSlotTimeout(f"no crawl slot for {host} within {timeout:.2f}s")
+                # wake up when the rate limit would next allow a start (or on release)
+                wait_for = max(0.005, state.next_start - now) if state.in_flight < self.max_concurrency else 0.25
+                if give_up_at is not None:
+                    wait_for = min(wait_for, max(0.0, give_up_at - now))
+            waiter.event.wait(wait_for)
+            with self._lock:
+                if not waiter.granted:
+                    self._dispatch(state)
+
+    def release(self, host: str, latency: float, failed: bool = False, aborted: bool = False):
+        """Free a slot. An `aborted` request (the caller gave up) leaves latency stats and backoff alone."""
+        with self._lock:
+            state = self._host(host)
+            state.in_flight = max(0, state.in_flight - 1)
+            if aborted:
+                state.aborted += 1
+            else:
+                state.completed += 1
+                state.latency_ewma = _ewma(state.latency_ewma, latency)
+                self._adapt(state, latency, failed)
+            self._dispatch(state)
+
+    @contextmanager
+    def slot(self, url: str, key: str = "", timeout: Optional[float] = None):
+        """
+        Context manager around acquire()/release() that times the request and feeds backoff.
+        Exceptions raised inside count as host failures, except BudgetExceeded.
+        """
+        host = urlparse(url).netloc.lower() or url
+        waited = self.acquire(host, key=key, timeout=timeout)
+        ticket = CrawlTicket(host, key, waited)
+        started = time.monotonic()
+        failed = aborted = False
+        try:
+            yield ticket
+        except BudgetExceeded:
+            aborted = True
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            status = ticket.status_code
+            if status is not None and (status == 429 or status >= 500):
+                failed = True
+            self.release(host, time.monotonic() - started, failed=failed, aborted=aborted)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            hosts = {}
+            for host, state in self._hosts.items():
+                hosts[host] = {
+                    "in_flight": state.in_flight,
+                    "queued": state.queued(),
+                    "queued_by_key": {k: len(q) for k, q in state.queues.items()},
+                    "granted": state.granted,
+                    "granted_by_key": dict(state.granted_by_key),
+                    "completed": state.completed,
+                    "aborted": state.aborted,
+                    "errors": state.errors,
+                    "slow": state.slow,
+                    "slot_timeouts": state.timeouts,
+                    "backoff": round(state.backoff, 3),
+                    "interval_s": round(self._interval(state), 3),
+                    "latency_ewma_s": None if state.latency_ewma is None else round(state.latency_ewma, 3),
+                    "wait_ewma_s": None if state.wait_ewma is None else round(state.wait_ewma, 3),
+                }
+            return {
+                "max_concurrency_per_host": self.max_concurrency,
+                "rate_per_host": None if self.base_interval == 0 else round(1.0 / self.base_interval, 3),
+                "slow_threshold_s": self.slow_threshold_s,
+                "max_backoff": self.max_backoff,
+                "hosts": hosts,
+            }
+
+
+# Shared by every scraping path in this process
+crawl_scheduler = CrawlScheduler.from_env()
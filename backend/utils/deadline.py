@@ -0,0 +1,36 @@
+# backend/utils/deadline.py
+"""
+Small monotonic-clock deadline helper shared by request handlers that accept a time budget.
+
+A Deadline built from budget=None never expires, so callers can thread one through
+unconditionally and only pay for the checks when a budget was actually requested.
+"""
+
+import time
+from typing import Optional
+
+
+class Deadline:
+    def __init__(self, budget_s: Optional[float] = None):
+        self.budget_s = budget_s
+        self.expires_at = None if budget_s is None else time.monotonic() + max(0.0, budget_s)
+
+    @property
+    def bounded(self) -> bool:
+        return self.expires_at is not None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (never negative), or None when there is no budget."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    def clamp(self, timeout: float) -> float:
+        """Return `timeout` shortened to the remaining budget (unchanged when unbounded)."""
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        return min(timeout, remaining)
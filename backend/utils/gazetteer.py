@@ -0,0 +1,333 @@
+# backend/utils/gazetteer.py
+"""
+Offline geocoder for Idealist opportunity links, used in front of Gemini by /convert_idealist.
+
+Most listing slugs end in the listing's location ("...-nucleus-legal-advice-london",
+"...-shop-sense-cambridgeshire"), so a local lookup resolves them without an LLM call.
+
+Data:
+  - backend/data/gazetteer.tsv: GeoNames cities15000 plus admin1 (state / province / nation) and
+    admin2 (county / district) names, one row per place: country, name|alt names, lat, lon, kind,
+    admin1, population. Rebuild it from the GeoNames dumps with tools/build_gazetteer.py.
+  - client/public/countries.geojson (override with COUNTRIES_GEOJSON): country polygons used to
+    derive a centroid for links we cannot place more precisely
+
+Index:
+  - per country, a hash from the normalized token tuple of every name/alt name to its Place (the most
+    populous city first, then regions, then counties), so a lookup is a handful of dict probes.
+
+Slug matching is deliberately strict, since a wrong pin is written to the store:
+  - the place must be the slug's final tokens (the location segment), or sit right next to the
+    organization's name when the detail page gave us one ("...-volunteer-taunton-shop-sense-devon")
+  - names that are everyday words or people's names (AMBIGUOUS_PLACE_NAMES: "reading", "bath",
+    "kent", ...) are never matched from a slug alone; an address can still place them
+
+Usage:
+    gz = get_gazetteer()
+    place = gz.resolve_link(link, "United Kingdom")      # Place or None
+    place = gz.resolve_link(link, "United Kingdom", organization="Shop Sense")
+    place = gz.resolve_address("1 High St, Bristol", "united kingdom")
+    latlon = gz.country_centroid("united kingdom")         # [lat, lon] or None
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+logger = logging.getLogger(__name__)
+
+# Place names that are also everyday words, sports or people's names. A slug naming one of these is far
+# more likely a title ("befriender-reading-volunteer", "bath-time-support") than a location, so slugs
+# never match them; news mentions of them only count alongside their country or region
+AMBIGUOUS_PLACE_NAMES = frozenset({
+    "aurora", "austin", "barry", "bath", "bay", "bury", "capital", "chandler", "charlotte", "chin",
+    "clinton", "columbia", "concord", "darwin", "deal", "delta", "derby", "diana", "east", "eagle",
+    "edison", "enterprise", "est", "fleet", "florence", "franklin", "golden", "green", "hamilton",
+    "henderson", "hope", "independence", "jackson", "kara", "kennedy", "kent", "lakes", "liberty",
+    "lincoln", "madison", "march", "marina", "marion", "mary", "maritime", "mesa", "midlands",
+    "mission", "mobile", "mono", "nacional", "nice", "normal", "northeast", "orange", "oriental",
+    "ouest", "paradise", "pearl", "plateau", "preston", "providence", "reading", "rivers", "rugby",
+    "sale", "salem", "southwest", "sterling", "street", "sud", "surprise", "temple", "tracy", "union",
+    "unity", "university", "van", "victoria", "warren", "washington", "wells", "west",
+})
+
+# Place kinds that only give a rough position; a finer place elsewhere in the text is preferred
+COARSE_KINDS = frozenset({"county", "region", "nation"})
+
+# Requested-country spellings -> gazetteer country name
+COUNTRY_ALIASES = {
+    "uk": "united kingdom",
+    "u k": "united kingdom",
+    "great britain": "united kingdom",
+    "britain": "united kingdom",
+    "england": "united kingdom",
+    "scotland": "united kingdom",
+    "wales": "united kingdom",
+    "northern ireland": "united kingdom",
+    "us": "united states",
+    "usa": "united states",
+    "u s": "united states",
+    "u s a": "united states",
+    "america": "united states",
+    "united states of america": "united states",
+    "united republic of tanzania": "tanzania",
+    "republic of serbia": "serbia",
+    "the bahamas": "bahamas",
+    "czechia": "czech republic",
+    "korea": "south korea",
+    "republic of korea": "south korea",
+    "cote d ivoire": "ivory coast",
+    "timor leste": "east timor",
+    "eswatini": "swaziland",
+    "north macedonia": "macedonia",
+    "the netherlands": "netherlands",
+}
+
+
+class Place(NamedTuple):
+    country: str
+    name: str
+    lat: float
+    lon: float
+    kind: str
+    admin1: str = ""        # state / province / nation the place is in (its own name for a region)
+    population: int = 0
+
+
+def _backend_dir() -> str:
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+def _default_gazetteer_path() -> str:
+    return os.path.join(_backend_dir(), "data", "gazetteer.tsv")
+
+
+def countries_geojson_path() -> str:
+    """client/public/countries.geojson unless COUNTRIES_GEOJSON points elsewhere."""
+    return os.environ.get("COUNTRIES_GEOJSON") or os.path.normpath(
+        os.path.join(_backend_dir(), "..", "client", "public", "countries.geojson")
+    )
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """Accent-fold, lower-case and split on anything that is not a letter or digit."""
+    if not text:
+        return []
+    folded = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return re.findall(r"[a-z0-9]+", folded.lower())
+
+
+def normalize_country(country: Optional[str]) -> str:
+    key = " ".join(normalize_tokens(country or ""))
+    return COUNTRY_ALIASES.get(key, key)
+
+
+def slug_tokens(link: str) -> List[str]:
+    """Tokens of an opportunity URL's slug, without the leading listing id."""
+    try:
+        last = unquote(urlparse(link).path.rstrip("/").split("/")[-1])
+    except Exception:
+        return []
+    _, sep, slug = last.partition("-")
+    return normalize_tokens(slug if sep else last)
+
+
+def _ring_centroid(ring: List[List[float]]) -> Tuple[float, float, float]:
+    """(signed area, centroid lon, centroid lat) of a lon/lat ring via the shoelace formula."""
+    area = cx = cy = 0.0
+    for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]):
+        cross = x0 * y1 - x1 * y0
+        area += cross
+        cx += (x0 + x1) * cross
+        cy += (y0 + y1) * cross
+    area *= 0.5
+    if abs(area) < 1e-12:
+        xs = [p[0] for p in ring]
+        ys = [p[1] for p in ring]
+        return 0.0, sum(xs) / len(xs), sum(ys) / len(ys)
+    return area, cx / (6 * area), cy / (6 * area)
+
+
+def _geometry_centroid(geometry: Dict) -> Optional[List[float]]:
+    """[lat, lon] centroid of the largest polygon (so overseas territories don't drag it into the sea)."""
+    gtype = geometry.get("type")
+    coords = geometry.get("coordinates") or []
+    polygons = [coords] if gtype == "Polygon" else coords if gtype == "MultiPolygon" else []
+    best = None
+    for polygon in polygons:
+        if not polygon or len(polygon[0]) < 3:
+            continue
+        area, lon, lat = _ring_centroid([list(p[:2]) for p in polygon[0]])
+        if best is None or abs(area) > best[0]:
+            best = (abs(area), lat, lon)
+    if best is None:
+        return None
+    return [round(best[1], 4), round(best[2], 4)]
+
+
+class Gazetteer:
+    def __init__(self, places: List[Place]):
+        self._places: List[Tuple[Tuple[str, ...], Place]] = []
+        self._index: Dict[str, Dict[Tuple[str, ...], Place]] = {}
+        self._max_ngram = 1
+        for place in places:
+            by_tokens = self._index.setdefault(place.country, {})
+            primary = place._replace(name=place.name.split("|")[0])
+            seen = set()
+            for alias in place.name.split("|"):
+                tokens = tuple(normalize_tokens(alias))
+                if not tokens or tokens in seen:
+                    continue
+                seen.add(tokens)
+                self._places.append((tokens, primary))
+                # first entry wins, so the TSV lists the more prominent place first
+                by_tokens.setdefault(tokens, primary)
+                self._max_ngram = max(self._max_ngram, len(tokens))
+        self._centroids: Optional[Dict[str, List[float]]] = None
+        self._country_names: Dict[str, str] = {}
+        self._centroid_lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "Gazetteer":
+        path = path or _default_gazetteer_path()
+        places: List[Place] = []
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.rstrip("\n")
+                if not line.strip() or line.startswith("#"):
+                    continue
+                parts = line.split("\t")
+                if len(parts) < 4:
+                    logger.warning("gazetteer.tsv:%d: expected at least 4 columns", line_no)
+                    continue
+                try:
+                    places.append(Place(
+                        country=normalize_country(parts[0]),
+                        name=parts[1].strip(),
+                        lat=float(parts[2]),
+                        lon=float(parts[3]),
+                        kind=parts[4].strip() if len(parts) > 4 else "place",
+                        admin1=parts[5].strip() if len(parts) > 5 else "",
+                        population=int(parts[6] or 0) if len(parts) > 6 else 0,
+                    ))
+                except ValueError:
+                    logger.warning("gazetteer.tsv:%d: bad coordinates or population", line_no)
+        return cls(places)
+
+    def __len__(self) -> int:
+        return sum(len(v) for v in self._index.values())
+
+    def aliases(self) -> Iterator[Tuple[Tuple[str, ...], Place]]:
+        """Every (normalized name tokens, place) pair, including places that share a name, in file order."""
+        return iter(self._places)
+
+    def _scan(self, index: Dict[Tuple[str, ...], Place], tokens: List[str], skip_kinds=None) -> Optional[Place]:
+        """Rightmost, then longest, n-gram that names a place (not of `skip_kinds`)."""
+        for end in range(len(tokens), 0, -1):
+            for n in range(min(self._max_ngram, end), 0, -1):
+                place = index.get(tuple(tokens[end - n:end]))
+                if place is not None and (skip_kinds is None or place.kind not in skip_kinds):
+                    return place
+        return None
+
+    def _ending_at(self, index: Dict[Tuple[str, ...], Place], tokens: List[str], end: int) -> Optional[Place]:
+        """Longest place name that ends exactly before tokens[end] (slug stop words excluded)."""
+        for n in range(min(self._max_ngram, end), 0, -1):
+            gram = tuple(tokens[end - n:end])
+            place = index.get(gram)
+            if place is not None and " ".join(gram) not in AMBIGUOUS_PLACE_NAMES:
+                return place
+        return None
+
+    def _starting_at(self, index: Dict[Tuple[str, ...], Place], tokens: List[str], start: int) -> Optional[Place]:
+        """Longest place name that starts exactly at tokens[start] (slug stop words excluded)."""
+        for n in range(min(self._max_ngram, len(tokens) - start), 0, -1):
+            gram = tuple(tokens[start:start + n])
+            place = index.get(gram)
+            if place is not None and " ".join(gram) not in AMBIGUOUS_PLACE_NAMES:
+                return place
+        return None
+
+    def resolve_link(self, link: str, country: str, organization: Optional[str] = None) -> Optional[Place]:
+        """
+        Place named by the link's slug, scoped to `country`: its final tokens, or (with the listing's
+        `organization`) the name right after or right before the organization's name.
+        """
+        index = self._index.get(normalize_country(country))
+        tokens = slug_tokens(link)
+        if not index or not tokens:
+            return None
+        place = self._ending_at(index, tokens, len(tokens))
+        if place is not None and place.kind not in COARSE_KINDS:
+            return place
+        org = tuple(normalize_tokens(organization or ""))
+        if not org:
+            return place
+        n = len(org)
+        for start in range(len(tokens) - n, -1, -1):
+            if tuple(tokens[start:start + n]) != org:
+                continue
+            # "...-shop-sense-cambridge-uk" names the location right after the organization,
+            # "...-volunteer-taunton-shop-sense-devon" a town right before it (finer than the county)
+            for finer in (self._starting_at(index, tokens, start + n), self._ending_at(index, tokens, start)):
+                if finer is not None and (place is None or finer.kind not in COARSE_KINDS):
+                    return finer
+        return place
+
+    def resolve_address(self, address: str, country: str) -> Optional[Place]:
+        """Place named in a free-text address (searched from the end, where the locality usually is)."""
+        index = self._index.get(normalize_country(country))
+        tokens = normalize_tokens(address)
+        if not index or not tokens:
+            return None
+        place = self._scan(index, tokens)
+        if place is not None and place.kind in COARSE_KINDS:
+            # "..., Taunton, Somerset": a town named earlier beats the trailing county
+            place = self._scan(index, tokens, skip_kinds=COARSE_KINDS) or place
+        return place
+
+    def _load_centroids(self) -> Dict[str, List[float]]:
+        with self._centroid_lock:
+            if self._centroids is None:
+                centroids: Dict[str, List[float]] = {}
+                names: Dict[str, str] = {}
+                try:
+                    with open(countries_geojson_path(), "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    for feature in data.get("features", []):
+                        name = (feature.get("properties") or {}).get("name")
+                        centroid = _geometry_centroid(feature.get("geometry") or {})
+                        if name and centroid:
+                            centroids[normalize_country(name)] = centroid
+                            names.setdefault(normalize_country(name), name)
+                except Exception:
+                    logger.exception("Could not load countries.geojson; country centroids unavailable")
+                self._country_names = names
+                self._centroids = centroids
+            return self._centroids
+
+    def country_centroid(self, country: str) -> Optional[List[float]]:
+        return self._load_centroids().get(normalize_country(country))
+
+    def country_names(self) -> Dict[str, str]:
+        """Normalized country name -> its name in countries.geojson ("united states" -> "United States of America")."""
+        self._load_centroids()
+        return self._country_names
+
+
+_gazetteer: Optional[Gazetteer] = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer() -> Gazetteer:
+    """Process-wide gazetteer, built on first use."""
+    global _gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = Gazetteer.load()
+        return _gazetteer
@@ -0,0 +1,157 @@
+# backend/utils/geocode_cache.py
+"""
+Persistent link -> coordinates cache consulted by /convert_idealist before any geocoder runs.
+
+Entries are keyed by the normalized opportunity URL (utils/opportunity_urls.py) and stored in
+backend/geocode_cache.json as:
+    {"<normalized url>": {"latlon": [lat, lon], "country": "...", "name": "...",
+                          "source": "gazetteer" | "gemini" | "centroid" | "opportunities.json",
+                          "updated_at": <unix seconds>}}
+
+On first use (no cache file yet) the cache is seeded from backend/opportunities.json, so links
+geocoded by earlier runs never go back to Gemini.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.opportunity_urls import normalize_opportunity_url
+
+logger = logging.getLogger(__name__)
+
+
+def _backend_path(name: str) -> str:
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", name))
+
+
+class GeocodeCache:
+    def __init__(self, path: Optional[str] = None, seed_path: Optional[str] = None):
+        self.path = path or _backend_path("geocode_cache.json")
+        self.seed_path = seed_path or _backend_path("opportunities.json")
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+
+    def _seed_from_opportunities(self) -> Dict[str, Dict[str, Any]]:
+        entries: Dict[str, Dict[str, Any]] = {}
+        if not os.path.exists(self.seed_path):
+            return entries
+        try:
+            with open(self.seed_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            logger.exception("Could not read opportunities.json to seed the geocode cache")
+            return entries
+        if not isinstance(data, dict):
+            return entries
+        now = time.time()
+        for records in data.values():
+            if not isinstance(records, list):
+                continue
+            for rec in records:
+                if not isinstance(rec, dict):
+                    continue
+                key = normalize_opportunity_url(rec.get("link"))
+                latlon = rec.get("latlon")
+                if not key or not isinstance(latlon, list) or len(latlon) != 2:
+                    continue
+                entries.setdefault(key, {
+                    "latlon": latlon,
+                    "country": rec.get("country"),
+                    "name": rec.get("name"),
+                    "source": "opportunities.json",
+                    "updated_at": now,
+                })
+        logger.info("Seeded geocode cache with %d links from opportunities.json", len(entries))
+        return entries
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        # caller holds self._lock
+        if self._entries is None:
+            entries = None
+            if os.path.exists(self.path):
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        loaded = json.load(f)
+                    if isinstance(loaded, dict):
+                        entries = loaded
+                except Exception:
+                    logger.exception("geocode_cache.json is unreadable; reseeding from opportunities.json")
+            seeded = entries is None
+            self._entries = self._seed_from_opportunities() if seeded else entries
+            if seeded:
+                self._save_locked()
+        return self._entries
+
+    def _save_locked(self):
+        try:
+            dir_name = os.path.dirname(self.path) or "."
+            fd, tmp_path = tempfile.mkstemp(prefix="geocode_cache_", suffix=".json", dir=dir_name)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as tmpf:
+                    json.dump(self._entries or {}, tmpf, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            finally:
+                if os.path.exists(tmp_path):
+                    try:
+                        os.remove(tmp_path)
+                    except Exception:
+                        pass
+        except Exception:
+            logger.exception("Failed to write geocode_cache.json")
+
+    def get_many(self, links: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Cached entries for `links`, keyed by the link exactly as passed in (misses are absent)."""
+        with self._lock:
+            entries = self._load()
+            out = {}
+            for link in links:
+                entry = entries.get(normalize_opportunity_url(link))
+                if entry is not None:
+                    out[link] = dict(entry)
+            return out
+
+    def put_many(self, items: List[Dict[str, Any]], source: str):
+        """
+        Store items shaped like {"link", "latlon", "country", "name"} with the given provenance.
+        Items without a link or a valid latlon are skipped.
+        """
+        now = time.time()
+        with self._lock:
+            entries = self._load()
+            changed = False
+            for item in items:
+                key = normalize_opportunity_url(item.get("link"))
+                latlon = item.get("latlon")
+                if not key or not isinstance(latlon, (list, tuple)) or len(latlon) != 2:
+                    continue
+                entries[key] = {
+                    "latlon": list(latlon),
+                    "country": item.get("country"),
+                    "name": item.get("name"),
+                    "source": source,
+                    "updated_at": now,
+                }
+                changed = True
+            if changed:
+                self._save_locked()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._load())
+
+
+_geocode_cache: Optional[GeocodeCache] = None
+_geocode_cache_lock = threading.Lock()
+
+
+def get_geocode_cache() -> GeocodeCache:
+    global _geocode_cache
+    with _geocode_cache_lock:
+        if _geocode_cache is None:
+            _geocode_cache = GeocodeCache()
+        return _geocode_cache
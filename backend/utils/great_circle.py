@@ -0,0 +1,118 @@
+# backend/utils/great_circle.py
+"""
+Vectorized great-circle maths for flight routes: distances and arcs for many point pairs at once.
+
+Points are handled as unit vectors on the sphere:
+  - the central angle between u and v is atan2(|u x v|, u . v), which stays accurate for identical
+    and antipodal points (where the haversine / acos forms lose precision)
+  - an arc is traced as cos(t*theta) u + sin(t*theta) w, where w is the unit vector perpendicular to u
+    in the plane of u and v, so no term divides by sin(theta). Identical points give a constant arc.
+    Antipodal points have no unique great circle, so the route through the nearer pole is used.
+
+All functions broadcast over their inputs, so N origins x M destinations cost a handful of array
+operations instead of N*M*101 Python trig calls.
+
+Resolution can follow the route instead of a fixed point count: a straight segment spanning angle d
+strays at most R * (1 - cos(d / 2)) from the arc it replaces, so segments_for_tolerance() picks the
+fewest segments that keep that under a tolerance (a 50 km hop needs a handful, 15,000 km a few dozen).
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+# below this |u x v| the two points are treated as identical or antipodal
+_DEGENERATE = 1e-12
+
+# bounds on adaptive segment counts (a few segments keep short hops smooth when animated)
+MIN_ARC_SEGMENTS = 4
+MAX_ARC_SEGMENTS = 1000
+
+
+def to_unit_vectors(lat, lng) -> np.ndarray:
+    """(..., 3) unit vectors for latitudes / longitudes in degrees."""
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lng = np.radians(np.asarray(lng, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)], axis=-1)
+
+
+def to_lat_lng(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Latitudes / longitudes in degrees of (..., 3) vectors."""
+    x, y, z = vectors[..., 0], vectors[..., 1], vectors[..., 2]
+    return np.degrees(np.arctan2(z, np.hypot(x, y))), np.degrees(np.arctan2(y, x))
+
+
+def central_angle(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Angle in radians between unit vectors u and v (broadcast over leading axes)."""
+    return np.arctan2(np.linalg.norm(np.cross(u, v), axis=-1), np.einsum("...i,...i->...", u, v))
+
+
+def distance_km(lat1, lng1, lat2, lng2, radius_km: float = EARTH_RADIUS_KM) -> np.ndarray:
+    """Great-circle distance between (lat1, lng1) and (lat2, lng2), broadcast NumPy-style."""
+    return radius_km * central_angle(to_unit_vectors(lat1, lng1), to_unit_vectors(lat2, lng2))
+
+
+def _perpendicular(u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Unit vector perpendicular to u, towards v (for antipodal pairs: towards the nearer pole)."""
+    w = v - np.einsum("...i,...i->...", u, v)[..., None] * u
+    norm = np.linalg.norm(w, axis=-1, keepdims=True)
+    degenerate = norm[..., 0] < _DEGENERATE
+    if np.any(degenerate):
+        # identical / antipodal: head for the pole on u's side (any perpendicular works for identical
+        # points, since theta == 0 there); at a pole itself, head along the prime meridian
+        pole = np.zeros_like(u)
+        pole[..., 2] = np.where(u[..., 2] >= 0, 1.0, -1.0)
+        at_pole = np.abs(u[..., 2]) > 1 - 1e-12
+        pole[at_pole] = (1.0, 0.0, 0.0)
+        fallback = pole - np.einsum("...i,...i->...", u, pole)[..., None] * u
+        fallback /= np.linalg.norm(fallback, axis=-1, keepdims=True)
+        w = np.where(degenerate[..., None], fallback, w / np.where(norm == 0, 1.0, norm))
+    else:
+        w = w / norm
+    return w
+
+
+def arcs(lat1, lng1, lat2, lng2, num_points: int = 100) -> np.ndarray:
+    """
+    Great-circle arcs from (lat1, lng1) to (lat2, lng2) with num_points + 1 points each.
+
+    The coordinate arguments broadcast against each other; the result has their broadcast shape
+    followed by (num_points + 1, 2) as [lat, lng] in degrees (longitudes in -180..180).
+    """
+    u = to_unit_vectors(lat1, lng1)
+    v = to_unit_vectors(lat2, lng2)
+    u, v = np.broadcast_arrays(u, v)
+    theta = central_angle(u, v)
+    w = _perpendicular(u, v)
+    t = np.linspace(0.0, 1.0, max(1, int(num_points)) + 1)
+    angles = theta[..., None] * t                                   # (..., P)
+    points = np.cos(angles)[..., None] * u[..., None, :] + np.sin(angles)[..., None] * w[..., None, :]
+    lat, lng = to_lat_lng(points)
+    return np.stack([lat, lng], axis=-1)
+
+
+def segments_for_tolerance(theta, tolerance_km: float, radius_km: float = EARTH_RADIUS_KM) -> np.ndarray:
+    """Fewest segments (within MIN/MAX_ARC_SEGMENTS) keeping every chord within tolerance_km of arcs of angle theta."""
+    max_step = 2 * np.arccos(np.clip(1 - tolerance_km / radius_km, -1.0, 1.0))
+    segments = np.ceil(np.asarray(theta, dtype=np.float64) / max(max_step, 1e-12))
+    return np.clip(segments, MIN_ARC_SEGMENTS, MAX_ARC_SEGMENTS).astype(np.int64)
+
+
+def adaptive_arcs(lat1, lng1, lat2, lng2, tolerance_km: float) -> List[np.ndarray]:
+    """
+    arcs() for 1-D coordinate arrays, each with as many points as tolerance_km calls for.
+    Returns one (segments + 1, 2) array per pair; pairs needing the same count are computed together.
+    """
+    lat1, lng1, lat2, lng2 = (np.atleast_1d(np.asarray(a, dtype=np.float64)) for a in (lat1, lng1, lat2, lng2))
+    lat1, lng1, lat2, lng2 = np.broadcast_arrays(lat1, lng1, lat2, lng2)
+    theta = central_angle(to_unit_vectors(lat1, lng1), to_unit_vectors(lat2, lng2))
+    segments = segments_for_tolerance(theta, tolerance_km)
+    out: List[np.ndarray] = [None] * len(segments)   # type: ignore[list-item]
+    for count in np.unique(segments):
+        idx = np.flatnonzero(segments == count)
+        for i, arc in zip(idx.tolist(), arcs(lat1[idx], lng1[idx], lat2[idx], lng2[idx], int(count))):
+            out[i] = arc
+    return out
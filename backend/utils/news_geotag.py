@@ -0,0 +1,373 @@
+# backend/utils/news_geotag.py
+"""
+Places news articles on the globe: attaches "country" and "latlon" to normalized articles by matching
+country, region and city names in their title and description.
+
+Names come from the offline gazetteer (utils/gazetteer.py: GeoNames cities15000 plus admin1 / admin2
+divisions) and every country in countries.geojson plus the country aliases ("UK", "U.S.", ...).
+They are compiled once into an Aho-Corasick automaton over word tokens, so an article is scanned in a
+single pass however many names there are, and names only ever match whole words ("Oman" never matches
+inside "woman"). Overlapping matches resolve leftmost-longest ("Papua New Guinea", not "Guinea").
+Publication names ("New York Times", "Washington Post", NEWS_SOURCE_NAMES) and the article's own
+source are matched too, and then ignored, so they never place an article.
+
+Capital letters say little in Title-Case headlines ("Barry Manilow Cancels Tour"), so most place names
+only count when the article confirms them. Country names always count. A region or city name counts
+on its own only when it clearly belongs to one country:
+  - every other bearer of the name, in any other country, is at least STANDALONE_DOMINANCE times
+    smaller (by population)
+  - a city also needs NEWS_GEOTAG_MIN_POPULATION inhabitants (default 250,000)
+  - counties and names that are everyday words (gazetteer.AMBIGUOUS_PLACE_NAMES) never do
+Any other mention counts only when its region ("Asheville, North Carolina") or its country ("Kent,
+England") is named as well, and then resolves to the place in that region or country.
+A country name that is also a region elsewhere ("Atlanta, Georgia") means the region when the
+article otherwise points at that region's country.
+
+Scoring, per article:
+  - each counted mention scores for its country, twice when it is in the title; when the article
+    names countries, the best of those wins, else the best overall (ties go to the earliest mention)
+  - latlon is the most-mentioned place in that country (cities before counties and regions), else the
+    country centroid
+
+Tags are cached per article URL (NEWS_GEOTAG_CACHE_TTL seconds, default 7 days), so re-fetched articles
+cost a dict lookup.
+
+Usage:
+    articles = geotag_articles(articles)    # copies with "country" and "latlon" (None when unplaced)
+
+CLI (from backend/):
+  python -m utils.news_geotag "Floods in Sindh leave thousands homeless in Pakistan"
+"""
+
+import argparse
+import os
+import re
+import threading
+import unicodedata
+from collections import deque
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from utils.gazetteer import (
+    AMBIGUOUS_PLACE_NAMES,
+    COARSE_KINDS,
+    COUNTRY_ALIASES,
+    Gazetteer,
+    Place,
+    get_gazetteer,
+    normalize_country,
+    normalize_tokens,
+)
+from utils.ttl_cache import TTLCache
+
+NEWS_GEOTAG_CACHE_TTL = float(os.environ.get("NEWS_GEOTAG_CACHE_TTL", str(7 * 24 * 3600)))
+NEWS_GEOTAG_MIN_POPULATION = int(os.environ.get("NEWS_GEOTAG_MIN_POPULATION", "250000"))
+
+# How much bigger than every namesake abroad a place must be to count without confirmation
+STANDALONE_DOMINANCE = 4
+
+# Publications whose names contain a place; they say where the paper is, not where the news is
+NEWS_SOURCE_NAMES = (
+    "New York Times", "New York Post", "New York Daily News", "Washington Post", "Washington Times",
+    "Los Angeles Times", "Chicago Tribune", "Boston Globe", "Houston Chronicle", "San Francisco Chronicle",
+    "Miami Herald", "Seattle Times", "Dallas Morning News", "Philadelphia Inquirer", "Toronto Star",
+    "Times of India", "Hindustan Times", "Times of Israel", "Jerusalem Post", "Japan Times", "Korea Herald",
+    "Korea Times", "China Daily", "South China Morning Post", "Bangkok Post", "Jakarta Post", "Kathmandu Post",
+    "Sydney Morning Herald", "Irish Times", "Irish Independent", "Manchester Evening News", "Yorkshire Post",
+    "Liverpool Echo", "London Evening Standard", "Moscow Times", "Kyiv Independent", "Kyiv Post",
+    "Tehran Times", "Buenos Aires Times", "Mexico News Daily", "Arab News", "Gulf News", "Khaleej Times",
+)
+
+# Country aliases that are everyday words
+_SKIPPED_ALIASES = frozenset({"us"})
+
+_WORD_RE = re.compile(r"[A-Za-z0-9]+")
+
+
+class GeoTag(NamedTuple):
+    country: str                   # countries.geojson name, e.g. "United Kingdom"
+    latlon: List[float]
+    place: Optional[str]           # the place the latlon comes from; None for a country centroid
+
+
+class _Pattern(NamedTuple):
+    country: Optional[str]         # normalized country, for a country name
+    places: Tuple[Place, ...]      # places of this name, most populous first (regions abroad, for a country name)
+    standalone: Optional[Place]    # the place it means without confirmation, if any
+    source: bool = False           # a publication name: matched, then ignored
+
+
+class _Mention(NamedTuple):
+    order: int
+    weight: int
+    pattern: _Pattern
+
+
+class _Automaton:
+    """Aho-Corasick automaton over token sequences; states are indices into flat lists."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, Any]]] = [[]]   # (pattern length, payload) ending at a state
+
+    def add(self, tokens: Sequence[str], payload: Any):
+        state = 0
+        for token in tokens:
+            nxt = self._goto[state].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._goto[state][token] = nxt
+            state = nxt
+        self._out[state].append((len(tokens), payload))
+
+    def build(self):
+        """Compute failure links breadth-first; call once after the last add()."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(token, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, tokens: Sequence[str]) -> List[Tuple[int, int, Any]]:
+        """(start, end, payload) of every pattern occurrence in `tokens`."""
+        out: List[Tuple[int, int, Any]] = []
+        state = 0
+        for i, token in enumerate(tokens):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for length, payload in self._out[state]:
+                out.append((i - length + 1, i + 1, payload))
+        return out
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+
+def _cased_tokens(text: str) -> List[str]:
+    """normalize_tokens(), keeping the original case."""
+    if not text:
+        return []
+    folded = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return _WORD_RE.findall(folded)
+
+
+def _standalone(tokens: Tuple[str, ...], places: List[Place]) -> Optional[Place]:
+    """The place a name means without confirmation (the city over its namesake region), if any."""
+    places = [p for p in places if p.kind in ("city", "region")]
+    if not places or " ".join(tokens) in AMBIGUOUS_PLACE_NAMES:
+        return None
+    top = places[0]
+    rival = max((p.population for p in places if p.country != top.country), default=0)
+    if rival * STANDALONE_DOMINANCE > top.population:
+        return None
+    city = next((p for p in places if p.kind == "city" and p.country == top.country), None)
+    if city is not None:
+        return city if city.population >= NEWS_GEOTAG_MIN_POPULATION else None
+    return top
+
+
+class GeoTagger:
+    def __init__(self, gazetteer: Gazetteer):
+        self.gazetteer = gazetteer
+        self.country_names = gazetteer.country_names()
+        by_tokens: Dict[Tuple[str, ...], List[Place]] = {}
+        for tokens, place in gazetteer.aliases():
+            by_tokens.setdefault(tokens, []).append(place)
+        patterns: Dict[Tuple[str, ...], _Pattern] = {}
+        for tokens, places in by_tokens.items():
+            places.sort(key=lambda p: -p.population)
+            patterns[tokens] = _Pattern(None, tuple(places), _standalone(tokens, places))
+        countries = set(self.country_names)
+        for alias in COUNTRY_ALIASES:
+            if alias not in _SKIPPED_ALIASES:
+                countries.add(alias)
+        for name in countries:
+            tokens = tuple(normalize_tokens(name))
+            if tokens:
+                # a country name beats a place of the same name ("Luxembourg"), except that it may
+                # turn out to mean a region abroad ("Georgia")
+                country = normalize_country(name)
+                abroad = tuple(p for p in by_tokens.get(tokens, ()) if p.kind == "region" and p.country != country)
+                patterns[tokens] = _Pattern(country, abroad, None)
+        for name in NEWS_SOURCE_NAMES:
+            patterns[tuple(normalize_tokens(name))] = _Pattern(None, (), None, source=True)
+        self._automaton = _Automaton()
+        for tokens, pattern in patterns.items():
+            self._automaton.add(tokens, pattern)
+        self._automaton.build()
+
+    def _mentions(self, text: str, skip: Tuple[str, ...] = ()) -> List[_Pattern]:
+        """Patterns of the leftmost-longest name matches in `text`, without publication names and `skip`."""
+        cased = _cased_tokens(text)
+        tokens = [t.lower() for t in cased]
+        masked = set()
+        if skip:
+            n = len(skip)
+            for i in range(len(tokens) - n + 1):
+                if tuple(tokens[i:i + n]) == skip:
+                    masked.update(range(i, i + n))
+        matches = sorted(self._automaton.find(tokens), key=lambda m: (m[0], m[0] - m[1]))
+        out = []
+        covered = 0
+        for start, end, pattern in matches:
+            if start < covered:
+                continue
+            first = cased[start][0]
+            if not (first.isupper() or first.isdigit()):
+                continue
+            covered = end
+            if not pattern.source and masked.isdisjoint(range(start, end)):
+                out.append(pattern)
+        return out
+
+    @staticmethod
+    def _confirmed(pattern: _Pattern, named: Set[str], regions: Set[Tuple[str, str]]) -> Optional[Place]:
+        """The place a non-country mention means given the named countries and regions, if they confirm one."""
+        for place in pattern.places:
+            if place.kind != "region" and (place.country, place.admin1) in regions:
+                return place
+        for place in pattern.places:
+            if place.country in named:
+                return place
+        return None
+
+    def _settle(self, mentions: List[_Mention], named: Set[str], accepted: Dict[int, Tuple[str, Optional[Place]]]):
+        """
+        Accept every place mention that counts. Confirmations by a named country or region are settled
+        first, until nothing changes (an accepted region confirms its cities); only then do the remaining
+        mentions fall back to their standalone place, regions before cities, so "Paris, Texas" is the
+        Paris in Texas rather than the standalone Paris.
+        """
+        for fallback in (None, "region", "city"):
+            if fallback is not None:
+                for m in mentions:
+                    place = m.pattern.standalone
+                    if m.order not in accepted and m.pattern.country is None and place is not None and place.kind == fallback:
+                        accepted[m.order] = (place.country, place)
+            changed = True
+            while changed:
+                changed = False
+                regions = {(c, p.admin1) for c, p in accepted.values() if p is not None and p.kind == "region"}
+                for m in mentions:
+                    if m.order in accepted or m.pattern.country is not None:
+                        continue
+                    place = self._confirmed(m.pattern, named, regions)
+                    if place is not None:
+                        accepted[m.order] = (place.country, place)
+                        changed = True
+
+    def tag(self, title: Optional[str], description: Optional[str], source: Optional[str] = None) -> Optional[GeoTag]:
+        skip = tuple(normalize_tokens(source or ""))
+        mentions: List[_Mention] = []
+        for weight, text in ((2, title or ""), (1, description or "")):
+            for pattern in self._mentions(text, skip):
+                mentions.append(_Mention(len(mentions), weight, pattern))
+        if not mentions:
+            return None
+
+        accepted: Dict[int, Tuple[str, Optional[Place]]] = {}   # mention order -> (country, place)
+        named: Set[str] = set()
+        for m in mentions:
+            if m.pattern.country is not None and not m.pattern.places:
+                accepted[m.order] = (m.pattern.country, None)
+                named.add(m.pattern.country)
+        self._settle(mentions, named, accepted)
+        contested = [m for m in mentions if m.pattern.country is not None and m.pattern.places]
+        if contested:
+            evidence = named | {c for c, _ in accepted.values()}
+            for m in contested:
+                region = next((p for p in m.pattern.places if p.country in evidence), None)
+                if region is not None:
+                    accepted[m.order] = (region.country, region)
+                else:
+                    accepted[m.order] = (m.pattern.country, None)
+                    named.add(m.pattern.country)
+            self._settle(mentions, named, accepted)
+        if not accepted:
+            return None
+
+        scores: Dict[str, int] = {}
+        first_seen: Dict[str, int] = {}
+        places: Dict[str, List[Tuple[int, Place]]] = {}   # country -> (order, place)
+        for m in mentions:
+            if m.order not in accepted:
+                continue
+            country, place = accepted[m.order]
+            scores[country] = scores.get(country, 0) + m.weight
+            first_seen.setdefault(country, m.order)
+            if place is not None:
+                places.setdefault(country, []).append((m.order, place))
+
+        country = min(named or scores, key=lambda c: (-scores[c], first_seen[c]))
+        display = self.country_names.get(country) or country.title()
+        candidates = places.get(country)
+        if candidates:
+            counts: Dict[Place, int] = {}
+            first: Dict[Place, int] = {}
+            for order, place in candidates:
+                counts[place] = counts.get(place, 0) + 1
+                first.setdefault(place, order)
+            place = min(counts, key=lambda p: (p.kind in COARSE_KINDS, -counts[p], first[p]))
+            return GeoTag(display, [place.lat, place.lon], place.name)
+        centroid = self.gazetteer.country_centroid(country)
+        if centroid is None:
+            return None
+        return GeoTag(display, centroid, None)
+
+
+_tagger: Optional[GeoTagger] = None
+_tagger_lock = threading.Lock()
+
+_cache = TTLCache("news_geotag", ttl=NEWS_GEOTAG_CACHE_TTL, max_entries=50000)
+
+
+def get_geotagger() -> GeoTagger:
+    """Process-wide tagger; the automaton is compiled on first use."""
+    global _tagger
+    with _tagger_lock:
+        if _tagger is None:
+            _tagger = GeoTagger(get_gazetteer())
+        return _tagger
+
+
+def geotag_articles(articles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copies of normalized articles with "country" and "latlon" set (None when they cannot be placed)."""
+    tagger = get_geotagger()
+    out = []
+    for article in articles:
+        url = article.get("url")
+
+        def load(article=article) -> Optional[Dict[str, Any]]:
+            tag = tagger.tag(article.get("title"), article.get("description"), article.get("source"))
+            return {"country": tag.country, "latlon": tag.latlon} if tag else None
+
+        fields = _cache.get_or_load(url, load) if url else load()
+        out.append(dict(article, **(fields or {"country": None, "latlon": None})))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the country and position a piece of news text is about")
+    parser.add_argument("title")
+    parser.add_argument("description", nargs="?", default="")
+    args = parser.parse_args()
+
+    tag = get_geotagger().tag(args.title, args.description)
+    if tag is None:
+        print("No place found")
+        return
+    where = tag.place or "country centroid"
+    print(f"{tag.country}: {tag.latlon[0]:.4f}, {tag.latlon[1]:.4f} ({where})")
+
+
+if __name__ == "__main__":
+    main()
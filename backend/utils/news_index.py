@@ -0,0 +1,269 @@
+# backend/utils/news_index.py
+"""
+In-memory inverted index over the local news store (utils/news_store.py), serving /api/news/recommended.
+
+Every article's title and description are tokenized (accent-folded, lower-cased, simple plurals folded:
+"floods" -> "flood", "emergencies" -> "emergency") and each token maps to the set of article ids
+containing it. Queries use NewsAPI's syntax, evaluated with set operations on those postings:
+  - terms and "quoted phrases" (phrases must appear as consecutive tokens)
+  - AND, OR, NOT (NOT binds tightest, then AND, then OR), parentheses, implicit AND between terms
+  - +term / +"phrase" (required) and -term / -"phrase" (excluded); a sign on its own is a syntax error
+Matches are ordered newest first and paginated, so a preference query costs a few set operations over
+the postings instead of a NewsAPI round trip.
+
+The index follows the store's revision like utils/opportunity_index.py: each query first applies the
+articles from changed_since() and drops the ones pruned since (removed_since()).
+
+Usage:
+    index = get_news_index()
+    articles, total = index.search('flood OR "humanitarian crisis"', page=1, page_size=20)
+"""
+
+import re
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple, Union
+
+from utils.gazetteer import normalize_tokens
+from utils.news_store import NewsStore, StoredArticle, get_news_store
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+class _Doc(NamedTuple):
+    id: int
+    published_at: str
+    tokens: Tuple[str, ...]
+    record: Dict[str, Any]
+
+
+# query AST: ("term", tokens) | ("and", [nodes]) | ("or", [nodes]) | ("not", node)
+Node = Tuple[str, Union[Tuple[str, ...], List[Any], Any]]
+
+_QUERY_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|([+-]?)"([^"]*)"|([+-]?)([^\s()"]+))')
+
+
+def _fold(token: str) -> str:
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_fold(t) for t in normalize_tokens(text)]
+
+
+def parse_query(query: str) -> Optional[Node]:
+    """AST for a NewsAPI-style query; None for an empty query. Raises QuerySyntaxError."""
+    lexemes: List[Tuple[str, Any]] = []
+    pos = 0
+    query = query or ""
+    while pos < len(query):
+        match = _QUERY_TOKEN_RE.match(query, pos)
+        if match is None:
+            if query[pos:].strip():
+                raise QuerySyntaxError(f"unbalanced quote in query at position {pos}")
+            break
+        pos = match.end()
+        open_paren, close_paren, phrase_sign, phrase, sign, word = match.groups()
+        if open_paren:
+            lexemes.append(("(", None))
+        elif close_paren:
+            lexemes.append((")", None))
+        elif phrase is not None:
+            term: Node = ("term", tuple(tokenize(phrase)))
+            lexemes.append(("-" if phrase_sign == "-" else "atom", term))
+        elif not (sign + word).strip("+-"):
+            raise QuerySyntaxError(f"'{sign + word}' must be directly followed by a term, at position {match.start(5)}")
+        elif word in ("AND", "OR", "NOT") and not sign:
+            lexemes.append((word, None))
+        else:
+            term = ("term", tuple(tokenize(word)))
+            lexemes.append(("-" if sign == "-" else "atom", term))
+
+    position = 0
+
+    def peek() -> Optional[str]:
+        return lexemes[position][0] if position < len(lexemes) else None
+
+    def take() -> Tuple[str, Any]:
+        nonlocal position
+        position += 1
+        return lexemes[position - 1]
+
+    def parse_or() -> Node:
+        nodes = [parse_and()]
+        while peek() == "OR":
+            take()
+            nodes.append(parse_and())
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parse_and() -> Node:
+        nodes = [parse_unary()]
+        while peek() not in (None, ")", "OR"):
+            if peek() == "AND":
+                take()
+            nodes.append(parse_unary())
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parse_unary() -> Node:
+        kind = peek()
+        if kind == "NOT":
+            take()
+            return ("not", parse_unary())
+        if kind == "-":
+            return ("not", take()[1])
+        return parse_atom()
+
+    def parse_atom() -> Node:
+        kind, value = take() if peek() is not None else (None, None)
+        if kind == "(":
+            node = parse_or()
+            if peek() != ")":
+                raise QuerySyntaxError("missing ')' in query")
+            take()
+            return node
+        if kind == "atom":
+            return value
+        raise QuerySyntaxError(f"unexpected {kind} in query" if kind else "query ends unexpectedly")
+
+    if not lexemes:
+        return None
+    node = parse_or()
+    if position != len(lexemes):
+        raise QuerySyntaxError(f"unexpected {lexemes[position][0]} in query")
+    return node
+
+
+class NewsIndex:
+    def __init__(self, store: NewsStore):
+        self.store = store
+        self.revision = 0
+        self._lock = threading.RLock()
+        self._docs: Dict[int, _Doc] = {}
+        self._postings: Dict[str, Set[int]] = {}
+
+    # ----- maintenance -----
+
+    def _remove(self, doc_id: int):
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return
+        for token in set(doc.tokens):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.discard(doc_id)
+                if not postings:
+                    del self._postings[token]
+
+    def _add(self, row: StoredArticle):
+        record = row.record
+        tokens = tuple(tokenize(record.get("title") or "") + tokenize(record.get("description") or ""))
+        self._docs[row.id] = _Doc(row.id, row.published_at, tokens, record)
+        for token in set(tokens):
+            self._postings.setdefault(token, set()).add(row.id)
+
+    def refresh(self) -> int:
+        """Catch up with the store; returns the number of articles applied."""
+        with self._lock:
+            current = self.store.revision()
+            if current == self.revision:
+                return 0
+            for doc_id in self.store.removed_since(self.revision):
+                self._remove(doc_id)
+            rows = self.store.changed_since(self.revision)
+            for row in rows:
+                self._remove(row.id)
+                self._add(row)
+            self.revision = current
+            return len(rows)
+
+    # ----- queries -----
+
+    def _phrase(self, tokens: Tuple[str, ...]) -> Set[int]:
+        candidates = set.intersection(*(self._postings.get(t, set()) for t in tokens))
+        n = len(tokens)
+        out = set()
+        for doc_id in candidates:
+            doc_tokens = self._docs[doc_id].tokens
+            if any(doc_tokens[i:i + n] == tokens for i in range(len(doc_tokens) - n + 1)):
+                out.add(doc_id)
+        return out
+
+    def _evaluate(self, node: Node) -> Set[int]:
+        kind, value = node
+        if kind == "term":
+            if not value:
+                return set(self._docs)   # nothing searchable in it (e.g. punctuation only)
+            if len(value) == 1:
+                return set(self._postings.get(value[0], ()))
+            return self._phrase(value)
+        if kind == "not":
+            return set(self._docs) - self._evaluate(value)
+        if kind == "or":
+            out: Set[int] = set()
+            for child in value:
+                out |= self._evaluate(child)
+            return out
+        # "and": positives first (smallest first), then subtract negatives without building complements
+        positives = [c for c in value if c[0] != "not"]
+        negatives = [c[1] for c in value if c[0] == "not"]
+        if positives:
+            sets = sorted((self._evaluate(c) for c in positives), key=len)
+            out = set(sets[0])
+            for other in sets[1:]:
+                out &= other
+        else:
+            out = set(self._docs)
+        for child in negatives:
+            if not out:
+                break
+            out -= self._evaluate(child)
+        return out
+
+    def search(self, query: Optional[str], page: int = 1, page_size: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Articles matching `query` (all articles when it is empty), newest first.
+
+        Returns:
+          (normalized articles on `page`, total matches)
+        """
+        node = parse_query(query or "")
+        with self._lock:
+            matches = set(self._docs) if node is None else self._evaluate(node)
+            ordered = sorted(matches, key=lambda i: (self._docs[i].published_at, i), reverse=True)
+            start = (max(1, page) - 1) * page_size
+            return [self._docs[i].record for i in ordered[start:start + page_size]], len(ordered)
+
+    def country_counts(self, query: Optional[str] = None, since: Optional[str] = None) -> Dict[str, int]:
+        """Geotagged articles per country, among those matching `query` and published at or after `since`."""
+        node = parse_query(query or "")
+        with self._lock:
+            matches = set(self._docs) if node is None else self._evaluate(node)
+            counts: Dict[str, int] = {}
+            for doc_id in matches:
+                doc = self._docs[doc_id]
+                country = doc.record.get("country")
+                if country and (since is None or doc.published_at >= since):
+                    counts[country] = counts.get(country, 0) + 1
+            return counts
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+
+_index: Optional[NewsIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_news_index() -> NewsIndex:
+    """Process-wide index over the news store, caught up with the store's latest revision."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = NewsIndex(get_news_store())
+    _index.refresh()
+    return _index
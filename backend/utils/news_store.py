@@ -0,0 +1,342 @@
+# backend/utils/news_store.py
+"""
+Local store of disaster / humanitarian news, filled by a periodic NewsAPI ingest job.
+
+Every user's preferences turn into a different NewsAPI query, so asking NewsAPI per request burns the
+rate limit. Instead one job pulls the broad DEFAULT_QUERY feed every NEWS_INGEST_INTERVAL seconds into
+SQLite (backend/news.db, override with NEWS_DB_PATH), and /api/news/recommended answers preference
+queries from the in-memory index over it (utils/news_index.py).
+
+Store layout (same revision scheme as utils/opportunity_store.py):
+  - one row per article URL holding the normalized, geotagged article ({"title", "description", "url",
+    "imageUrl", "publishedAt", "source", "author", "country", "latlon"}); re-ingesting an article
+    updates it in place and keeps its id
+  - each write transaction bumps a store-wide revision and stamps the rows it changed (changed_since)
+  - articles older than NEWS_RETENTION_DAYS are pruned; their ids go to a `removed` table stamped with
+    the pruning revision, so indexes can drop them (removed_since)
+
+The ingester runs in a daemon thread started with the app (see routers/news/router.py); set
+NEWS_INGEST_INTERVAL=0 to disable it (e.g. on all but one worker) and run the CLI from cron instead.
+
+CLI (from backend/):
+  python -m utils.news_store ingest [--pages 1]
+  python -m utils.news_store stats
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import requests
+
+from utils.news_geotag import geotag_articles
+
+logger = logging.getLogger(__name__)
+
+NEWS_API_BASE = "https://newsapi.org/v2"
+DEFAULT_QUERY = (
+    "earthquake OR flood OR hurricane OR wildfire OR tsunami OR volcano OR "
+    "landslide OR drought OR disaster relief OR humanitarian crisis OR "
+    "pandemic OR epidemic OR disease outbreak OR health emergency OR "
+    "pharmaceutical OR pharma"
+)
+
+NEWS_INGEST_INTERVAL = float(os.environ.get("NEWS_INGEST_INTERVAL", "900"))
+NEWS_INGEST_PAGES = int(os.environ.get("NEWS_INGEST_PAGES", "1"))
+NEWS_INGEST_LANGUAGE = os.environ.get("NEWS_INGEST_LANGUAGE", "en")
+NEWS_RETENTION_DAYS = float(os.environ.get("NEWS_RETENTION_DAYS", "30"))
+
+# NewsAPI's largest page
+INGEST_PAGE_SIZE = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id           INTEGER PRIMARY KEY AUTOINCREMENT,
+    url          TEXT NOT NULL UNIQUE,
+    published_at TEXT NOT NULL DEFAULT '',
+    revision     INTEGER NOT NULL,
+    record       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_articles_revision ON articles(revision);
+CREATE INDEX IF NOT EXISTS idx_articles_published ON articles(published_at);
+CREATE TABLE IF NOT EXISTS removed (
+    id       INTEGER PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_removed_revision ON removed(revision);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class NewsAPIError(RuntimeError):
+    """NewsAPI answered with a non-ok status."""
+
+
+class StoredArticle(NamedTuple):
+    id: int
+    published_at: str
+    revision: int
+    record: Dict[str, Any]
+
+
+class IngestReport(NamedTuple):
+    fetched: int
+    written: int
+    pruned: int
+    revision: int
+
+
+def normalize_article(a: Dict[str, Any]) -> Dict[str, Any]:
+    """The article fields /api/news/recommended returns, from a NewsAPI article."""
+    return {
+        "title": a.get("title"),
+        "description": a.get("description"),
+        "url": a.get("url"),
+        "imageUrl": a.get("urlToImage"),
+        "publishedAt": a.get("publishedAt"),
+        "source": (a.get("source") or {}).get("name"),
+        "author": a.get("author"),
+    }
+
+
+def fetch_everything(api_key: str, query: str, language: str, page: int, page_size: int) -> Dict[str, Any]:
+    """
+    One page of NewsAPI /everything, newest first, as {"totalResults", "articles"} with normalized,
+    geotagged articles (utils/news_geotag.py). Raises requests exceptions or NewsAPIError.
+    """
+    params = {
+        "q": query,
+        "language": language,
+        "sortBy": "publishedAt",
+        "pageSize": page_size,
+        "page": page,
+        "apiKey": api_key,
+    }
+    resp = requests.get(f"{NEWS_API_BASE}/everything", params=params, timeout=15)
+    resp.raise_for_status()
+    data = resp.json()
+    if data.get("status") != "ok":
+        raise NewsAPIError(data.get("message", "NewsAPI error"))
+    articles = geotag_articles([normalize_article(a) for a in data.get("articles", [])])
+    return {"totalResults": data.get("totalResults", 0), "articles": articles}
+
+
+def default_db_path() -> str:
+    return os.environ.get("NEWS_DB_PATH") or os.path.normpath(
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "news.db")
+    )
+
+
+class NewsStore:
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path or default_db_path()
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(_SCHEMA)
+                    self._initialized = True
+        return conn
+
+    @staticmethod
+    def _meta(conn: sqlite3.Connection, key: str) -> Optional[str]:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _bump_revision(self, conn: sqlite3.Connection) -> int:
+        revision = int(self._meta(conn, "revision") or 0) + 1
+        conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('revision', ?)", (str(revision),))
+        return revision
+
+    def upsert_many(self, articles: Iterable[Dict[str, Any]], prune_before: Optional[str] = None) -> Tuple[int, int]:
+        """
+        Insert or update normalized articles (keyed by URL) in one transaction, then drop articles
+        published before `prune_before` (an ISO timestamp). Returns (rows written, rows pruned).
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            revision = self._bump_revision(conn)
+            written = 0
+            for article in articles:
+                url = (article.get("url") or "").strip()
+                if not url:
+                    continue
+                payload = json.dumps(article, ensure_ascii=False)
+                cursor = conn.execute(
+                    """
+                    INSERT INTO articles(url, published_at, revision, record) VALUES (?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        published_at = excluded.published_at,
+                        revision = excluded.revision,
+                        record = excluded.record
+                    WHERE articles.record != excluded.record
+                    """,
+                    (url, article.get("publishedAt") or "", revision, payload),
+                )
+                written += cursor.rowcount
+            pruned = 0
+            if prune_before:
+                conn.execute(
+                    "INSERT OR REPLACE INTO removed(id, revision) SELECT id, ? FROM articles WHERE published_at < ?",
+                    (revision, prune_before),
+                )
+                pruned = conn.execute("DELETE FROM articles WHERE published_at < ?", (prune_before,)).rowcount
+            conn.execute(
+                "INSERT OR REPLACE INTO meta(key, value) VALUES ('ingested_at', ?)",
+                (datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return written, pruned
+
+    def revision(self) -> int:
+        """Store-wide revision; increases with every write transaction."""
+        return int(self._meta(self._conn(), "revision") or 0)
+
+    def ingested_at(self) -> Optional[str]:
+        """UTC time of the last completed ingest, or None if there has never been one."""
+        return self._meta(self._conn(), "ingested_at")
+
+    def changed_since(self, revision: int) -> List[StoredArticle]:
+        """Articles inserted or updated after `revision`."""
+        rows = self._conn().execute(
+            "SELECT id, published_at, revision, record FROM articles WHERE revision > ? ORDER BY id", (revision,)
+        ).fetchall()
+        return [StoredArticle(r[0], r[1], r[2], json.loads(r[3])) for r in rows]
+
+    def removed_since(self, revision: int) -> List[int]:
+        """Ids of articles pruned after `revision`."""
+        return [r[0] for r in self._conn().execute("SELECT id FROM removed WHERE revision > ?", (revision,)).fetchall()]
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        count, oldest, newest = conn.execute(
+            "SELECT COUNT(*), MIN(published_at), MAX(published_at) FROM articles"
+        ).fetchone()
+        return {
+            "revision": self.revision(),
+            "articles": count,
+            "oldest": oldest,
+            "newest": newest,
+            "ingested_at": self.ingested_at(),
+        }
+
+
+_store: Optional[NewsStore] = None
+_store_lock = threading.Lock()
+
+
+def get_news_store() -> NewsStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = NewsStore()
+        return _store
+
+
+def ingest(
+    store: NewsStore,
+    api_key: str,
+    query: str = DEFAULT_QUERY,
+    language: str = NEWS_INGEST_LANGUAGE,
+    pages: int = NEWS_INGEST_PAGES,
+    retention_days: float = NEWS_RETENTION_DAYS,
+) -> IngestReport:
+    """Pull the newest `pages` pages of `query` into the store and prune old articles."""
+    articles: List[Dict[str, Any]] = []
+    for page in range(1, max(1, pages) + 1):
+        data = fetch_everything(api_key, query, language, page, INGEST_PAGE_SIZE)
+        articles.extend(data["articles"])
+        if page * INGEST_PAGE_SIZE >= data["totalResults"]:
+            break
+    prune_before = None
+    if retention_days > 0:
+        prune_before = (datetime.now(timezone.utc) - timedelta(days=retention_days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    written, pruned = store.upsert_many(articles, prune_before)
+    return IngestReport(len(articles), written, pruned, store.revision())
+
+
+class NewsIngester:
+    """Runs ingest() every `interval` seconds in a daemon thread; failures are logged and retried next time."""
+
+    def __init__(self, store: NewsStore, api_key: str, interval: float = NEWS_INGEST_INTERVAL):
+        self.store = store
+        self.api_key = api_key
+        self.interval = interval
+        self.last_report: Optional[IngestReport] = None
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> Optional[IngestReport]:
+        try:
+            report = ingest(self.store, self.api_key)
+        except Exception as exc:
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            logger.warning("News ingest failed: %s", self.last_error)
+            return None
+        self.last_report, self.last_error = report, None
+        logger.info("News ingest: %d fetched, %d written, %d pruned (revision %d)", *report)
+        return report
+
+    def _loop(self):
+        while not self._stop.is_set():
+            started = time.monotonic()
+            self.run_once()
+            self._stop.wait(max(1.0, self.interval - (time.monotonic() - started)))
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="news-ingester", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local news store maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("ingest", help="Pull the DEFAULT_QUERY feed from NewsAPI into the store")
+    run.add_argument("--pages", type=int, default=NEWS_INGEST_PAGES, help=f"Pages of {INGEST_PAGE_SIZE} articles")
+    sub.add_parser("stats", help="Print article counts and the last ingest time")
+    args = parser.parse_args()
+
+    store = get_news_store()
+    if args.command == "ingest":
+        from dotenv import find_dotenv, load_dotenv
+        load_dotenv(find_dotenv())
+        api_key = os.environ.get("NEWS_API_KEY")
+        if not api_key:
+            parser.error("NEWS_API_KEY is not set")
+        report = ingest(store, api_key, pages=args.pages)
+        print(f"Fetched {report.fetched} articles: {report.written} written, {report.pruned} pruned (revision {report.revision})")
+    else:
+        print(json.dumps(store.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# backend/utils/opportunity_clusters.py
+"""
+Hierarchical marker clusters over the opportunity store, per zoom level (in the style of supercluster).
+
+Points are projected to Web Mercator ([0, 1) x [0, 1) world coordinates) and bucketed into a grid per
+zoom level. A zoom-z grid has 2^z * (256 / CLUSTER_CELL_PX) cells per side, i.e. a cell is
+CLUSTER_CELL_PX screen pixels wide on a 256-px tile at that zoom. Because cell sizes halve exactly from
+one zoom to the next, cell (i, j) at zoom z is the parent of cells (2i..2i+1, 2j..2j+1) at zoom z+1,
+which gives the hierarchy for free:
+  - a cluster id is "<zoom>-<i>-<j>"
+  - its children are the non-empty cells below it (or, at CLUSTER_MAX_ZOOM, its individual points)
+  - adding or removing a point touches exactly one cell per zoom level, so updates are incremental:
+    each refresh applies only the store rows from changed_since() and removed_since()
+
+Each cell keeps a count and the sum of its points' world coordinates (for the centroid); only the
+finest zoom keeps the point positions themselves.
+"""
+
+import math
+import os
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from utils.opportunity_store import OpportunityStore, StoredOpportunity, get_opportunity_store
+from utils.store_follower import StoreFollower
+
+CLUSTER_MAX_ZOOM = int(os.environ.get("OPPORTUNITY_CLUSTER_MAX_ZOOM", "16"))
+CLUSTER_CELL_PX = int(os.environ.get("OPPORTUNITY_CLUSTER_CELL_PX", "64"))
+
+TILE_PX = 256
+MAX_MERCATOR_LAT = 85.05112878
+
+
+class InvalidClusterId(ValueError):
+    pass
+
+
+class _Point(NamedTuple):
+    position: int
+    link_key: str
+    x: float
+    y: float
+    record: Dict[str, Any]
+
+
+class _Cell:
+    __slots__ = ("count", "sum_x", "sum_y")
+
+    def __init__(self):
+        self.count = 0
+        self.sum_x = 0.0
+        self.sum_y = 0.0
+
+
+def project(lat: float, lon: float) -> Tuple[float, float]:
+    """Web Mercator world coordinates in [0, 1)."""
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    x = (lon + 180.0) / 360.0
+    s = math.sin(math.radians(lat))
+    y = 0.5 - 0.25 * math.log((1 + s) / (1 - s)) / math.pi
+    return min(max(x, 0.0), 1.0 - 1e-12), min(max(y, 0.0), 1.0 - 1e-12)
+
+
+def unproject(x: float, y: float) -> Tuple[float, float]:
+    lon = x * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lat, lon
+
+
+def parse_cluster_id(cluster_id: str) -> Tuple[int, int, int]:
+    try:
+        zoom, i, j = (int(v) for v in cluster_id.split("-"))
+    except ValueError as exc:
+        raise InvalidClusterId(f"invalid cluster id: {cluster_id!r}") from exc
+    if not 0 <= zoom <= CLUSTER_MAX_ZOOM:
+        raise InvalidClusterId(f"cluster zoom out of range: {cluster_id!r}")
+    return zoom, i, j
+
+
+class ClusterIndex(StoreFollower):
+    def __init__(self, store: OpportunityStore, max_zoom: int = CLUSTER_MAX_ZOOM, cell_px: int = CLUSTER_CELL_PX):
+        super().__init__(store)
+        self.max_zoom = max_zoom
+        # cells per tile side must be a power of two for parent/child cells to nest exactly
+        self.cells_per_tile = 2 ** max(0, round(math.log2(TILE_PX / max(1, cell_px))))
+        self._points: Dict[int, _Point] = {}
+        self._levels: List[Dict[Tuple[int, int], _Cell]] = [{} for _ in range(max_zoom + 1)]
+        self._leaves: Dict[Tuple[int, int], Set[int]] = {}   # finest-zoom cell -> point positions
+
+    # ----- maintenance -----
+
+    def _side(self, zoom: int) -> int:
+        return (2 ** zoom) * self.cells_per_tile
+
+    def _cell_at(self, x: float, y: float, zoom: int) -> Tuple[int, int]:
+        side = self._side(zoom)
+        return int(x * side), int(y * side)
+
+    def _update_cells(self, point: _Point, sign: int):
+        leaf = self._cell_at(point.x, point.y, self.max_zoom)
+        for zoom in range(self.max_zoom, -1, -1):
+            shift = self.max_zoom - zoom
+            key = (leaf[0] >> shift, leaf[1] >> shift)
+            level = self._levels[zoom]
+            cell = level.get(key)
+            if cell is None:
+                cell = level[key] = _Cell()
+            cell.count += sign
+            cell.sum_x += sign * point.x
+            cell.sum_y += sign * point.y
+            if cell.count <= 0:
+                del level[key]
+        if sign > 0:
+            self._leaves.setdefault(leaf, set()).add(point.position)
+        else:
+            positions = self._leaves.get(leaf)
+            if positions is not None:
+                positions.discard(point.position)
+                if not positions:
+                    del self._leaves[leaf]
+
+    def _remove(self, position: int):
+        point = self._points.pop(position, None)
+        if point is None:
+            return
+        self._update_cells(point, -1)
+
+    def _add(self, row: StoredOpportunity) -> bool:
+        latlon = row.record.get("latlon")
+        try:
+            lat, lon = float(latlon[0]), float(latlon[1])
+        except (TypeError, ValueError, IndexError):
+            return False
+        x, y = project(lat, lon)
+        point = _Point(row.position, row.link_key, x, y, row.record)
+        self._points[point.position] = point
+        self._update_cells(point, +1)
+        return True
+
+    # ----- features -----
+
+    def _point_feature(self, point: _Point) -> Dict[str, Any]:
+        return {"type": "point", "id": None, "count": 1, "latlon": point.record.get("latlon"), "opportunity": point.record}
+
+    def _single_point(self, zoom: int, key: Tuple[int, int]) -> _Point:
+        """The only point in a count-1 cell (found by walking down to the finest zoom)."""
+        for leaf in self._child_keys(zoom, key, self.max_zoom):
+            return self._points[next(iter(self._leaves[leaf]))]
+        raise KeyError((zoom, key))
+
+    def _child_keys(self, zoom: int, key: Tuple[int, int], target_zoom: int):
+        """Non-empty descendant cell keys of (zoom, key) at target_zoom, found level by level."""
+        keys = [key]
+        for z in range(zoom + 1, target_zoom + 1):
+            level = self._levels[z]
+            keys = [
+                child
+                for (i, j) in keys
+                for child in ((2 * i, 2 * j), (2 * i + 1, 2 * j), (2 * i, 2 * j + 1), (2 * i + 1, 2 * j + 1))
+                if child in level
+            ]
+        return keys
+
+    def _expansion_zoom(self, zoom: int, key: Tuple[int, int]) -> int:
+        """First zoom at which this cluster splits into more than one child (max_zoom + 1 if it never does)."""
+        while zoom < self.max_zoom:
+            children = self._child_keys(zoom, key, zoom + 1)
+            if len(children) > 1:
+                return zoom + 1
+            zoom, key = zoom + 1, children[0]
+        return self.max_zoom + 1
+
+    def _cell_feature(self, zoom: int, key: Tuple[int, int], cell: _Cell) -> Dict[str, Any]:
+        if cell.count == 1:
+            return self._point_feature(self._single_point(zoom, key))
+        lat, lon = unproject(cell.sum_x / cell.count, cell.sum_y / cell.count)
+        return {
+            "type": "cluster",
+            "id": f"{zoom}-{key[0]}-{key[1]}",
+            "count": cell.count,
+            "latlon": [round(lat, 6), round(lon, 6)],
+            "expansion_zoom": self._expansion_zoom(zoom, key),
+        }
+
+    # ----- queries -----
+
+    def clusters(self, zoom: int, bbox: Optional[Tuple[float, float, float, float]] = None) -> List[Dict[str, Any]]:
+        """Clusters and single points at `zoom` inside bbox (west, south, east, north); whole world if None."""
+        zoom = max(0, min(self.max_zoom, zoom))
+        with self._lock:
+            level = self._levels[zoom]
+            if bbox is None:
+                keys = list(level)
+            else:
+                west, south, east, north = bbox
+                side = self._side(zoom)
+                _, j0 = self._cell_at(0.0, project(north, 0.0)[1], zoom)
+                _, j1 = self._cell_at(0.0, project(south, 0.0)[1], zoom)
+                lon_ranges = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+                i_ranges = [
+                    (int(project(0.0, lo)[0] * side), int(project(0.0, hi)[0] * side)) for lo, hi in lon_ranges
+                ]
+                span = sum(i1 - i0 + 1 for i0, i1 in i_ranges) * (j1 - j0 + 1)
+                if span > len(level):
+                    keys = [
+                        (i, j) for (i, j) in level
+                        if j0 <= j <= j1 and any(i0 <= i <= i1 for i0, i1 in i_ranges)
+                    ]
+                else:
+                    keys = [
+                        (i, j)
+                        for i0, i1 in i_ranges
+                        for i in range(i0, i1 + 1)
+                        for j in range(j0, j1 + 1)
+                        if (i, j) in level
+                    ]
+            return [self._cell_feature(zoom, key, level[key]) for key in sorted(keys)]
+
+    def children(self, cluster_id: str) -> List[Dict[str, Any]]:
+        """The clusters / points one zoom level below a cluster (its points, at the finest zoom)."""
+        zoom, i, j = parse_cluster_id(cluster_id)
+        with self._lock:
+            if (i, j) not in self._levels[zoom]:
+                raise KeyError(cluster_id)
+            if zoom == self.max_zoom:
+                positions = sorted(self._leaves.get((i, j), ()))
+                return [self._point_feature(self._points[p]) for p in positions]
+            level = self._levels[zoom + 1]
+            return [self._cell_feature(zoom + 1, key, level[key]) for key in sorted(self._child_keys(zoom, (i, j), zoom + 1))]
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+
+_clusters: Optional[ClusterIndex] = None
+_clusters_lock = threading.Lock()
+
+
+def get_cluster_index() -> ClusterIndex:
+    """Process-wide cluster index, caught up with the store's latest revision."""
+    global _clusters
+    with _clusters_lock:
+        if _clusters is None:
+            _clusters = ClusterIndex(get_opportunity_store())
+    _clusters.refresh()
+    return _clusters
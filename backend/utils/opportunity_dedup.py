@@ -0,0 +1,206 @@
+# backend/utils/opportunity_dedup.py
+"""
+Near-duplicate detection over the opportunity store.
+
+The store already keys rows by normalized URL (utils/opportunity_urls.py), so tracking params,
+trailing slashes and case never create a second row. What still slips through:
+  - the same listing under another URL shape (locale, renamed slug): same Idealist listing id
+  - the same opportunity reposted under a new listing id: same slug title, (near) identical coordinates
+
+Duplicates are found in two passes over the whole store:
+  1) hash every row by listing id                                          O(n)
+  2) group rows by slug title, sort each group by latitude and sweep a window of
+     OPPORTUNITY_DEDUP_DISTANCE_M, comparing only rows inside it            O(n log n)
+Linked rows are joined with a union-find, and each group keeps its earliest-stored row; fields the kept
+row lacks (country, name) are filled in from the rows merged into it.
+
+Usage:
+    report = dedupe_store(get_opportunity_store(), apply=True)
+
+CLI (from backend/):
+  python -m utils.opportunity_dedup [--distance-m 50] [--json]     # report only
+  python -m utils.opportunity_dedup --apply                         # merge and re-export opportunities.json
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from utils.gazetteer import normalize_tokens, slug_tokens
+from utils.opportunity_index import EARTH_RADIUS_KM, haversine_km
+from utils.opportunity_store import OpportunityStore, StoredOpportunity, get_opportunity_store
+from utils.opportunity_urls import extract_listing_id
+
+logger = logging.getLogger(__name__)
+
+# Rows with the same slug title at most this far apart are the same opportunity
+DEDUP_DISTANCE_M = float(os.environ.get("OPPORTUNITY_DEDUP_DISTANCE_M", "50"))
+
+
+class Merge(NamedTuple):
+    kept: str                    # link_key of the row that stays
+    merged: str                  # link_key of the row folded into it
+    reason: str                  # "listing_id" or "nearby"
+    distance_m: Optional[float]  # between the two rows' coordinates, when both have them
+
+
+class DedupReport(NamedTuple):
+    rows: int
+    merges: List[Merge]
+    updates: Dict[str, Dict[str, Any]]   # kept link_key -> record with fields filled in from its duplicates
+    applied: bool
+
+
+class _UnionFind:
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int, reason: str, reasons: Dict[int, str]):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        # the lower index (earlier store position) becomes the root, so it is the row that is kept
+        if rb < ra:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        reasons.setdefault(max(a, b), reason)
+
+
+def _latlon(record: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    latlon = record.get("latlon")
+    try:
+        return float(latlon[0]), float(latlon[1])
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _title_key(record: Dict[str, Any]) -> str:
+    """The slug without its listing id ("charity shop volunteer hunstanton ..."), else the name."""
+    tokens = slug_tokens(record.get("link") or "") or normalize_tokens(record.get("name") or "")
+    return " ".join(tokens)
+
+
+def find_duplicates(rows: List[StoredOpportunity], distance_m: float = DEDUP_DISTANCE_M) -> List[Merge]:
+    """Merges that fold every duplicate into its group's earliest row; `rows` in store order."""
+    rows = sorted(rows, key=lambda r: r.position)
+    uf = _UnionFind(len(rows))
+    reasons: Dict[int, str] = {}
+    coords = [_latlon(r.record) for r in rows]
+
+    # 1) same listing id
+    first_by_id: Dict[str, int] = {}
+    for i, row in enumerate(rows):
+        listing_id = extract_listing_id(row.record.get("link") or row.link_key)
+        if listing_id is None:
+            continue
+        first = first_by_id.setdefault(listing_id, i)
+        if first != i:
+            uf.union(first, i, "listing_id", reasons)
+
+    # 2) same title within distance_m: latitude-sorted sweep per title
+    if distance_m > 0:
+        window_deg = math.degrees(distance_m / 1000.0 / EARTH_RADIUS_KM)
+        by_title: Dict[str, List[int]] = {}
+        for i, row in enumerate(rows):
+            key = _title_key(row.record)
+            if key and coords[i] is not None:
+                by_title.setdefault(key, []).append(i)
+        for members in by_title.values():
+            if len(members) < 2:
+                continue
+            members.sort(key=lambda i: coords[i][0])
+            for a_pos, a in enumerate(members):
+                lat_a, lon_a = coords[a]
+                for b in members[a_pos + 1:]:
+                    lat_b, lon_b = coords[b]
+                    if lat_b - lat_a > window_deg:
+                        break
+                    if haversine_km(lat_a, lon_a, lat_b, lon_b) * 1000.0 <= distance_m:
+                        uf.union(a, b, "nearby", reasons)
+
+    merges: List[Merge] = []
+    for i, row in enumerate(rows):
+        root = uf.find(i)
+        if root == i:
+            continue
+        kept = rows[root]
+        distance = None
+        if coords[i] is not None and coords[root] is not None:
+            distance = round(haversine_km(*coords[root], *coords[i]) * 1000.0, 1)
+        merges.append(Merge(kept.link_key, row.link_key, reasons.get(i, "nearby"), distance))
+    return merges
+
+
+def _filled_records(rows: List[StoredOpportunity], merges: List[Merge]) -> Dict[str, Dict[str, Any]]:
+    """Kept records whose missing country / name can be taken from a duplicate."""
+    by_key = {r.link_key: r.record for r in rows}
+    updates: Dict[str, Dict[str, Any]] = {}
+    for merge in merges:
+        kept = updates.get(merge.kept, by_key[merge.kept])
+        duplicate = by_key[merge.merged]
+        filled = None
+        for field in ("country", "name"):
+            if not kept.get(field) and duplicate.get(field):
+                filled = dict(kept) if filled is None else filled
+                filled[field] = duplicate[field]
+        if filled is not None:
+            updates[merge.kept] = filled
+    return updates
+
+
+def dedupe_store(store: OpportunityStore, distance_m: float = DEDUP_DISTANCE_M, apply: bool = False) -> DedupReport:
+    """Find duplicates across the whole store; with `apply`, merge them (opportunities.json is not re-exported)."""
+    rows = store.all()
+    merges = find_duplicates(rows, distance_m)
+    updates = _filled_records(rows, merges)
+    if apply and merges:
+        removed = store.merge_many([(m.merged, m.kept) for m in merges], updates)
+        logger.info("Merged %d duplicate opportunities (%d rows checked)", removed, len(rows))
+    return DedupReport(len(rows), merges, updates, apply and bool(merges))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find and merge duplicate opportunities in the store")
+    parser.add_argument("--distance-m", type=float, default=DEDUP_DISTANCE_M,
+                        help="Same-title rows at most this many metres apart are duplicates (0 disables)")
+    parser.add_argument("--apply", action="store_true", help="Merge the duplicates and re-export opportunities.json")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    store = get_opportunity_store()
+    report = dedupe_store(store, args.distance_m, apply=args.apply)
+    if report.applied:
+        store.export_json()
+
+    counts: Dict[str, int] = {}
+    for merge in report.merges:
+        counts[merge.reason] = counts.get(merge.reason, 0) + 1
+    if args.json:
+        print(json.dumps({
+            "rows": report.rows,
+            "duplicates": len(report.merges),
+            "by_reason": counts,
+            "applied": report.applied,
+            "merges": [m._asdict() for m in report.merges],
+        }, indent=2))
+        return
+
+    breakdown = ", ".join(f"{k}={v}" for k, v in sorted(counts.items()))
+    print(f"Checked {report.rows} opportunities: {len(report.merges)} duplicates" + (f" ({breakdown})" if breakdown else ""))
+    for merge in report.merges:
+        distance = f"{merge.distance_m:.0f} m" if merge.distance_m is not None else "-"
+        print(f"  {merge.reason:>10} {distance:>8}  {merge.merged}\n  {'':>10} {'':>8}  -> {merge.kept}")
+    print("Merged and re-exported" if report.applied else "Nothing merged (pass --apply to merge)")
+
+
+if __name__ == "__main__":
+    main()
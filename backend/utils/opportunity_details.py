@@ -0,0 +1,255 @@
+# backend/utils/opportunity_details.py
+"""
+Fetch Idealist opportunity detail pages and extract the organization name and street address.
+
+The intended contract:
+  - fetch_opportunity_details(urls) -> list of dicts (same order as urls):
+        {"url": <url>, "organization_name": <str or None>, "address": <str or None>, "error": <str or None>}
+
+Behavior:
+  - Pages are fetched concurrently on a bounded thread pool (IDEALIST_DETAIL_WORKERS, default 8).
+  - Every request goes through the shared crawl scheduler (utils/crawl_scheduler.py), which enforces
+    per-host concurrency, request rate and backoff across all scraping paths in the process.
+  - Successful results are cached per URL in backend/opportunity_details_cache.json for
+    IDEALIST_DETAIL_CACHE_TTL seconds (default 7 days); repeat runs only fetch the misses.
+  - Extraction prefers schema.org JSON-LD (hiringOrganization / organizer / address) and falls back
+    to the organization link and <address> markup on the page.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import requests
+from bs4 import BeautifulSoup
+
+from utils.crawl_scheduler import crawl_scheduler
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+REQUEST_TIMEOUT = 10
+
+MAX_WORKERS = int(os.environ.get("IDEALIST_DETAIL_WORKERS", "8"))
+CACHE_TTL = float(os.environ.get("IDEALIST_DETAIL_CACHE_TTL", str(7 * 24 * 3600)))
+
+_session = requests.Session()
+_session.headers.update({"User-Agent": USER_AGENT})
+
+
+def _cache_path() -> str:
+    """backend/opportunity_details_cache.json (this file lives in backend/utils/)."""
+    cur_dir = os.path.dirname(__file__)
+    return os.path.normpath(os.path.abspath(os.path.join(cur_dir, "..", "opportunity_details_cache.json")))
+
+
+_cache_lock = threading.Lock()
+_cache: Optional[Dict[str, Dict[str, Any]]] = None
+
+
+def _load_cache() -> Dict[str, Dict[str, Any]]:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = {}
+            path = _cache_path()
+            if os.path.exists(path):
+                try:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    if isinstance(data, dict):
+                        _cache = data
+                except Exception:
+                    logger.exception("opportunity details cache is unreadable; starting with an empty cache")
+        return _cache
+
+
+def _save_cache():
+    """Write the cache atomically (temp file + replace)."""
+    with _cache_lock:
+        snapshot = dict(_cache or {})
+    path = _cache_path()
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix="opportunity_details_", suffix=".json", dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as tmpf:
+                json.dump(snapshot, tmpf, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except Exception:
+                    pass
+    except Exception:
+        logger.exception("Failed to write opportunity details cache")
+
+
+def _iter_jsonld_objects(node: Any):
+    """Yield every dict inside a JSON-LD document (handles @graph and nested lists)."""
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from _iter_jsonld_objects(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from _iter_jsonld_objects(item)
+
+
+def _format_address(addr: Any) -> Optional[str]:
+    if isinstance(addr, str):
+        return " ".join(addr.split()) or None
+    if isinstance(addr, list):
+        for item in addr:
+            formatted = _format_address(item)
+            if formatted:
+                return formatted
+        return None
+    if not isinstance(addr, dict):
+        return None
+    if "address" in addr and not any(k in addr for k in ("streetAddress", "addressLocality")):
+        return _format_address(addr.get("address"))
+    country = addr.get("addressCountry")
+    if isinstance(country, dict):
+        country = country.get("name")
+    parts = [
+        addr.get("streetAddress"),
+        addr.get("addressLocality"),
+        addr.get("addressRegion"),
+        addr.get("postalCode"),
+        country,
+    ]
+    parts = [" ".join(str(p).split()) for p in parts if p and str(p).strip()]
+    return ", ".join(parts) or None
+
+
+def _org_name(value: Any) -> Optional[str]:
+    if isinstance(value, str):
+        return value.strip() or None
+    if isinstance(value, dict):
+        name = value.get("name")
+        return name.strip() if isinstance(name, str) and name.strip() else None
+    if isinstance(value, list):
+        for item in value:
+            name = _org_name(item)
+            if name:
+                return name
+    return None
+
+
+def extract_details(html: str) -> Dict[str, Optional[str]]:
+    """
+    Extract {"organization_name", "address"} from a detail page's HTML.
+    Missing values are returned as None.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    organization_name = None
+    address = None
+
+    for script in soup.find_all("script", attrs={"type": "application/ld+json"}):
+        try:
+            doc = json.loads(script.string or script.get_text() or "")
+        except Exception:
+            continue
+        for obj in _iter_jsonld_objects(doc):
+            if organization_name is None:
+                for key in ("hiringOrganization", "organizer", "sponsor", "provider"):
+                    organization_name = _org_name(obj.get(key))
+                    if organization_name:
+                        break
+            if address is None:
+                for key in ("jobLocation", "location", "address"):
+                    if key in obj:
+                        address = _format_address(obj.get(key))
+                        if address:
+                            break
+        if organization_name and address:
+            break
+
+    if organization_name is None:
+        org_link = soup.select_one('a[href*="/nonprofit/"], a[href*="/organization/"]')
+        if org_link:
+            organization_name = " ".join(org_link.get_text(" ").split()) or None
+
+    if address is None:
+        addr_el = soup.select_one('address, [data-qa-id*="address"], [itemprop="address"]')
+        if addr_el:
+            address = " ".join(addr_el.get_text(" ").split()) or None
+
+    return {"organization_name": organization_name, "address": address}
+
+
+def _fetch_one(url: str, key: str = "") -> Dict[str, Any]:
+    result: Dict[str, Any] = {"url": url, "organization_name": None, "address": None, "error": None}
+    try:
+        with crawl_scheduler.slot(url, key=key) as ticket:
+            resp = _session.get(url, timeout=REQUEST_TIMEOUT)
+            ticket.record_status(resp.status_code)
+        resp.raise_for_status()
+        result.update(extract_details(resp.text))
+    except requests.RequestException as exc:
+        result["error"] = f"fetch_failed: {exc}"
+    except Exception as exc:
+        logger.exception("Failed to extract details from %s", url)
+        result["error"] = f"extract_failed: {exc}"
+    return result
+
+
+def fetch_opportunity_details(urls: List[str], max_workers: Optional[int] = None, key: str = "") -> List[Dict[str, Any]]:
+    """
+    Fetch details for every URL (cached results are reused) and return them in input order.
+
+    Args:
+      urls: list of opportunity detail page URLs
+      max_workers: optional pool size override (defaults to IDEALIST_DETAIL_WORKERS)
+      key: fairness key for the crawl scheduler (the country being enriched)
+
+    Returns:
+      list of {"url", "organization_name", "address", "error"} dicts, one per input URL
+    """
+    if not urls:
+        return []
+
+    cache = _load_cache()
+    now = time.time()
+    results: Dict[str, Dict[str, Any]] = {}
+    misses: List[str] = []
+    with _cache_lock:
+        for url in dict.fromkeys(urls):
+            entry = cache.get(url)
+            if entry and now - entry.get("fetched_at", 0) < CACHE_TTL:
+                results[url] = {
+                    "url": url,
+                    "organization_name": entry.get("organization_name"),
+                    "address": entry.get("address"),
+                    "error": None,
+                }
+            else:
+                misses.append(url)
+
+    if misses:
+        workers = max(1, min(max_workers or MAX_WORKERS, len(misses)))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            fetched = list(pool.map(lambda url: _fetch_one(url, key), misses))
+
+        cache_changed = False
+        with _cache_lock:
+            for item in fetched:
+                results[item["url"]] = item
+                if item["error"] is None:
+                    cache[item["url"]] = {
+                        "organization_name": item["organization_name"],
+                        "address": item["address"],
+                        "fetched_at": now,
+                    }
+                    cache_changed = True
+        if cache_changed:
+            _save_cache()
+        logger.info("Fetched %d opportunity detail pages (%d served from cache)", len(misses), len(results) - len(misses))
+
+    return [dict(results[url]) for url in urls]
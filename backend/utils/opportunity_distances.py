@@ -0,0 +1,226 @@
+# backend/utils/opportunity_distances.py
+"""
+Vectorized distances from many origins to every stored opportunity, with top-k nearest per origin.
+
+The store's coordinates are kept as flat NumPy columns (latitude / longitude in radians plus cos(lat)),
+so N origins x M opportunities is one broadcast haversine over an (N, M) block instead of N*M Python
+calls. The k nearest per origin come from np.argpartition (O(M) per row), and only those k are sorted.
+Origins are processed in blocks of at most OPPORTUNITY_DISTANCE_BLOCK cells (default 4M, ~32 MB of
+float64) so a large batch never materializes the whole matrix at once.
+
+The columns follow the store's revision like the other indexes (utils/store_follower.py): a refresh applies
+changed_since() and removed_since() to a position-keyed dict, and the arrays are re-packed only when
+something changed.
+
+Every result carries the row's store id (its normalized link, see utils/opportunity_urls.py) together
+with its name / link / country, which is the shape /api/gemini/rank-opportunities takes, so nearest
+results can be ranked directly, or ranked ids can be passed back as `ids` to restrict the search.
+
+Usage:
+    matrix = get_distance_matrix()
+    for origin_results in matrix.nearest([51.5, 48.86], [-0.12, 2.35], k=5):
+        for item, distance_km in origin_results:
+            ...
+
+CLI (from backend/):
+  python -m utils.opportunity_distances 51.5 -0.12 [-k 5] [--max-km 100] [--country "United Kingdom"]
+"""
+
+import argparse
+import os
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from utils.gazetteer import normalize_country
+from utils.opportunity_index import EARTH_RADIUS_KM
+from utils.opportunity_store import OpportunityStore, StoredOpportunity, get_opportunity_store
+from utils.opportunity_urls import normalize_opportunity_url
+from utils.store_follower import StoreFollower
+
+BLOCK_CELLS = int(os.environ.get("OPPORTUNITY_DISTANCE_BLOCK", str(4_000_000)))
+
+
+class DistanceItem(NamedTuple):
+    position: int
+    link_key: str
+    country: str    # normalized, for filtering
+    lat: float
+    lon: float
+    record: Dict[str, Any]
+
+
+def haversine_matrix(lat1, lon1, lat2, lon2, radius_km: float = EARTH_RADIUS_KM) -> np.ndarray:
+    """(N, M) great-circle distances in km between N points (lat1, lon1) and M points (lat2, lon2), in degrees."""
+    lat1 = np.radians(np.asarray(lat1, dtype=np.float64)).reshape(-1, 1)
+    lon1 = np.radians(np.asarray(lon1, dtype=np.float64)).reshape(-1, 1)
+    lat2 = np.radians(np.asarray(lat2, dtype=np.float64)).reshape(1, -1)
+    lon2 = np.radians(np.asarray(lon2, dtype=np.float64)).reshape(1, -1)
+    return _haversine(lat1, lon1, np.cos(lat1), lat2, lon2, np.cos(lat2), radius_km)
+
+
+def _haversine(lat1, lon1, cos1, lat2, lon2, cos2, radius_km: float = EARTH_RADIUS_KM) -> np.ndarray:
+    a = np.sin((lat2 - lat1) / 2) ** 2 + cos1 * cos2 * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * radius_km * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def top_k(distances: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Column indices and distances of the k smallest entries per row of an (N, M) matrix, nearest first."""
+    n, m = distances.shape
+    k = min(k, m)
+    if k <= 0:
+        return np.empty((n, 0), dtype=np.int64), np.empty((n, 0), dtype=np.float64)
+    if k < m:
+        idx = np.argpartition(distances, k - 1, axis=1)[:, :k]
+    else:
+        idx = np.broadcast_to(np.arange(m), (n, m))
+    picked = np.take_along_axis(distances, idx, axis=1)
+    order = np.argsort(picked, axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(picked, order, axis=1)
+
+
+class DistanceMatrix(StoreFollower):
+    def __init__(self, store: OpportunityStore, block_cells: int = BLOCK_CELLS):
+        super().__init__(store)
+        self.block_cells = max(1, block_cells)
+        self._items: Dict[int, DistanceItem] = {}
+        self._dirty = True
+        # packed columns, in position order
+        self._rows: List[DistanceItem] = []
+        self._lat = np.empty(0)
+        self._lon = np.empty(0)
+        self._cos = np.empty(0)
+        self._countries = np.empty(0, dtype=object)
+
+    # ----- maintenance -----
+
+    def _remove(self, position: int):
+        if self._items.pop(position, None) is not None:
+            self._dirty = True
+
+    def _add(self, row: StoredOpportunity) -> bool:
+        record = row.record
+        latlon = record.get("latlon")
+        try:
+            lat, lon = float(latlon[0]), float(latlon[1])
+        except (TypeError, ValueError, IndexError):
+            return False
+        self._items[row.position] = DistanceItem(
+            position=row.position,
+            link_key=row.link_key,
+            country=normalize_country(record.get("country") or row.country_key),
+            lat=lat,
+            lon=lon,
+            record=record,
+        )
+        self._dirty = True
+        return True
+
+    def _pack(self):
+        if not self._dirty:
+            return
+        self._rows = [self._items[p] for p in sorted(self._items)]
+        self._lat = np.radians(np.fromiter((r.lat for r in self._rows), dtype=np.float64, count=len(self._rows)))
+        self._lon = np.radians(np.fromiter((r.lon for r in self._rows), dtype=np.float64, count=len(self._rows)))
+        self._cos = np.cos(self._lat)
+        self._countries = np.asarray([r.country for r in self._rows], dtype=object)
+        self._dirty = False
+
+    # ----- queries -----
+
+    def _columns(self, country: Optional[str], ids: Optional[Iterable[str]]) -> np.ndarray:
+        """Indices into the packed columns allowed by the filters."""
+        mask = np.ones(len(self._rows), dtype=bool)
+        if country:
+            mask &= self._countries == normalize_country(country)
+        if ids is not None:
+            wanted: Set[str] = {normalize_opportunity_url(i) for i in ids}
+            mask &= np.fromiter((r.link_key in wanted for r in self._rows), dtype=bool, count=len(self._rows))
+        return np.flatnonzero(mask)
+
+    def nearest(
+        self,
+        lats: Sequence[float],
+        lons: Sequence[float],
+        k: int = 10,
+        max_distance_km: Optional[float] = None,
+        country: Optional[str] = None,
+        ids: Optional[Iterable[str]] = None,
+    ) -> List[List[Tuple[DistanceItem, float]]]:
+        """
+        The k nearest opportunities to each origin, nearest first.
+
+        Args:
+          lats, lons: origins in degrees
+          k: results per origin
+          max_distance_km: drop results further away than this
+          country: only opportunities in this country (any spelling normalize_country understands)
+          ids: only these opportunities (store ids or links, e.g. ranked ids)
+
+        Returns:
+          one list of (item, distance_km) per origin
+        """
+        lat1 = np.radians(np.asarray(lats, dtype=np.float64).reshape(-1, 1))
+        lon1 = np.radians(np.asarray(lons, dtype=np.float64).reshape(-1, 1))
+        if lat1.shape != lon1.shape:
+            raise ValueError("lats and lons must have the same length")
+        cos1 = np.cos(lat1)
+
+        with self._lock:
+            self._pack()
+            rows = self._rows
+            columns = self._columns(country, ids)
+            lat2, lon2, cos2 = self._lat[columns][None, :], self._lon[columns][None, :], self._cos[columns][None, :]
+
+        out: List[List[Tuple[DistanceItem, float]]] = []
+        if not len(columns):
+            return [[] for _ in range(len(lat1))]
+        step = max(1, self.block_cells // len(columns))
+        for start in range(0, len(lat1), step):
+            end = start + step
+            distances = _haversine(lat1[start:end], lon1[start:end], cos1[start:end], lat2, lon2, cos2)
+            idx, dist = top_k(distances, max(1, k))
+            for row_idx, row_dist in zip(idx.tolist(), dist.tolist()):
+                results = []
+                for i, d in zip(row_idx, row_dist):
+                    if max_distance_km is not None and d > max_distance_km:
+                        break
+                    results.append((rows[int(columns[i])], d))
+                out.append(results)
+        return out
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_matrix: Optional[DistanceMatrix] = None
+_matrix_lock = threading.Lock()
+
+
+def get_distance_matrix() -> DistanceMatrix:
+    """Process-wide distance matrix over the opportunity store, caught up with the store's latest revision."""
+    global _matrix
+    with _matrix_lock:
+        if _matrix is None:
+            _matrix = DistanceMatrix(get_opportunity_store())
+    _matrix.refresh()
+    return _matrix
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nearest stored opportunities to a point")
+    parser.add_argument("lat", type=float)
+    parser.add_argument("lon", type=float)
+    parser.add_argument("-k", type=int, default=5)
+    parser.add_argument("--max-km", type=float, default=None, help="Ignore opportunities further away")
+    parser.add_argument("--country", default=None)
+    args = parser.parse_args()
+
+    matrix = get_distance_matrix()
+    for item, distance in matrix.nearest([args.lat], [args.lon], args.k, args.max_km, args.country)[0]:
+        print(f"{distance:9.1f} km  {item.record.get('name') or '(no name)'} ({item.record.get('country') or '-'})  {item.record.get('link')}")
+
+
+if __name__ == "__main__":
+    main()
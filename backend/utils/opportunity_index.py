@@ -0,0 +1,264 @@
+# backend/utils/opportunity_index.py
+"""
+In-memory spatial index over the opportunity store, serving /api/opportunities.
+
+Structure:
+  - a uniform lat/lon grid (OPPORTUNITY_GRID_DEG degrees per cell, default 1) mapping each cell to
+    the positions of the opportunities inside it
+  - per-country sets of positions (keyed by the normalized country name)
+  - a sorted (name, position) list for name-prefix lookups via bisect
+
+Every opportunity is identified by its store position, which never changes for a link, so results are
+returned in position order and a cursor is simply "the last position returned". Pagination therefore
+stays stable while new opportunities are appended.
+
+The index follows the store's revision (utils/store_follower.py): each query first applies the rows from
+changed_since() and drops the ones merged away since (removed_since()), so a refresh costs O(changed
+rows) rather than a full rebuild.
+"""
+
+import base64
+import bisect
+import math
+import os
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from utils.gazetteer import normalize_country
+from utils.opportunity_store import OpportunityStore, StoredOpportunity, get_opportunity_store
+from utils.store_follower import StoreFollower
+
+GRID_DEG = float(os.environ.get("OPPORTUNITY_GRID_DEG", "1.0"))
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class IndexedOpportunity(NamedTuple):
+    position: int
+    link_key: str
+    country: str    # normalized, for filtering
+    name: str       # lower-cased, for prefix matching
+    lat: float
+    lon: float
+    record: Dict[str, Any]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(position: int) -> str:
+    return base64.urlsafe_b64encode(f"p{position}".encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        if not raw.startswith("p"):
+            raise ValueError(raw)
+        return int(raw[1:])
+    except Exception as exc:
+        raise InvalidCursor(f"invalid cursor: {cursor!r}") from exc
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class OpportunityIndex(StoreFollower):
+    def __init__(self, store: OpportunityStore, grid_deg: float = GRID_DEG):
+        super().__init__(store)
+        self.grid_deg = grid_deg
+        self._items: Dict[int, IndexedOpportunity] = {}
+        self._cells: Dict[Tuple[int, int], Set[int]] = {}
+        self._by_country: Dict[str, Set[int]] = {}
+        self._names: List[Tuple[str, int]] = []
+        self._names_dirty = False
+
+    # ----- maintenance -----
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.grid_deg)), int(math.floor(lon / self.grid_deg))
+
+    def _remove(self, position: int):
+        item = self._items.pop(position, None)
+        if item is None:
+            return
+        cell = self._cells.get(self._cell(item.lat, item.lon))
+        if cell is not None:
+            cell.discard(position)
+        country = self._by_country.get(item.country)
+        if country is not None:
+            country.discard(position)
+        self._names_dirty = True
+
+    def _add(self, row: StoredOpportunity) -> bool:
+        record = row.record
+        latlon = record.get("latlon")
+        try:
+            lat, lon = float(latlon[0]), float(latlon[1])
+        except (TypeError, ValueError, IndexError):
+            return False   # nothing to place on a map
+        item = IndexedOpportunity(
+            position=row.position,
+            link_key=row.link_key,
+            country=normalize_country(record.get("country") or row.country_key),
+            name=(record.get("name") or "").lower(),
+            lat=lat,
+            lon=lon,
+            record=record,
+        )
+        self._items[item.position] = item
+        self._cells.setdefault(self._cell(lat, lon), set()).add(item.position)
+        self._by_country.setdefault(item.country, set()).add(item.position)
+        self._names_dirty = True
+        return True
+
+    def _sorted_names(self) -> List[Tuple[str, int]]:
+        if self._names_dirty:
+            self._names = sorted((item.name, item.position) for item in self._items.values())
+            self._names_dirty = False
+        return self._names
+
+    # ----- queries -----
+
+    def _bbox_positions(self, west: float, south: float, east: float, north: float) -> Set[int]:
+        """Positions in cells overlapping the box (callers still test the exact bounds)."""
+        lon_ranges = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]   # antimeridian
+        lat0, lat1 = self._cell(south, 0)[0], self._cell(north, 0)[0]
+        out: Set[int] = set()
+        n_cells_in_box = 0
+        for lo, hi in lon_ranges:
+            n_cells_in_box += (lat1 - lat0 + 1) * (self._cell(0, hi)[1] - self._cell(0, lo)[1] + 1)
+        if n_cells_in_box > len(self._cells):
+            # box covers more grid cells than are populated: walk the populated cells instead
+            for (ci, cj), positions in self._cells.items():
+                if lat0 <= ci <= lat1 and any(self._cell(0, lo)[1] <= cj <= self._cell(0, hi)[1] for lo, hi in lon_ranges):
+                    out |= positions
+            return out
+        for lo, hi in lon_ranges:
+            lon0, lon1 = self._cell(0, lo)[1], self._cell(0, hi)[1]
+            for ci in range(lat0, lat1 + 1):
+                for cj in range(lon0, lon1 + 1):
+                    positions = self._cells.get((ci, cj))
+                    if positions:
+                        out |= positions
+        return out
+
+    @staticmethod
+    def _in_bbox(item: IndexedOpportunity, west: float, south: float, east: float, north: float) -> bool:
+        if not south <= item.lat <= north:
+            return False
+        if west <= east:
+            return west <= item.lon <= east
+        return item.lon >= west or item.lon <= east
+
+    def _prefix_positions(self, prefix: str) -> Set[int]:
+        names = self._sorted_names()
+        start = bisect.bisect_left(names, (prefix, -1))
+        out: Set[int] = set()
+        for name, position in names[start:]:
+            if not name.startswith(prefix):
+                break
+            out.add(position)
+        return out
+
+    def query(
+        self,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        near: Optional[Tuple[float, float, float]] = None,
+        country: Optional[str] = None,
+        name_prefix: Optional[str] = None,
+        limit: int = 200,
+        after: Optional[int] = None,
+    ) -> Tuple[List[Tuple[IndexedOpportunity, Optional[float]]], Optional[int], int]:
+        """
+        Filter opportunities. All given filters must match.
+
+        Args:
+          bbox: (west, south, east, north) in degrees; west > east crosses the antimeridian
+          near: (lat, lon, radius_km)
+          country: country name (any spelling normalize_country understands)
+          name_prefix: case-insensitive prefix of the opportunity name
+          limit: page size
+          after: position of the last item of the previous page (from the cursor)
+
+        Returns:
+          (page of (item, distance_km or None), position to continue after or None, total matches)
+        """
+        with self._lock:
+            candidates: Optional[Set[int]] = None
+
+            def narrow(positions: Set[int]):
+                nonlocal candidates
+                candidates = positions if candidates is None else candidates & positions
+
+            country_key = normalize_country(country) if country else None
+            prefix = name_prefix.strip().lower() if name_prefix and name_prefix.strip() else None
+
+            if country_key is not None:
+                narrow(self._by_country.get(country_key, set()))
+            if prefix is not None:
+                narrow(self._prefix_positions(prefix))
+            if bbox is not None:
+                narrow(self._bbox_positions(*bbox))
+            if near is not None:
+                lat, lon, radius_km = near
+                angle = radius_km / EARTH_RADIUS_KM
+                dlat = math.degrees(angle)
+                south, north = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+                # widest longitude offset of the spherical cap (reached poleward of its centre, so
+                # dlat / cos(lat) would cut off its sides)
+                cos_lat = math.cos(math.radians(lat))
+                ratio = math.sin(angle) / cos_lat if cos_lat > 1e-12 else 1.0
+                if south <= -90.0 or north >= 90.0 or ratio >= 1.0:
+                    west, east = -180.0, 180.0   # reaches a pole or wraps the globe
+                else:
+                    dlon = math.degrees(math.asin(ratio))
+                    west, east = ((lon - dlon + 180.0) % 360.0) - 180.0, ((lon + dlon + 180.0) % 360.0) - 180.0
+                narrow(self._bbox_positions(west, south, east, north))
+            if candidates is None:
+                candidates = set(self._items)
+
+            matches: List[Tuple[IndexedOpportunity, Optional[float]]] = []
+            for position in sorted(candidates):
+                item = self._items.get(position)
+                if item is None:
+                    continue
+                if bbox is not None and not self._in_bbox(item, *bbox):
+                    continue
+                distance = None
+                if near is not None:
+                    distance = haversine_km(near[0], near[1], item.lat, item.lon)
+                    if distance > near[2]:
+                        continue
+                matches.append((item, distance))
+
+            total = len(matches)
+            if after is not None:
+                start = bisect.bisect_right([m[0].position for m in matches], after)
+                matches = matches[start:]
+            page = matches[:limit]
+            next_after = page[-1][0].position if len(matches) > limit and page else None
+            return page, next_after, total
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_index: Optional[OpportunityIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_opportunity_index() -> OpportunityIndex:
+    """Process-wide index over the opportunity store, caught up with the store's latest revision."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = OpportunityIndex(get_opportunity_store())
+    _index.refresh()
+    return _index
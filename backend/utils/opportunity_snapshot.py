@@ -0,0 +1,335 @@
+# backend/utils/opportunity_snapshot.py
+"""
+Compact, precompressed snapshots of the opportunity store for the map client.
+
+opportunities.json is pretty-printed and repeats the country key, the long Idealist URL prefix and the
+name in every record. Two compact forms of the same data are built here:
+
+  - "json": opportunities.json minified (same shape, no whitespace)
+  - "columnar": a little-endian binary layout
+
+        offset  type        field
+        0       4s          magic b"OPPC"
+        4       u16         format version (1)
+        6       u16         reserved (0)
+        8       u32         record count n
+        12      u32         store revision
+        16      u32         length L of the string tables
+        20      L bytes     string tables, UTF-8 JSON:
+                            {"country_keys": [...], "countries": [...], "prefixes": [...],
+                             "names": [...], "suffixes": [...]}
+                            (every table but "suffixes" is deduplicated)
+        pad to a multiple of 4
+                f32[n]      lat
+                f32[n]      lon
+                u16[n]      index into country_keys
+                u16[n]      index into countries   (0xFFFF: null)
+                u16[n]      index into prefixes    (0xFFFF: no link)
+                u32[n]      index into names       (0xFFFFFFFF: no name)
+
+    Each link is split after its last '/': prefix (shared by nearly every record) + suffix (the slug).
+    Records are in store order, so records[i] of country_keys[k] are the ones with key index k, in order.
+    float32 keeps coordinates to about a metre, plenty for map markers.
+
+Each form has identity, gzip and (when the `brotli` package is installed) br encodings. Every encoding
+gets a strong ETag from a hash of its bytes, so a client holding the current payload revalidates with
+If-None-Match and gets a 304.
+
+Built at build time with the CLI (from backend/):
+  python -m utils.opportunity_snapshot build [--out-dir ../client/public]
+which writes opportunities.min.json(.gz/.br) and opportunities.bin(.gz/.br); /api/opportunities/snapshot
+builds the same bytes in memory once per store revision.
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import brotli  # optional: br variants are skipped without it
+except Exception:
+    brotli = None
+
+from utils.opportunity_store import OpportunityStore, get_opportunity_store
+
+BROTLI_QUALITY = int(os.environ.get("SNAPSHOT_BROTLI_QUALITY", "11"))
+GZIP_LEVEL = int(os.environ.get("SNAPSHOT_GZIP_LEVEL", "9"))
+
+MAGIC = b"OPPC"
+VERSION = 1
+_HEADER = struct.Struct("<4sHHIII")
+NO_INDEX_16 = 0xFFFF
+NO_INDEX_32 = 0xFFFFFFFF
+
+FORMATS = {
+    "json": ("application/json", "opportunities.min.json"),
+    "columnar": ("application/octet-stream", "opportunities.bin"),
+}
+# preferred first
+ENCODINGS = ("br", "gzip", "identity")
+_SUFFIXES = {"identity": "", "gzip": ".gz", "br": ".br"}
+
+
+class SnapshotVariant(NamedTuple):
+    body: bytes
+    etag: str           # strong, quoted
+    media_type: str
+    encoding: str       # "identity", "gzip" or "br"
+
+
+class _Table:
+    """Deduplicating string table."""
+
+    def __init__(self):
+        self.values: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def add(self, value: str) -> int:
+        index = self._index.get(value)
+        if index is None:
+            index = self._index[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+
+def _split_link(link: str) -> Tuple[str, str]:
+    cut = link.rfind("/") + 1
+    return link[:cut], link[cut:]
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def encode_json(data: Dict[str, List[Dict[str, Any]]]) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_columnar(data: Dict[str, List[Dict[str, Any]]], revision: int = 0) -> bytes:
+    country_keys, countries, prefixes, names = _Table(), _Table(), _Table(), _Table()
+    suffixes: List[str] = []
+    lat, lon = array("f"), array("f")
+    key_idx, country_idx, prefix_idx = array("H"), array("H"), array("H")
+    name_idx = array("I")
+    for country_key, records in data.items():
+        k = country_keys.add(country_key)
+        for record in records:
+            latlon = record.get("latlon") or [None, None]
+            try:
+                lat.append(float(latlon[0]))
+                lon.append(float(latlon[1]))
+            except (TypeError, ValueError, IndexError):
+                lat.append(float("nan"))
+                lon.append(float("nan"))
+            key_idx.append(k)
+            country = record.get("country")
+            country_idx.append(countries.add(country) if country is not None else NO_INDEX_16)
+            link = record.get("link")
+            if link:
+                prefix, suffix = _split_link(link)
+                prefix_idx.append(prefixes.add(prefix))
+            else:
+                prefix_idx.append(NO_INDEX_16)
+                suffix = ""
+            suffixes.append(suffix)
+            name = record.get("name")
+            name_idx.append(names.add(name) if name is not None else NO_INDEX_32)
+    for table in (country_keys, countries, prefixes):
+        if len(table.values) >= NO_INDEX_16:
+            raise ValueError("string table too large for the columnar format")
+
+    strings = json.dumps({
+        "country_keys": country_keys.values,
+        "countries": countries.values,
+        "prefixes": prefixes.values,
+        "names": names.values,
+        "suffixes": suffixes,
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    strings += b" " * (-(_HEADER.size + len(strings)) % 4)   # pad so the f32 columns are aligned
+    header = _HEADER.pack(MAGIC, VERSION, 0, len(lat), revision, len(strings))
+    return b"".join([header, strings] + [_little_endian(a) for a in (lat, lon, key_idx, country_idx, prefix_idx, name_idx)])
+
+
+def decode_columnar(payload: bytes) -> Tuple[Dict[str, List[Dict[str, Any]]], int]:
+    """Inverse of encode_columnar (coordinates come back as float32 values); returns (data, revision)."""
+    magic, version, _, n, revision, strings_len = _HEADER.unpack_from(payload, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a version-1 opportunity snapshot")
+    offset = _HEADER.size
+    tables = json.loads(payload[offset:offset + strings_len].decode("utf-8"))
+    offset += strings_len
+
+    columns = []
+    for typecode in ("f", "f", "H", "H", "H", "I"):
+        column = array(typecode)
+        size = column.itemsize * n
+        column.frombytes(payload[offset:offset + size])
+        if sys.byteorder != "little":
+            column.byteswap()
+        columns.append(column)
+        offset += size
+    lat, lon, key_idx, country_idx, prefix_idx, name_idx = columns
+
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for i in range(n):
+        prefix = prefix_idx[i]
+        out.setdefault(tables["country_keys"][key_idx[i]], []).append({
+            "latlon": [lat[i], lon[i]],
+            "country": tables["countries"][country_idx[i]] if country_idx[i] != NO_INDEX_16 else None,
+            "link": tables["prefixes"][prefix] + tables["suffixes"][i] if prefix != NO_INDEX_16 else None,
+            "name": tables["names"][name_idx[i]] if name_idx[i] != NO_INDEX_32 else None,
+        })
+    return out, revision
+
+
+def _compress(body: bytes, encoding: str) -> Optional[bytes]:
+    if encoding == "identity":
+        return body
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)   # mtime=0: same bytes, same ETag
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return None
+
+
+def build_variants(data: Dict[str, List[Dict[str, Any]]], revision: int) -> Dict[Tuple[str, str], SnapshotVariant]:
+    """Every (format, encoding) variant of a snapshot."""
+    bodies = {"json": encode_json(data), "columnar": encode_columnar(data, revision)}
+    variants: Dict[Tuple[str, str], SnapshotVariant] = {}
+    for fmt, body in bodies.items():
+        for encoding in ENCODINGS:
+            encoded = _compress(body, encoding)
+            if encoded is None:
+                continue
+            etag = '"' + hashlib.sha256(encoded).hexdigest()[:32] + '"'
+            variants[(fmt, encoding)] = SnapshotVariant(encoded, etag, FORMATS[fmt][0], encoding)
+    return variants
+
+
+def negotiate_encoding(accept_encoding: Optional[str], available) -> str:
+    """Best of `available` ("br" > "gzip" > "identity") allowed by an Accept-Encoding header."""
+    qualities: Dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        qualities[name] = q
+    for encoding in ENCODINGS:
+        if encoding not in available:
+            continue
+        q = qualities.get(encoding, qualities.get("*", 1.0 if encoding == "identity" else 0.0))
+        if q > 0:
+            return encoding
+    return "identity"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 specifies for this header)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+class SnapshotCache:
+    """Snapshot variants for the store's current revision, rebuilt only when the revision moves."""
+
+    def __init__(self, store: OpportunityStore):
+        self.store = store
+        self.revision = -1
+        self._variants: Dict[Tuple[str, str], SnapshotVariant] = {}
+        self._lock = threading.Lock()
+
+    def variants(self) -> Dict[Tuple[str, str], SnapshotVariant]:
+        with self._lock:
+            current = self.store.revision()
+            if current != self.revision:
+                # read the revision first: a write landing during the build just triggers another rebuild
+                self._variants = build_variants(self.store.snapshot(), current)
+                self.revision = current
+            return self._variants
+
+    def get(self, fmt: str, accept_encoding: Optional[str]) -> SnapshotVariant:
+        variants = self.variants()
+        available = {encoding for (f, encoding) in variants if f == fmt}
+        return variants[(fmt, negotiate_encoding(accept_encoding, available))]
+
+
+_snapshots: Optional[SnapshotCache] = None
+_snapshots_lock = threading.Lock()
+
+
+def get_snapshot_cache() -> SnapshotCache:
+    global _snapshots
+    with _snapshots_lock:
+        if _snapshots is None:
+            _snapshots = SnapshotCache(get_opportunity_store())
+        return _snapshots
+
+
+def _write_atomic(path: str, body: bytes):
+    dir_name = os.path.dirname(os.path.abspath(path)) or "."
+    os.makedirs(dir_name, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix="snapshot_", dir=dir_name)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except Exception:
+                pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build compact opportunity snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Write the minified JSON and columnar snapshots (plus .gz / .br)")
+    build.add_argument("--out-dir", default=None, help="Output directory (default: next to opportunities.json)")
+    args = parser.parse_args()
+
+    store = get_opportunity_store()
+    revision = store.revision()
+    variants = build_variants(store.snapshot(), revision)
+    out_dir = args.out_dir or os.path.dirname(os.path.abspath(store.json_path))
+    if brotli is None:
+        print("brotli is not installed; skipping .br variants")
+    for (fmt, encoding), variant in sorted(variants.items()):
+        path = os.path.join(out_dir, FORMATS[fmt][1] + _SUFFIXES[encoding])
+        _write_atomic(path, variant.body)
+        print(f"{path}: {len(variant.body)} bytes, ETag {variant.etag}")
+    print(f"Built revision {revision}")
+
+
+if __name__ == "__main__":
+    main()
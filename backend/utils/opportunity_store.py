@@ -0,0 +1,437 @@
+# backend/utils/opportunity_store.py
+"""
+Transactional store for geocoded opportunities, replacing whole-file rewrites of opportunities.json.
+
+Backed by SQLite in WAL mode (backend/opportunities.db, override with OPPORTUNITY_DB_PATH):
+  - one row per opportunity, keyed by its normalized URL (utils/opportunity_urls.py), so re-geocoding
+    a link updates it in place instead of appending a duplicate
+  - every write runs in a single BEGIN IMMEDIATE transaction, so concurrent writers (threads or
+    processes) are serialized by SQLite instead of overwriting each other
+  - rows are indexed per country (in insertion order) and by revision: each write transaction bumps
+    a store-wide revision and stamps the rows it touched, so readers can ask what changed since the
+    revision they last saw (changed_since)
+  - duplicates folded by merge_many() move to a `merged` table stamped with the same revision, so
+    readers can drop them (removed_since), and re-scraping a merged link does not bring it back
+  - rows written with only a placeholder position (the country centroid after Gemini failed or ran
+    out of time) are marked provisional: they are shown and exported like any other row, but
+    links_for_country(include_provisional=False) leaves them out so incremental scrapes retry them
+
+opportunities.json stays the export format the client fetches. export_json() writes it from the store
+byte-for-byte as before: {"<country key>": [{"latlon", "country", "link", "name"}, ...]}, indent=2,
+ensure_ascii=False, countries and records in first-insert order, no trailing newline.
+
+On first use an empty store imports backend/opportunities.json, so existing data carries over.
+
+CLI (from backend/):
+  python -m utils.opportunity_store export [--out ../client/public/opportunities.json]
+  python -m utils.opportunity_store stats
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from utils.opportunity_urls import normalize_opportunity_url
+
+logger = logging.getLogger(__name__)
+
+BUSY_TIMEOUT_MS = int(os.environ.get("OPPORTUNITY_DB_BUSY_TIMEOUT_MS", "10000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS opportunities (
+    link_key    TEXT PRIMARY KEY,
+    country_key TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    revision    INTEGER NOT NULL,
+    lat         REAL,
+    lon         REAL,
+    country     TEXT,
+    name        TEXT,
+    record      TEXT NOT NULL,
+    provisional INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_opportunities_country ON opportunities(country_key, position);
+CREATE INDEX IF NOT EXISTS idx_opportunities_revision ON opportunities(revision);
+CREATE TABLE IF NOT EXISTS countries (
+    country_key TEXT PRIMARY KEY,
+    position    INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS merged (
+    link_key    TEXT PRIMARY KEY,
+    into_key    TEXT NOT NULL,
+    country_key TEXT NOT NULL,
+    position    INTEGER NOT NULL,
+    revision    INTEGER NOT NULL,
+    link        TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_merged_revision ON merged(revision);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+class StoredOpportunity(NamedTuple):
+    link_key: str
+    country_key: str
+    position: int
+    revision: int
+    record: Dict[str, Any]   # the opportunities.json record, key order preserved
+
+
+def _backend_path(name: str) -> str:
+    return os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", name))
+
+
+def default_db_path() -> str:
+    return os.environ.get("OPPORTUNITY_DB_PATH") or _backend_path("opportunities.db")
+
+
+def default_json_path() -> str:
+    return _backend_path("opportunities.json")
+
+
+def _latlon(record: Dict[str, Any]):
+    latlon = record.get("latlon")
+    if isinstance(latlon, (list, tuple)) and len(latlon) == 2:
+        try:
+            return float(latlon[0]), float(latlon[1])
+        except (TypeError, ValueError):
+            pass
+    return None, None
+
+
+class OpportunityStore:
+    def __init__(self, db_path: Optional[str] = None, json_path: Optional[str] = None):
+        self.db_path = db_path or default_db_path()
+        self.json_path = json_path or default_json_path()
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    # ----- connection / schema -----
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+            self._local.conn = conn
+        if not self._initialized:
+            self._initialize(conn)
+        return conn
+
+    def _initialize(self, conn: sqlite3.Connection):
+        with self._init_lock:
+            if self._initialized:
+                return
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(opportunities)")}
+            if "provisional" not in columns:   # stores created before provisional rows existed
+                conn.execute("ALTER TABLE opportunities ADD COLUMN provisional INTEGER NOT NULL DEFAULT 0")
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                imported = conn.execute("SELECT value FROM meta WHERE key = 'imported'").fetchone()
+                if imported is None:
+                    count = self._import_json_locked(conn, self.json_path)
+                    conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('imported', '1')")
+                    if count:
+                        logger.info("Imported %d opportunities from %s", count, self.json_path)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._initialized = True
+
+    def _import_json_locked(self, conn: sqlite3.Connection, path: str) -> int:
+        if not os.path.exists(path):
+            return 0
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception:
+            logger.exception("Could not read %s; starting with an empty opportunity store", path)
+            return 0
+        if not isinstance(data, dict):
+            return 0
+        count = 0
+        for country_key, records in data.items():
+            if isinstance(records, list):
+                count += self._upsert_locked(conn, country_key, records, self._bump_revision(conn))
+        return count
+
+    # ----- internals (caller holds a write transaction) -----
+
+    @staticmethod
+    def _meta_int(conn: sqlite3.Connection, key: str) -> int:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row else 0
+
+    def _bump_revision(self, conn: sqlite3.Connection) -> int:
+        revision = self._meta_int(conn, "revision") + 1
+        conn.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('revision', ?)", (str(revision),))
+        return revision
+
+    def _upsert_locked(
+        self,
+        conn: sqlite3.Connection,
+        country_key: str,
+        records: Iterable[Dict[str, Any]],
+        revision: int,
+        provisional: Optional[Set[str]] = None,
+    ) -> int:
+        country_key = country_key.strip().lower()
+        if conn.execute("SELECT 1 FROM countries WHERE country_key = ?", (country_key,)).fetchone() is None:
+            next_country = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM countries").fetchone()[0]
+            conn.execute("INSERT INTO countries(country_key, position) VALUES (?, ?)", (country_key, next_country))
+        next_position = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM opportunities").fetchone()[0]
+
+        written = 0
+        for record in records:
+            if not isinstance(record, dict):
+                continue
+            link_key = normalize_opportunity_url(record.get("link"))
+            if not link_key:
+                continue
+            if conn.execute("SELECT 1 FROM merged WHERE link_key = ?", (link_key,)).fetchone() is not None:
+                continue   # already folded into another opportunity
+            lat, lon = _latlon(record)
+            payload = json.dumps(record, ensure_ascii=False)
+            flag = int(provisional is not None and link_key in provisional)
+            # existing links keep their position (so the export order is stable) but take the new values;
+            # without a `provisional` set their provisional flag is left as it was
+            conn.execute(
+                """
+                INSERT INTO opportunities(link_key, country_key, position, revision, lat, lon, country, name, record, provisional)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(link_key) DO UPDATE SET
+                    country_key = excluded.country_key,
+                    revision = excluded.revision,
+                    lat = excluded.lat,
+                    lon = excluded.lon,
+                    country = excluded.country,
+                    name = excluded.name,
+                    record = excluded.record,
+                    provisional = CASE WHEN ? THEN excluded.provisional ELSE opportunities.provisional END
+                WHERE opportunities.record != excluded.record OR opportunities.country_key != excluded.country_key
+                    OR (? AND opportunities.provisional != excluded.provisional)
+                """,
+                (
+                    link_key, country_key, next_position, revision, lat, lon, record.get("country"), record.get("name"),
+                    payload, flag, provisional is not None, provisional is not None,
+                ),
+            )
+            next_position += 1
+            written += 1
+        return written
+
+    # ----- public API -----
+
+    def upsert_many(self, country_key: str, records: List[Dict[str, Any]], provisional: Optional[Iterable[str]] = None) -> int:
+        """
+        Insert or update `records` ({"latlon", "country", "link", "name"} dicts) under `country_key`
+        in one transaction. Records are keyed by normalized link; records without a link are skipped.
+
+        With `provisional` (links whose position is only a placeholder), those records are marked
+        provisional and every other record is marked final; without it, existing flags are kept.
+        Returns the number of records written.
+        """
+        if not records:
+            return 0
+        marked = None if provisional is None else {normalize_opportunity_url(link) for link in provisional}
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            written = self._upsert_locked(conn, country_key, records, self._bump_revision(conn), marked)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return written
+
+    def merge_many(self, merges: List[Tuple[str, str]], updates: Optional[Dict[str, Dict[str, Any]]] = None) -> int:
+        """
+        Fold duplicates into the opportunities they repeat, in one transaction.
+
+        Args:
+          merges: (duplicate link_key, kept link_key) pairs; the duplicate's row is removed
+          updates: kept link_key -> replacement record (e.g. with fields filled in from its duplicates)
+
+        Returns the number of rows removed.
+        """
+        if not merges:
+            return 0
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            revision = self._bump_revision(conn)
+            removed = 0
+            for duplicate_key, kept_key in merges:
+                row = conn.execute(
+                    "SELECT country_key, position, record FROM opportunities WHERE link_key = ?", (duplicate_key,)
+                ).fetchone()
+                if row is None or duplicate_key == kept_key:
+                    continue
+                conn.execute(
+                    "INSERT OR REPLACE INTO merged(link_key, into_key, country_key, position, revision, link) VALUES (?, ?, ?, ?, ?, ?)",
+                    (duplicate_key, kept_key, row[0], row[1], revision, json.loads(row[2]).get("link")),
+                )
+                conn.execute("DELETE FROM opportunities WHERE link_key = ?", (duplicate_key,))
+                removed += 1
+            for kept_key, record in (updates or {}).items():
+                lat, lon = _latlon(record)
+                conn.execute(
+                    """
+                    UPDATE opportunities SET revision = ?, lat = ?, lon = ?, country = ?, name = ?, record = ?
+                    WHERE link_key = ? AND record != ?
+                    """,
+                    (revision, lat, lon, record.get("country"), record.get("name"),
+                     json.dumps(record, ensure_ascii=False), kept_key, json.dumps(record, ensure_ascii=False)),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return removed
+
+    def revision(self) -> int:
+        """Store-wide revision; increases with every write transaction."""
+        return self._meta_int(self._conn(), "revision")
+
+    def changed_since(self, revision: int) -> List[StoredOpportunity]:
+        """Rows inserted or updated after `revision`, in export order."""
+        rows = self._conn().execute(
+            "SELECT link_key, country_key, position, revision, record FROM opportunities WHERE revision > ? ORDER BY position",
+            (revision,),
+        ).fetchall()
+        return [StoredOpportunity(r[0], r[1], r[2], r[3], json.loads(r[4])) for r in rows]
+
+    def removed_since(self, revision: int) -> List[Tuple[str, int]]:
+        """(link_key, position) of rows merged away after `revision`."""
+        return [
+            (r[0], r[1])
+            for r in self._conn().execute(
+                "SELECT link_key, position FROM merged WHERE revision > ? ORDER BY position", (revision,)
+            ).fetchall()
+        ]
+
+    def all(self) -> List[StoredOpportunity]:
+        return self.changed_since(0)
+
+    def links_for_country(self, country_key: str, include_provisional: bool = True) -> Set[str]:
+        """The links (as stored, not normalized) under `country_key`, optionally without provisional rows."""
+        rows = self._conn().execute(
+            "SELECT record FROM opportunities WHERE country_key = ? AND (? OR provisional = 0)",
+            (country_key.strip().lower(), include_provisional),
+        ).fetchall()
+        links = set()
+        for (payload,) in rows:
+            link = json.loads(payload).get("link")
+            if isinstance(link, str):
+                links.add(link)
+        # merged-away duplicates count as known, so incremental scrapes skip them too
+        for (link,) in self._conn().execute(
+            "SELECT link FROM merged WHERE country_key = ? AND link IS NOT NULL", (country_key.strip().lower(),)
+        ):
+            links.add(link)
+        return links
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """The whole store in opportunities.json shape (countries and records in first-insert order)."""
+        conn = self._conn()
+        out: Dict[str, List[Dict[str, Any]]] = {}
+        for (country_key,) in conn.execute("SELECT country_key FROM countries ORDER BY position"):
+            out[country_key] = []
+        for country_key, payload in conn.execute("SELECT country_key, record FROM opportunities ORDER BY position"):
+            out.setdefault(country_key, []).append(json.loads(payload))
+        return {k: v for k, v in out.items() if v}
+
+    def stats(self) -> Dict[str, Any]:
+        conn = self._conn()
+        per_country = dict(conn.execute(
+            "SELECT country_key, COUNT(*) FROM opportunities GROUP BY country_key ORDER BY country_key"
+        ).fetchall())
+        merged = conn.execute("SELECT COUNT(*) FROM merged").fetchone()[0]
+        provisional = conn.execute("SELECT COUNT(*) FROM opportunities WHERE provisional = 1").fetchone()[0]
+        return {
+            "revision": self.revision(),
+            "total": sum(per_country.values()),
+            "merged": merged,
+            "provisional": provisional,
+            "countries": per_country,
+        }
+
+    def export_json(self, path: Optional[str] = None) -> int:
+        """
+        Write the store to `path` (default backend/opportunities.json) atomically and return the
+        revision exported. The snapshot is read inside a write transaction, so no other writer can
+        commit between reading and replacing the file, and the last export always includes every write.
+        """
+        path = path or self.json_path
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            revision = self._meta_int(conn, "revision")
+            data = self.snapshot()
+            dir_name = os.path.dirname(os.path.abspath(path)) or "."
+            os.makedirs(dir_name, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix="opportunities_", suffix=".json", dir=dir_name)
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as tmpf:
+                    json.dump(data, tmpf, ensure_ascii=False, indent=2)
+                    tmpf.flush()
+                    os.fsync(tmpf.fileno())
+                os.replace(tmp_path, path)
+            finally:
+                if os.path.exists(tmp_path):
+                    try:
+                        os.remove(tmp_path)
+                    except Exception:
+                        pass
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return revision
+
+
+_store: Optional[OpportunityStore] = None
+_store_lock = threading.Lock()
+
+
+def get_opportunity_store() -> OpportunityStore:
+    """Process-wide store, opened (and seeded from opportunities.json) on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = OpportunityStore()
+        return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Opportunity store maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Write opportunities.json from the store")
+    export.add_argument("--out", default=None, help="Output path (default backend/opportunities.json)")
+    sub.add_parser("stats", help="Print row counts per country")
+    args = parser.parse_args()
+
+    store = get_opportunity_store()
+    if args.command == "export":
+        out = args.out or store.json_path
+        revision = store.export_json(out)
+        print(f"Exported revision {revision} to {out}")
+    else:
+        print(json.dumps(store.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
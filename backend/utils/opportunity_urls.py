@@ -0,0 +1,36 @@
+# backend/utils/opportunity_urls.py
+"""
+Canonical forms of Idealist opportunity URLs, so the same listing is recognised no matter how
+it was scraped (tracking params, fragments, trailing slashes, upper/lower case, http vs https).
+"""
+
+import re
+from typing import Optional
+from urllib.parse import unquote, urlparse, urlunparse
+
+# Idealist listing ids are 32 hex chars at the start of the last path segment
+_LISTING_ID_RE = re.compile(r"^([0-9a-f]{32})(?:-|$)")
+
+
+def normalize_opportunity_url(url: str) -> str:
+    """
+    Lower-cased https URL without query string, fragment, "www." or trailing slash.
+    Non-string / empty input is returned as "".
+    """
+    if not url or not isinstance(url, str):
+        return ""
+    parsed = urlparse(url.strip())
+    host = (parsed.netloc or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    path = unquote(parsed.path or "").rstrip("/").lower()
+    return urlunparse(("https", host, path, "", "", ""))
+
+
+def extract_listing_id(url: str) -> Optional[str]:
+    """The 32-hex listing id from an opportunity URL's slug, or None."""
+    if not url or not isinstance(url, str):
+        return None
+    last = unquote(urlparse(url.strip()).path or "").rstrip("/").split("/")[-1].lower()
+    match = _LISTING_ID_RE.match(last)
+    return match.group(1) if match else None
@@ -0,0 +1,93 @@
+# backend/utils/places_client.py
+"""
+Google Places calls through one pooled keep-alive session, cached per quantized lat/lng cell.
+
+Users in the same city send nearly identical coordinates, so lookups are keyed by the point rounded
+to PLACES_CACHE_PRECISION decimal places (2 = ~1.1 km cells) and the request is made for the cell's
+rounded point itself: every caller in a cell gets the same, cacheable answer. Successful responses
+(status OK or ZERO_RESULTS) are kept for PLACES_CACHE_TTL seconds (default 30 days), in memory and,
+when PLACES_CACHE_DB is set, in a SQLite file as well. Concurrent identical lookups share one call.
+Errors (HTTP failures, OVER_QUERY_LIMIT, REQUEST_DENIED, ...) are never cached.
+"""
+
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.ttl_cache import TTLCache
+
+PLACES_CACHE_PRECISION = int(os.environ.get("PLACES_CACHE_PRECISION", "2"))
+PLACES_CACHE_TTL = float(os.environ.get("PLACES_CACHE_TTL", str(30 * 24 * 3600)))
+PLACES_CACHE_DB = os.environ.get("PLACES_CACHE_DB") or None
+PLACES_POOL_SIZE = int(os.environ.get("PLACES_POOL_SIZE", "10"))
+PLACES_TIMEOUT = float(os.environ.get("PLACES_TIMEOUT", "10"))
+
+NEARBY_SEARCH_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+
+
+class PlacesError(RuntimeError):
+    """Places answered with an error status (not cached)."""
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_places_session() -> requests.Session:
+    """Process-wide session with a keep-alive connection pool for the Maps host."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=PLACES_POOL_SIZE)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+_cache: Optional[TTLCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_places_cache() -> TTLCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TTLCache("places", ttl=PLACES_CACHE_TTL, disk_path=PLACES_CACHE_DB)
+        return _cache
+
+
+def quantize(lat: float, lng: float, precision: int = PLACES_CACHE_PRECISION) -> Tuple[float, float]:
+    """The cell a point falls in, as its rounded (lat, lng)."""
+    lng = ((lng + 180.0) % 360.0) - 180.0
+    return round(lat, precision), round(lng, precision)
+
+
+def nearby_search(api_key: str, lat: float, lng: float, **params: Any) -> Dict[str, Any]:
+    """
+    Places Nearby Search around the cell containing (lat, lng); extra params (type, rankby, radius,
+    keyword, ...) are passed through and are part of the cache key. Raises requests exceptions or
+    PlacesError on failure.
+    """
+    cell_lat, cell_lng = quantize(lat, lng)
+    key = "nearby|{:.{p}f},{:.{p}f}|{}".format(
+        cell_lat, cell_lng, "&".join(f"{k}={params[k]}" for k in sorted(params)), p=max(0, PLACES_CACHE_PRECISION)
+    )
+
+    def load() -> Dict[str, Any]:
+        response = get_places_session().get(
+            NEARBY_SEARCH_URL,
+            params=dict(params, location=f"{cell_lat},{cell_lng}", key=api_key),
+            timeout=PLACES_TIMEOUT,
+        )
+        response.raise_for_status()
+        data = response.json()
+        status = data.get("status")
+        if status not in ("OK", "ZERO_RESULTS"):
+            raise PlacesError(f"Places returned {status}: {data.get('error_message', '')}".rstrip(": "))
+        return data
+
+    return get_places_cache().get_or_load(key, load)
@@ -0,0 +1,72 @@
+# backend/utils/store_follower.py
+"""
+Base class for in-memory structures kept in step with the opportunity store by revision
+(OpportunityIndex, ClusterIndex, DistanceMatrix).
+
+refresh() reads store.revision(); when it moved, it drops the positions merged away since the last
+refresh (removed_since()) and applies the rows written since (changed_since()), so catching up costs
+O(changed rows). apply() replaces a row wherever it was held before: under its link (the row may have
+moved position) and at its position. The link <-> position bookkeeping lives here, so subclasses only
+implement:
+  - _add(row) -> bool    index one store row; False when it cannot be held (e.g. no usable latlon)
+  - _remove(position)    forget the row _add() indexed at `position`
+Both are called with self._lock held; subclasses take the same lock around their queries.
+"""
+
+import threading
+from typing import Dict, Iterable
+
+from utils.opportunity_store import OpportunityStore, StoredOpportunity
+
+
+class StoreFollower:
+    def __init__(self, store: OpportunityStore):
+        self.store = store
+        self.revision = 0
+        self._lock = threading.RLock()
+        self._by_link: Dict[str, int] = {}
+        self._link_at: Dict[int, str] = {}
+
+    # ----- subclass hooks -----
+
+    def _add(self, row: StoredOpportunity) -> bool:
+        raise NotImplementedError
+
+    def _remove(self, position: int):
+        raise NotImplementedError
+
+    # ----- maintenance -----
+
+    def _discard(self, position: int):
+        link_key = self._link_at.pop(position, None)
+        if link_key is None:
+            return
+        self._by_link.pop(link_key, None)
+        self._remove(position)
+
+    def apply(self, rows: Iterable[StoredOpportunity]) -> int:
+        """Insert or replace rows (as returned by the store); returns how many were applied."""
+        applied = 0
+        with self._lock:
+            for row in rows:
+                previous = self._by_link.get(row.link_key)
+                if previous is not None:
+                    self._discard(previous)
+                self._discard(row.position)
+                if self._add(row):
+                    self._by_link[row.link_key] = row.position
+                    self._link_at[row.position] = row.link_key
+                applied += 1
+        return applied
+
+    def refresh(self) -> int:
+        """Catch up with the store; returns the number of rows applied."""
+        with self._lock:
+            current = self.store.revision()
+            if current == self.revision:
+                return 0
+            for _, position in self.store.removed_since(self.revision):
+                self._discard(position)   # merged into another row
+            applied = self.apply(self.store.changed_since(self.revision))
+            self.revision = current
+            return applied
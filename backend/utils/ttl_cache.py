@@ -0,0 +1,277 @@
+# backend/utils/ttl_cache.py
+"""
+Small TTL cache for slow external lookups (Google Places, ...), with request coalescing.
+
+Tiers:
+  - memory: an LRU dict of at most `max_entries` live entries
+  - disk (optional, when `disk_path` is given): a SQLite table of JSON values, so entries survive
+    restarts and are shared between worker processes. A disk hit is promoted to memory.
+
+get_or_load(key, loader) is the main entry point: a hit is returned directly; on a miss exactly one
+caller runs `loader()` while concurrent callers for the same key wait for its result (or its
+exception) instead of repeating the call. Exceptions are never cached; None is cached only for
+`none_ttl` seconds (not at all when that is 0).
+
+Optionally, for hot keys of slow upstreams:
+  - refresh_ahead: a hit on an entry in the last `refresh_ahead` fraction of its TTL starts one
+    background reload, so keys that keep being read are renewed before they ever expire
+  - stale_ttl: expired entries stay in memory this many seconds longer; when a load fails and one is
+    still there, it is returned (to every waiting caller) instead of the error
+
+Values must be JSON-serializable when a disk tier is used.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _DiskTier:
+    def __init__(self, path: str, namespace: str):
+        self.path = path
+        self.namespace = namespace
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS ttl_cache (namespace TEXT NOT NULL, key TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, value TEXT NOT NULL, PRIMARY KEY (namespace, key))"
+        )
+        self._conn().execute("DELETE FROM ttl_cache WHERE namespace = ? AND expires_at <= ?", (namespace, time.time()))
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Tuple[Any, float]:
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM ttl_cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        if row is None or row[1] <= time.time():
+            return _MISSING, 0.0
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, expires_at: float):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO ttl_cache(namespace, key, expires_at, value) VALUES (?, ?, ?, ?)",
+            (self.namespace, key, expires_at, json.dumps(value, ensure_ascii=False)),
+        )
+
+    def delete(self, key: Optional[str] = None):
+        if key is None:
+            self._conn().execute("DELETE FROM ttl_cache WHERE namespace = ?", (self.namespace,))
+        else:
+            self._conn().execute("DELETE FROM ttl_cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+
+class TTLCache:
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_entries: int = 10000,
+        disk_path: Optional[str] = None,
+        none_ttl: Optional[float] = None,
+        refresh_ahead: float = 0.0,
+        stale_ttl: float = 0.0,
+    ):
+        """
+        Args:
+          name: namespace (the disk tier can be shared between caches)
+          ttl: seconds an entry stays fresh
+          max_entries: memory-tier size; least recently used entries are evicted first
+          disk_path: SQLite file for the disk tier; None keeps the cache in memory only
+          none_ttl: seconds to keep a None result (default: ttl; 0: never cache None)
+          refresh_ahead: fraction of the TTL (0..1) before expiry in which a hit reloads in the background
+          stale_ttl: seconds past expiry an entry may still be served when a reload fails (memory tier only)
+        """
+        self.name = name
+        self.ttl = ttl
+        self.none_ttl = ttl if none_ttl is None else none_ttl
+        self.max_entries = max_entries
+        self.refresh_ahead = max(0.0, min(1.0, refresh_ahead))
+        self.stale_ttl = max(0.0, stale_ttl)
+        self._memory: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._flights: Dict[str, _Flight] = {}
+        self._lock = threading.Lock()
+        self._disk: Optional[_DiskTier] = None
+        if disk_path:
+            try:
+                self._disk = _DiskTier(disk_path, name)
+            except Exception:
+                logger.exception("%s cache: disk tier at %s unavailable; using memory only", name, disk_path)
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "loads": 0, "coalesced": 0, "refreshes": 0, "stale": 0}
+
+    # ----- tiers -----
+
+    def _memory_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """(value, expires_at) for `key`, fresh or still within stale_ttl of expiring."""
+        entry = self._memory.get(key)
+        if entry is None:
+            return None
+        if entry[1] + self.stale_ttl <= time.time():
+            del self._memory[key]
+            return None
+        return entry
+
+    def _memory_get(self, key: str) -> Tuple[Any, float]:
+        entry = self._memory_entry(key)
+        if entry is None or entry[1] <= time.time():
+            return _MISSING, 0.0
+        self._memory.move_to_end(key)
+        return entry
+
+    def _memory_set(self, key: str, value: Any, expires_at: float):
+        self._memory[key] = (value, expires_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Fresh cached value for `key`, or `default`."""
+        value, _ = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def _lookup(self, key: str) -> Tuple[Any, float]:
+        with self._lock:
+            value, expires_at = self._memory_get(key)
+            if value is not _MISSING:
+                self._stats["hits"] += 1
+                return value, expires_at
+        if self._disk is not None:
+            try:
+                value, expires_at = self._disk.get(key)
+            except Exception:
+                logger.exception("%s cache: disk read failed", self.name)
+                value = _MISSING
+            if value is not _MISSING:
+                with self._lock:
+                    self._memory_set(key, value, expires_at)
+                    self._stats["disk_hits"] += 1
+                return value, expires_at
+        return _MISSING, 0.0
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = (self.none_ttl if value is None else self.ttl) if ttl is None else ttl
+        if ttl <= 0:
+            return
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._memory_set(key, value, expires_at)
+        if self._disk is not None:
+            try:
+                self._disk.set(key, value, expires_at)
+            except Exception:
+                logger.exception("%s cache: disk write failed", self.name)
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drop `key` (or everything, when None) from both tiers."""
+        with self._lock:
+            if key is None:
+                self._memory.clear()
+            else:
+                self._memory.pop(key, None)
+        if self._disk is not None:
+            try:
+                self._disk.delete(key)
+            except Exception:
+                logger.exception("%s cache: disk delete failed", self.name)
+
+    # ----- loading -----
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Cached value for `key`, calling `loader()` once on a miss even under concurrent callers."""
+        value, expires_at = self._lookup(key)
+        if value is not _MISSING:
+            self._maybe_refresh(key, loader, ttl, expires_at)
+            return value
+
+        with self._lock:
+            value, _ = self._memory_get(key)   # a concurrent load may have finished meanwhile
+            if value is not _MISSING:
+                self._stats["hits"] += 1
+                return value
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if leader:
+            self._run(key, loader, ttl, flight)
+        else:
+            flight.event.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.value
+
+    def _run(self, key: str, loader: Callable[[], Any], ttl: Optional[float], flight: _Flight):
+        """Load `key` into `flight` (falling back to a stale entry on failure) and release its waiters."""
+        try:
+            value = loader()
+            self._stats["loads"] += 1
+            self.set(key, value, ttl)
+            flight.value = value
+        except Exception as exc:
+            with self._lock:
+                entry = self._memory_entry(key)
+                if entry is not None:
+                    self._stats["stale"] += 1
+            if entry is None:
+                flight.error = exc
+            else:
+                logger.warning("%s cache: load failed (%s: %s); serving the cached value", self.name, type(exc).__name__, exc)
+                flight.value = entry[0]
+        except BaseException as exc:
+            flight.error = exc
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def _maybe_refresh(self, key: str, loader: Callable[[], Any], ttl: Optional[float], expires_at: float):
+        """Start a background reload of a hit that is within refresh_ahead of expiring."""
+        if self.refresh_ahead <= 0:
+            return
+        window = (self.ttl if ttl is None else ttl) * self.refresh_ahead
+        if expires_at - time.time() > window:
+            return
+        with self._lock:
+            if key in self._flights:
+                return
+            flight = self._flights[key] = _Flight()
+            self._stats["refreshes"] += 1
+        threading.Thread(
+            target=self._run, args=(key, loader, ttl, flight), name=f"{self.name}-cache-refresh", daemon=True
+        ).start()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats, entries=len(self._memory), disk=self._disk is not None)
+
+    def __len__(self) -> int:
+        return len(self._memory)